@@ -1,9 +1,26 @@
-from i3grid.doc import Documentation
-from i3grid.grid import (
-    FloatManager,
-    Utils,
-    BASE_CONFIG,
-    __author__,
-    __version__,
-    __license__,
-)
+# Attributes are resolved lazily (PEP 562), so light entry points such as
+# the daemon client (i3grid.client) do not import the grid module and i3.
+import importlib
+
+_exports = {
+    "Documentation": "doc",
+    "FloatManager": "grid",
+    "AsyncFloatManager": "aiogrid",
+    "Utils": "grid",
+    "BASE_CONFIG": "grid",
+    "__author__": "grid",
+    "__version__": "grid",
+    "__license__": "grid",
+}
+__all__ = ["Documentation", "FloatManager", "AsyncFloatManager", "Utils", "BASE_CONFIG"]
+
+
+def __getattr__(name):
+    if name in _exports:
+        module = importlib.import_module(f".{_exports[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
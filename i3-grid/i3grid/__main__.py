@@ -1,24 +1,103 @@
 import sys
-import datetime
 import logging
 try:
-    from i3grid import Documentation, FloatManager, Utils
+    from i3grid.doc import Documentation, grid_axis
 except ModuleNotFoundError:
     # Github custom download
-    from doc import Documentation
-    from grid import FloatManager, Utils
+    from doc import Documentation, grid_axis
 
-# Logger for stdout
-logging.basicConfig(
-    level=logging.INFO, format="[%(asctime)s %(levelname)s |%(lineno)d]: %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Hand rolled parser for the hot keybinding forms, which skips importing
+# argparse and building the full (help) parser. Ex:
+#   snap --target 3 --rows 2 --cols 2
+#   multi --multis 1 4
+# Anything else (help, sole actions, state flags) goes through argparse.
+_FAST_ACTIONS = {
+    "center",
+    "float",
+    "resize",
+    "snap",
+    "csize",
+    "reset",
+    "multi",
+    "arrange",
+    "save-layout",
+    "restore-layout",
+}
+_FAST_FLAGS = {
+    "target": int,
+    "rows": grid_axis,
+    "cols": grid_axis,
+    "perc": int,
+    "preset": str,
+    "output": str,
+    "layout": str,
+    "profile": str,
+    "multis": list,
+}
+
+
+def _fast_args(argv: list) -> dict:
+    """Parses the fast path forms into the same dict as the argparse
+    namespace (flags not given are left out). None for any other argv."""
+    args = {"actions": []}
+    i = 0
+    while i < len(argv) and not argv[i].startswith("-"):
+        if argv[i] not in _FAST_ACTIONS:
+            return None
+        args["actions"].append(argv[i])
+        i += 1
+    if not args["actions"]:
+        return None
+    while i < len(argv):
+        flag, _, value = argv[i].partition("=")
+        name = flag[2:]
+        if not flag.startswith("--") or name not in _FAST_FLAGS or name in args:
+            return None
+        values = [value] if value else []
+        i += 1
+        while i < len(argv) and not argv[i].startswith("-"):
+            values.append(argv[i])
+            i += 1
+        if _FAST_FLAGS[name] is list:
+            if not values:
+                return None
+            args[name] = values
+            continue
+        if len(values) != 1:
+            return None
+        try:
+            args[name] = _FAST_FLAGS[name](values[0])
+        except ValueError:
+            return None
+    return args
+
+
+def _float_manager() -> type:
+    """The FloatManager class. Imported on use, the rofi menu is listed
+    without the grid module (and i3)."""
+    try:
+        from i3grid import FloatManager
+    except ModuleNotFoundError:
+        from grid import FloatManager
+    return FloatManager
+
+
+def _rofi(argv: list) -> int:
+    try:
+        from i3grid.rofi import main as rofi_main
+    except ModuleNotFoundError:
+        from rofi import main as rofi_main
+    return rofi_main(argv)
+
 
 def _debugger() -> None:
     """Evaluates user input expression."""
+    import datetime
+
     logger.info("Entering debug mode. Evaluating input:")
-    m = FloatManager(check=False)
+    m = _float_manager()(check=False)
     print(">>> m = FloatManager(check=False)  # m.run(<cmd>)")
     while 1:
         start = datetime.datetime.now()
@@ -33,7 +112,7 @@ def _sole_commands(args):
         assert (
             len(args.actions)
         ) == 1, "'Listen' is a sole command. Do not pass additional actions"
-        listener = FloatManager(check=False)
+        listener = _float_manager()(check=False, port=args.port)
         try:
             listener.start_server(data_mapper=print)
         except KeyboardInterrupt:
@@ -41,24 +120,62 @@ def _sole_commands(args):
             logger.info("Closing i3-grid socket...")
         finally:
             exit(0)
+    if "daemon" in args.actions:
+        assert (
+            len(args.actions)
+        ) == 1, "'Daemon' is a sole command. Do not pass additional actions"
+        try:
+            from i3grid.daemon import GridDaemon
+        except ModuleNotFoundError:
+            from daemon import GridDaemon
+        try:
+            GridDaemon().serve_forever()
+        except KeyboardInterrupt:
+            print()
+            logger.info("Closing i3-grid daemon...")
+        finally:
+            exit(0)
 
 
-if __name__ == "__main__":
+def main() -> None:
+    # Logger for stdout
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s %(levelname)s |i3-grid %(lineno)d]: %(message)s",
+    )
     if "debug" in sys.argv:
         _debugger()
         exit(0)
-    try:
-        doc = Documentation()
-    except NameError:
-        logger.critical("Missing Documentation (doc.py). Exiting..")
-        exit(1)
+    if sys.argv[1:2] == ["rofi"]:  # Rofi script mode, the entry is no action
+        exit(_rofi(sys.argv[2:]))
     comx = list(Documentation.actions)
-    parser = doc.build_parser(choices=comx)
-    args = parser.parse_args()
-    # Check for sole commands (Static for now, only 1 value)
-    _sole_commands(args)
-    manager = FloatManager(commands=comx, **args.__dict__,)
-    if not manager._TERMSIG:
-        for action in args.actions:
+    argv = Documentation.expand_names(sys.argv[1:])
+    args = _fast_args(argv)
+    if args is None:
+        try:
+            doc = Documentation()
+        except NameError:
+            logger.critical("Missing Documentation (doc.py). Exiting..")
+            exit(1)
+        parser = doc.build_parser(choices=comx)
+        parsed = parser.parse_args(argv)
+        # Check for sole commands (Static for now, only 1 value)
+        _sole_commands(parsed)
+        args = parsed.__dict__
+    manager = _float_manager()(commands=comx, **args)
+    timings = args.get("timings", False)
+    if timings:
+        print(manager.timer.format(manager.startup_timings, "startup: "))
+    if manager._TERMSIG:
+        if timings:
+            print(manager.timer.format(manager.timings, "all: "))
+    else:
+        for action in args["actions"]:
             manager.run(cmd=action)
+            if timings:
+                print(manager.timer.format(manager.timings, f"{action}: "))
     exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# FloatManager for asyncio applications. The planning code is the one of
+# FloatManager; only its i3 I/O (FloatUtils.query, dispatch and
+# dispatch_batch) is replaced. The state an action reads is fetched
+# before it runs, concurrently over the pipelined aioipc connection, and
+# the commands it dispatches are collected and sent as a single i3
+# message once it is planned. Nothing blocks the event loop on i3.
+
+import asyncio
+import inspect
+from typing import List, Mapping
+
+try:
+    from . import ipc
+    from .aioipc import AsyncConnection
+    from .grid import FloatManager, Location
+except ImportError:
+    # cli
+    import ipc
+    from aioipc import AsyncConnection
+    from grid import FloatManager, Location
+
+# i3 commands of the Utils.dispatch_i3msg_com commands
+COMMANDS = {
+    "resize": ["resize set {0} {1}"],
+    "move": ["move window position {0} {1}"],
+    "float": ["floating enable"],
+    "reset": ["resize set {0}ppt {0}ppt", "move window position center"],
+    "custom": ["resize set {0} {0}", "move window position center"],
+}
+# The i3 state read by a manager (FloatUtils.query)
+STATE = (ipc.GET_OUTPUTS, ipc.GET_WORKSPACES, ipc.GET_TREE)
+
+
+async def fetch(conn: AsyncConnection, msg_types=STATE) -> dict:
+    """{message type: reply} of the i3 queries, all in flight at once."""
+    replies = await asyncio.gather(*(conn.get(t) for t in msg_types))
+    return dict(zip(msg_types, replies))
+
+
+class AsyncFloatManager(FloatManager):
+    """FloatManager with awaitable run, all_override and refresh. Create
+    it with `await AsyncFloatManager.create(**kwargs)` (the FloatManager
+    kwargs, and optionally an aioipc connection `conn` to share with
+    other managers). Managers sharing a connection run concurrently; the
+    actions of one manager run one at a time. Actions are not profiled."""
+
+    def __init__(self, conn: AsyncConnection, replies: dict, **kwargs) -> None:
+        self.conn = conn
+        self.replies = replies  # The last fetched reply per message type
+        self.outbox = []  # Commands dispatched by the action being planned
+        self.lock = asyncio.Lock()
+        super().__init__(**kwargs)
+
+    @classmethod
+    async def create(
+        cls, conn: AsyncConnection = None, **kwargs
+    ) -> "AsyncFloatManager":
+        # Applied once the manager exists (all_override is a coroutine)
+        terms = {k: kwargs.pop(k) for k in ("all", "floating") if k in kwargs}
+        if any(terms.values()) and "actions" not in kwargs:
+            raise ValueError("Missing kwargs `actions` for all_override")
+        owned = conn is None
+        conn = conn or await AsyncConnection.connect()
+        try:
+            manager = cls(conn, await fetch(conn), **kwargs)
+            if any(terms.values()):
+                floating = terms.get("floating", False)
+                await manager.all_override(kwargs["actions"], floating=floating)
+                manager._TERMSIG = True
+        except BaseException:
+            if owned:  # Nobody else can close it
+                await conn.close()
+            raise
+        return manager
+
+    # i3 I/O of FloatUtils
+
+    def query(self, msg_type: int) -> object:
+        """The reply of the last fetch (fetched before every action)."""
+        if msg_type not in self.replies:
+            raise RuntimeError(f"i3 message type {msg_type} was not fetched")
+        return self.replies[msg_type]
+
+    def dispatch(self, command: str, data: Location = None) -> None:
+        if data is None:
+            args = ()
+        elif isinstance(data, Location):
+            args = (max(data.width, 0), max(data.height, 0))
+        else:
+            args = (data,)
+        self.outbox += [c.format(*args) for c in COMMANDS[command]]
+
+    def dispatch_batch(self, commands: List[str]) -> None:
+        self.outbox += commands
+
+    def hide_scratchpad(self, **kwargs) -> None:
+        id = kwargs.get("id", None)
+        con = f"[con_id={id}] " if id else ""
+        self.outbox.append(f"{con}scratchpad show")
+
+    def focus_window(self, **kwargs) -> None:
+        if not kwargs.get("id"):
+            raise ValueError("No `id` kwargs given for window focus.")
+        self.outbox.append(f"[con_id={kwargs['id']}] focus")
+
+    async def start_server(self, data_mapper=None, **kwargs) -> None:
+        """The middleware event broker, in the running event loop."""
+        try:
+            from .broker import EventBroker
+        except ImportError:
+            # cli
+            from broker import EventBroker
+
+        broker = EventBroker(self.host, self.config["socketPort"], data_mapper)
+        await broker.serve_forever()
+
+    async def fetch(self, *msg_types: int) -> None:
+        """Fetches the i3 state (default: outputs, workspaces and tree)."""
+        self.replies.update(await fetch(self.conn, msg_types or STATE))
+
+    async def flush(self) -> list:
+        """Sends the dispatched commands as one i3 message. Returns the
+        i3 results (one per command)."""
+        commands, self.outbox = self.outbox, []
+        if not commands:
+            return []
+        return await self.conn.command("; ".join(commands))
+
+    # Awaitable FloatManager API
+
+    async def refresh(self) -> None:
+        """Awaitable FloatManager.refresh."""
+        async with self.lock:
+            await self.fetch(ipc.GET_OUTPUTS, ipc.GET_WORKSPACES)
+            super().refresh()
+
+    async def run(self, cmd: str, config: Mapping = None, **kwargs) -> list:
+        """Awaitable FloatManager.run. Returns what the action returns,
+        else the i3 results of the commands it sent."""
+        if cmd not in self.com_map:
+            raise KeyError("No corresponding run command to input:", cmd)
+
+        with_timings = kwargs.pop("timings", False)
+        async with self.lock:
+            self.timer.reset()
+            with self.configured(config):
+                result = await self._run(cmd, **kwargs)
+            self.timings = self.timer.snapshot()
+            self.publish(cmd)
+        return (result, self.timings) if with_timings else result
+
+    async def _run(self, cmd: str, **kwargs) -> list:
+        passive = cmd in self.passive_actions
+        _ak = kwargs.get("all", False) or cmd in self.window_actions
+        self.fresh = set()  # Only the state read for this action is trusted
+        try:
+            if not passive:
+                with self.timer.phase("focus"):
+                    await self.fetch(ipc.GET_TREE)
+            self.post_commands(all_key=_ak, passive=passive)
+            with self.timer.phase("dispatch"):
+                # These place every window
+                flagged = cmd not in self.window_actions and self.run_flags()
+            if flagged and self.needs_geometry(cmd):
+                with self.timer.phase("dispatch"):
+                    await self.flush()
+                with self.timer.phase("focus"):
+                    await self.fetch(ipc.GET_TREE)
+                self.post_commands(all_key=_ak)  # The window size changed
+            with self.timer.phase("dispatch"):
+                result = self.com_map[cmd](**kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                replies = await self.flush()
+            return result or replies
+        finally:
+            self.outbox = []  # Never sent with the next action
+            self.fresh = set()  # The window (or the focus) may change
+
+    async def all_override(
+        self, commands: list, config: Mapping = None, **kwargs
+    ) -> List[tuple]:
+        """Awaitable FloatManager.all_override."""
+        async with self.lock:
+            self.timer.reset()
+            try:
+                with self.configured(config):
+                    with self.timer.phase("focus"):
+                        await self.fetch(ipc.GET_TREE)
+                    self._all_override(commands, **kwargs)
+                    with self.timer.phase("dispatch"):
+                        await self.flush()
+            finally:
+                self.outbox = []
+            self.timings = self.timer.snapshot()
+            self.fresh = set()  # Every window was placed
+            for cmd in commands:  # One event per action (not per window)
+                self.publish(cmd)
+        return self.current_windows
+
+    async def close(self) -> None:
+        """Closes the i3 connection (also for the managers sharing it)."""
+        await self.conn.close()
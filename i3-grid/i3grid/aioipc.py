@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Asyncio i3 IPC client (https://i3wm.org/docs/ipc.html), the event loop
+# counterpart of ipc.Connection. i3 answers the messages of a connection
+# in order, so requests are pipelined: every request queues a future and
+# a single reader task resolves them as the replies come in. Any number
+# of queries and commands may be in flight on one connection. Events
+# (subscribed connections) are queued for next_event.
+
+import asyncio
+import collections
+import json
+import os
+from typing import List, Tuple
+
+try:
+    from . import ipc
+except ImportError:
+    # cli
+    import ipc
+
+
+async def socket_path() -> str:
+    """ipc.socket_path without blocking the event loop."""
+    path = os.environ.get("I3SOCK")
+    if path:
+        return path
+    proc = await asyncio.create_subprocess_exec(
+        "i3", "--get-socketpath", stdout=asyncio.subprocess.PIPE
+    )
+    out, _ = await proc.communicate()
+    return out.decode("utf-8").strip()
+
+
+class AsyncConnection:
+    """Asyncio connection to the i3 IPC socket. Create it with
+    `await AsyncConnection.connect()`."""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        super().__init__()
+        self.reader, self.writer = reader, writer
+        self.pending = collections.deque()  # Futures of the requests in flight
+        self.events = asyncio.Queue()  # (event name, payload)
+        self.error = None  # Why the connection is closed
+        self.write_lock = asyncio.Lock()  # Frames and futures in the same order
+        self.reader_task = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, path: str = None) -> "AsyncConnection":
+        reader, writer = await asyncio.open_unix_connection(path or await socket_path())
+        return cls(reader, writer)
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                header = await self.reader.readexactly(ipc.HEADER.size)
+                magic, length, msg_type = ipc.HEADER.unpack(header)
+                if magic != ipc.MAGIC:
+                    raise ConnectionError(f"Invalid i3 IPC magic: {magic}")
+                body = await self.reader.readexactly(length)
+                payload = json.loads(body.decode("utf-8"))
+                if msg_type & ipc.EVENT_MASK:
+                    name = ipc.EVENT_TYPES.get(msg_type & ~ipc.EVENT_MASK)
+                    self.events.put_nowait((name or str(msg_type), payload))
+                    continue
+                future = self.pending.popleft()
+                if not future.done():  # Not cancelled by the caller
+                    future.set_result(payload)
+        except asyncio.IncompleteReadError:
+            self.error = ConnectionError("i3 closed the IPC socket")
+        except (OSError, ValueError, IndexError) as e:
+            self.error = e if isinstance(e, ConnectionError) else ConnectionError(e)
+        except asyncio.CancelledError:
+            self.error = ConnectionError("The IPC connection was closed")
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(self.error)
+
+    async def get(self, msg_type: int, payload: str = "") -> object:
+        """Sends a message and waits for its (decoded) reply. Other
+        requests may be sent meanwhile."""
+        if self.error is not None:
+            raise self.error
+        future = asyncio.get_running_loop().create_future()
+        async with self.write_lock:
+            self.pending.append(future)
+            self.writer.write(ipc.pack(msg_type, payload))
+            await self.writer.drain()
+        return await future
+
+    async def command(self, payload: str) -> list:
+        return await self.get(ipc.COMMAND, payload)
+
+    async def subscribe(self, events: List[str]) -> bool:
+        return (await self.get(ipc.SUBSCRIBE, json.dumps(events)))["success"]
+
+    async def next_event(self) -> Tuple[str, dict]:
+        """Waits for the next event (subscribed connections only)."""
+        return await self.events.get()
+
+    async def close(self) -> None:
+        self.reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+    async def __aenter__(self) -> "AsyncConnection":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
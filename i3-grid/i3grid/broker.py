@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# The middleware event broker (listen action). Publishers (every i3-grid
+# run) and subscribers connect to the same port; each event is fanned out
+# to every subscriber through its own bounded queue, so a slow subscriber
+# only loses its own oldest events instead of blocking the others.
+# Subscribers may filter commands and fields; publishers are told the
+# union of the filters and do not send what nobody listens to.
+
+import asyncio
+import json
+import logging
+from typing import Callable, Dict
+
+try:
+    from . import events
+except ImportError:
+    # cli
+    import events
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(
+        self, writer: asyncio.StreamWriter, size: int, interest: dict = None
+    ) -> None:
+        super().__init__()
+        self.writer = writer
+        self.interest = interest or events.EVERYTHING
+        self.queue = asyncio.Queue(maxsize=size)
+        self.encoder = events.EventEncoder()  # Deltas of this connection
+        self.dropped = 0
+
+    def offer(self, event: dict) -> None:
+        """Queues the event, dropping the oldest one when full. Events
+        are only encoded when sent, so drops never break the deltas."""
+        if not events.wants(self.interest, event):
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """Asyncio TCP broker for the middleware events. `data_mapper` is
+    called in process with every (full) event, as JSON bytes."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        data_mapper: Callable = None,
+        queue_size: int = 256,
+    ) -> None:
+        super().__init__()
+        self.host, self.port = host, port
+        self.data_mapper = data_mapper
+        self.queue_size = queue_size
+        self.subscribers: Dict[asyncio.StreamWriter, Subscriber] = {}
+        self.publishers = set()
+        self.tasks = set()  # Connection handlers
+        self.interest = self._interest()
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Binding to: {self.host}/{self.port}")
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self) -> None:
+        self.server.close()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def _interest(self) -> dict:
+        """Union of the subscriber filters (everything for data_mapper)."""
+        interests = [s.interest for s in self.subscribers.values()]
+        if self.data_mapper is not None:
+            interests.append(events.EVERYTHING)
+        return events.union(interests) if interests else events.NOTHING
+
+    def _update_interest(self) -> None:
+        interest = self._interest()
+        if interest != self.interest:
+            self.interest = interest
+            for writer in self.publishers:
+                writer.write(events.frame(events.INTEREST, interest))
+
+    def publish(self, event: dict) -> None:
+        if self.data_mapper is not None:
+            try:
+                self.data_mapper(json.dumps(event).encode("utf-8"))
+            except Exception:  # A failing callback must not stop the broker
+                logger.exception("Middleware data_mapper failed")
+        for subscriber in self.subscribers.values():
+            subscriber.offer(event)
+
+    async def _read_frame(self, reader: asyncio.StreamReader) -> tuple:
+        """(kind, generation, body) of the next frame, None at EOF."""
+        try:
+            header = await reader.readexactly(events.HEADER.size)
+            magic, version, kind, generation, length = events.HEADER.unpack(header)
+            if magic != events.MAGIC or version != events.VERSION:
+                raise ValueError(f"Unsupported event frame: {magic} v{version}")
+            if length > events.MAX_FRAME:
+                raise ValueError(f"Frame of {length} bytes")
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return None
+        return kind, generation, json.loads(body) if body else None
+
+    async def _handle(self, reader, writer) -> None:
+        self.tasks.add(asyncio.current_task())
+        # Publishers wait for the interest before sending (subscribers
+        # ignore it), so it goes out before knowing the peer kind
+        self.publishers.add(writer)
+        writer.write(events.frame(events.INTEREST, self.interest))
+        try:
+            received = await self._read_frame(reader)
+            if received is not None and received[0] == events.SUBSCRIBE:
+                self.publishers.discard(writer)
+                await self._serve_subscriber(reader, writer, received[2])
+                return
+            decoder = events.EventDecoder()
+            while received is not None:
+                event = decoder.apply(*received)
+                if event is not None:
+                    event.pop("generation")  # Of the publisher connection
+                    self.publish(event)
+                received = await self._read_frame(reader)
+        except (ConnectionError, ValueError, TypeError) as e:
+            logger.warning(f"Dropped middleware connection: {e}")
+        finally:
+            self.publishers.discard(writer)
+            self.tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def _serve_subscriber(self, reader, writer, interest: dict) -> None:
+        interest = {key: (interest or {}).get(key) for key in events.EVERYTHING}
+        for value in interest.values():
+            if value is not None and not isinstance(value, list):
+                raise ValueError(f"Invalid subscription: {interest}")
+        subscriber = Subscriber(writer, self.queue_size, interest)
+        self.subscribers[writer] = subscriber
+        self._update_interest()
+        # The subscriber never sends after subscribing, EOF means it left
+        closed = asyncio.ensure_future(reader.read())
+        get = None
+        try:
+            while True:
+                get = asyncio.ensure_future(subscriber.queue.get())
+                done, _ = await asyncio.wait(
+                    {get, closed}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if closed in done:
+                    return
+                event = events.project(get.result(), subscriber.interest)
+                writer.write(subscriber.encoder.encode(event))
+                await writer.drain()
+        finally:
+            closed.cancel()
+            if get is not None:
+                get.cancel()
+            del self.subscribers[writer]
+            self._update_interest()
+            if subscriber.dropped:
+                logger.warning(
+                    f"Subscriber lagged, dropped {subscriber.dropped} events"
+                )
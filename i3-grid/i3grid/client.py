@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Thin client for the i3-grid daemon (python -m i3grid daemon).
+# The argv is forwarded as is over a UNIX socket and the daemon replies
+# with the result. This module must only depend on the standard library,
+# as its whole purpose is to skip the import and i3 sync cost of a cold
+# `python -m i3grid` run. If no daemon is listening, the client falls
+# back to the cold path with the same arguments.
+
+import json
+import os
+import socket
+import sys
+from typing import List
+
+# Arguments that only make sense in the cold (cli) process
+COLD_ARGS = {"-h", "--help", "listen", "daemon", "debug", "rofi"}
+
+
+def socket_path() -> str:
+    """The daemon socket location. Overridable with $I3GRID_SOCKET."""
+    if os.environ.get("I3GRID_SOCKET"):
+        return os.environ["I3GRID_SOCKET"]
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "i3grid.sock")
+    return f"/tmp/i3grid-{os.getuid()}.sock"
+
+
+def send(argv: List[str], path: str = None, timeout: float = 5.0) -> dict:
+    """Sends the argv to the daemon and returns the decoded response.
+    Raises OSError if the daemon is not reachable."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path or socket_path())
+        s.sendall(json.dumps(argv).encode("utf-8"))
+        s.shutdown(socket.SHUT_WR)  # EOF marks the end of the request
+        chunks = []
+        while True:
+            data = s.recv(4096)
+            if not data:
+                break
+            chunks.append(data)
+    return json.loads(b"".join(chunks).decode("utf-8"))
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and not COLD_ARGS.intersection(argv):
+        try:
+            response = send(argv)
+        except (OSError, ValueError):
+            response = None  # No (healthy) daemon, use the cold path
+        if response is not None:
+            if response.get("output"):
+                print(response["output"])
+            if response["status"] != "ok":
+                print(f"i3grid: {response['message']}", file=sys.stderr)
+                return 1
+            return 0
+    os.execv(sys.executable, [sys.executable, "-m", "i3grid"] + argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
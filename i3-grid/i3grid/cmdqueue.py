@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Command queue in front of FloatManager.run. A held hotkey (or a script)
+# sends bursts of placements for the same window, and each of them used
+# to sync the state and dispatch on its own. Queued requests that only
+# place the focused window are dropped when a later request for the
+# same window sets at least as much (move, resize, float), so a burst
+# costs one placement. The queue can wait for the burst to end first
+# (commandDebounce, milliseconds).
+
+import logging
+import time
+from typing import List, Optional
+
+try:
+    from . import ipc
+    from .grid import Utils
+    from .tree import TreeIndex
+except ImportError:
+    # cli
+    import ipc
+    from grid import Utils
+    from tree import TreeIndex
+
+logger = logging.getLogger(__name__)
+
+# What each placement action sets on the focused window. Requests with
+# any other action (float toggles, hide, layouts...) are never dropped
+PLACEMENTS = {
+    "center": {"move"},
+    "snap": {"move"},
+    "multi": {"move", "resize"},
+    "csize": {"move", "resize"},
+    "reset": {"move", "resize"},
+}
+
+
+class Request:
+    """One queued invocation: the actions and their cli flags (the
+    argparse names: target, rows, multis, noresize...)."""
+
+    def __init__(self, actions: List[str], flags: dict, window: int) -> None:
+        super().__init__()
+        self.actions = list(actions)
+        self.flags = flags
+        self.window = window  # con_id focused when it was queued
+        self.effects = None  # What it sets, None if it can not be dropped
+        self.superseded = None  # The later request that replaced it
+        self.result = self.error = None
+        self.timings = []  # (action, FloatManager.timings) of the run
+
+
+class CommandQueue:
+    """Coalescing queue of FloatManager requests. Every request runs
+    from the config the queue was created with (plus its own flags),
+    like a fresh cli process would."""
+
+    def __init__(self, manager, debounce: float = None) -> None:
+        super().__init__()
+        self.manager = manager
+        # Config snapshot after the rc file; on the fly flags do not leak
+        self.defaults = manager.config
+        if debounce is None:
+            debounce = self.defaults["commandDebounce"] / 1000
+        self.debounce = debounce  # Seconds of quiet that end a burst
+        self.pending: List[Request] = []
+        self.collapsed = 0  # Requests dropped since the queue was created
+        self.last = 0.0  # Monotonic time of the last submit
+
+    def focused_window(self) -> Optional[int]:
+        """The con_id of the focused window (from the manager state cache
+        when it has one)."""
+        cache = self.manager.state_cache
+        if cache is not None:
+            node = cache.focused_node()
+        else:
+            node = TreeIndex(ipc.default_connection().get(ipc.GET_TREE)).focused()
+        return node and node["id"]
+
+    def effects(self, actions: List[str], flags: dict) -> Optional[set]:
+        """What the request sets on the window (the auto float and resize
+        flags included). None if it does anything else."""
+        if flags.get("all") or flags.get("floating") or flags.get("profile"):
+            return None
+        if not actions or any(a not in PLACEMENTS for a in actions):
+            return None
+        effects = set().union(*(PLACEMENTS[a] for a in actions))
+        if self.defaults["autoConvertToFloat"] and not flags.get("nofloat"):
+            effects.add("float")
+        if self.defaults["autoResize"] and not flags.get("noresize"):
+            effects.add("resize")
+        return effects
+
+    def submit(self, actions: List[str], window: int = None, **flags) -> Request:
+        """Queues the actions with their flags, for the window (default:
+        the focused one). Drops the pending placements of the window
+        that this request overrides."""
+        effects = self.effects(actions, flags)
+        if window is None and effects is not None:  # Only placements drop
+            window = self.focused_window()
+        request = Request(actions, flags, window)
+        request.effects = effects
+        if effects is not None and window is not None:
+            for pending in reversed(self.pending):
+                if pending.window is None:
+                    break  # Not a placement, may change any window
+                if pending.window != window:
+                    continue
+                if pending.effects is None:
+                    break  # Nothing before it can be dropped
+                if pending.effects <= request.effects:
+                    pending.superseded = request
+                    self.collapsed += 1
+            self.pending = [p for p in self.pending if p.superseded is None]
+        self.pending.append(request)
+        self.last = time.monotonic()
+        return request
+
+    def remaining(self) -> float:
+        """Seconds until the burst is over (debounce after the last submit)."""
+        return max(self.last + self.debounce - time.monotonic(), 0.0)
+
+    def flush(self, wait: bool = True) -> List[Request]:
+        """Runs the pending requests in order, after the debounce (if
+        wait). Failed requests keep their exception in `error`."""
+        if wait and self.remaining():
+            time.sleep(self.remaining())
+        pending, self.pending = self.pending, []
+        for request in pending:
+            try:
+                self.apply(request)
+            except Exception as e:  # The others still run
+                logger.exception(f"Failed request: {request.actions}")
+                request.error = e
+        return pending
+
+    def apply(self, request: Request) -> None:
+        """Runs one request on the manager."""
+        manager, flags = self.manager, request.flags
+        config = Utils.on_the_fly_override(config=self.defaults, **flags)
+        manager.refresh()
+        # argparse always passes the flag, None keeps the manager profile
+        profile = manager.profile
+        manager.profile = flags.get("profile") or profile
+        try:
+            if flags.get("all") or flags.get("floating"):
+                floating = flags.get("floating", False)
+                request.result = manager.all_override(
+                    request.actions, config=config, floating=floating
+                )
+                request.timings.append(("all", manager.timings))
+                return
+            for action in request.actions:
+                request.result = manager.run(cmd=action, config=config)
+                request.timings.append((action, manager.timings))
+        finally:
+            manager.profile = profile  # Only for this request
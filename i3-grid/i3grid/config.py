@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# The i3gridrc loader. The rc file is JSONC (JSON with // and /* */
+# comments and trailing commas); it is parsed as data (never evaluated),
+# validated against the defaults (BASE_CONFIG) and compiled into a
+# marshal cache keyed by the rc path, mtime and size. Unchanged rc files
+# are then loaded with a stat and a small read. Managers run from read
+# only snapshots of the config (freeze), so that the defaults are never
+# changed by a manager or a request.
+
+import json
+import logging
+import marshal
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the parser or the validation rules change (invalidates caches)
+CACHE_VERSION = 1
+
+
+def locations(name: str) -> List[str]:
+    """Where the rc file (name, i3gridrc by default) is looked for, in order."""
+    home = os.path.expanduser("~")
+    return [
+        f"{home}/.config/i3grid/{name}",
+        f"{home}/.config/{name}",
+        f"{home}/.{name}",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), f".{name}"),
+    ]
+
+
+def find(name: str) -> Optional[str]:
+    """The first existing rc file of locations(name). None if there is none."""
+    for loc in locations(name):
+        if os.path.isfile(loc):
+            return loc
+    return None
+
+
+def cache_path(name: str) -> str:
+    """Location of the i3-grid cache files ($XDG_CACHE_HOME/i3grid)."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "i3grid", name)
+
+
+def strip_jsonc(text: str) -> str:
+    """Removes the comments and trailing commas outside of strings."""
+    out, i, n = [], 0, len(text)
+    while i < n:
+        c = text[i]
+        if c == '"':  # Copy strings verbatim (escapes included)
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i : j + 1])
+            i = j + 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = n if i < 0 else i
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            if end < 0:
+                raise ValueError("Unterminated /* comment in the rc file")
+            i = end + 2
+        elif c in "}]":
+            # Drop a trailing comma (and the whitespace after it)
+            k = len(out) - 1
+            while k >= 0 and out[k].isspace():
+                k -= 1
+            if k >= 0 and out[k] == ",":
+                del out[k]
+            out.append(c)
+            i += 1
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+def parse_jsonc(text: str) -> dict:
+    try:
+        config = json.loads(strip_jsonc(text))
+    except json.JSONDecodeError as e:
+        raise ValueError(
+            f"Incorrect i3gridrc file syntax ({e}). Please"
+            " follow jsonc guidelines and example."
+        )
+    if not isinstance(config, dict):
+        raise ValueError("The i3gridrc file must hold a single object")
+    return config
+
+
+def freeze(value) -> object:
+    """Read only (deep) copy of a config value: objects are mappingproxies
+    and lists are tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value) -> object:
+    """Mutable (deep) copy of a config value, the inverse of freeze."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _is_type(value, default) -> bool:
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, int):
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, type(default))
+
+
+def _check_grid(name: str, grid) -> None:
+    if not isinstance(grid, dict):
+        raise ValueError(f"{name} must be an object with rows and columns")
+    for axis, key in (("rows", "rowWeights"), ("columns", "columnWeights")):
+        value = grid.get(axis)
+        if not _is_type(value, 0) or value < 1:
+            raise ValueError(f"{name}.{axis} must be a positive integer")
+        weights = grid.get(key)
+        if weights is None:
+            continue
+        if (
+            not isinstance(weights, list)
+            or len(weights) != value
+            or not all(_is_type(w, 0) or _is_type(w, 0.0) for w in weights)
+            or not all(w > 0 for w in weights)
+        ):
+            raise ValueError(f"{name}.{key} must be {axis} positive numbers")
+
+
+def _check_offset(name: str, offset) -> None:
+    if (
+        not isinstance(offset, list)
+        or len(offset) != 4
+        or not all(_is_type(v, 0) for v in offset)
+    ):
+        raise ValueError(f"{name} must be 4 integers: [top, right, bottom, left]")
+
+
+def validate(config: dict, schema: dict) -> dict:
+    """The rc values that can be merged into the schema (the defaults).
+    Unknown keys are ignored (with a warning), null values mean default.
+    Raises ValueError for values of the wrong type."""
+    valid = {}
+    for key, value in config.items():
+        if key not in schema:
+            logger.warning(f"Ignoring unknown i3gridrc key: {key}")
+            continue
+        if value is None:
+            continue
+        default = schema[key]
+        if key == "multis":
+            if value != 0 and not isinstance(value, list):
+                raise ValueError("multis must be 0 or a list of grid numbers")
+        elif not _is_type(value, default):
+            raise ValueError(
+                f"i3gridrc key {key} must be of type {type(default).__name__}"
+            )
+        if key == "defaultGrid":
+            _check_grid(key, value)
+        elif key == "gridOffset":
+            _check_offset(key, value)
+        elif key in ("gridPresets", "outputGrids"):
+            for name, preset in value.items():
+                _check_grid(f"{key}.{name}", preset)
+                if "gridOffset" in preset:
+                    offset = preset["gridOffset"]
+                    _check_offset(f"{key}.{name}.gridOffset", offset)
+        valid[key] = value
+    return valid
+
+
+def _schema_key(schema: dict) -> list:
+    types = sorted(f"{k}:{type(v).__name__}" for k, v in schema.items())
+    return [CACHE_VERSION] + types
+
+
+def load(path: str, schema: dict, cache_file: str = None) -> Dict[str, object]:
+    """The validated rc file at path, served from the compiled cache
+    while the file (path, mtime, size) and the schema are unchanged."""
+    st = os.stat(path)
+    key = [os.path.abspath(path), st.st_mtime_ns, st.st_size] + _schema_key(schema)
+    if cache_file:
+        try:
+            with open(cache_file, "rb") as f:
+                cached = marshal.load(f)
+            if cached["key"] == key:
+                return cached["config"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass  # Missing or stale format, recompile
+
+    with open(path, "r") as f:
+        config = validate(parse_jsonc(f.read()), schema)
+    if cache_file:
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                marshal.dump({"key": key, "config": config}, f)
+            os.replace(tmp, cache_file)
+        except OSError:
+            logger.warning(f"Could not write the config cache: {cache_file}")
+    return config
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+from typing import List, Optional, Union
+
+try:
+    from .client import socket_path
+    from .cmdqueue import CommandQueue, Request
+    from .doc import Documentation
+    from .grid import FloatManager
+    from .state import StateCache
+except ImportError:
+    # cli
+    from client import socket_path
+    from cmdqueue import CommandQueue, Request
+    from doc import Documentation
+    from grid import FloatManager
+    from state import StateCache
+
+logger = logging.getLogger(__name__)
+
+
+# Requests queued at most per burst, a steady stream is still served
+MAX_BURST = 64
+
+
+class GridDaemon:
+    """Long lived i3-grid process. Keeps a warm FloatManager (config,
+    display map, cached grid, xrandr configuration and an event driven
+    i3 state cache) and serves the argv of thin clients (client.py)
+    over a local UNIX socket. The requests of a burst go through the
+    command queue (cmdqueue.py), so superseded placements are skipped."""
+
+    # Actions that need their own process
+    sole_actions = {"listen", "daemon", "rofi"}
+
+    def __init__(self, path: str = None, debounce: float = None) -> None:
+        super().__init__()
+        self.path = path or socket_path()
+        self.commands = list(Documentation.actions)
+        self.parser = Documentation().build_parser(choices=self.commands)
+        # i3 events keep the tree model warm between requests
+        self.state = StateCache()
+        self.manager = FloatManager(commands=self.commands, state_cache=self.state)
+        # Every request starts from the config after the rc file (the
+        # queue defaults), so on the fly flags do not leak.
+        self.queue = CommandQueue(self.manager, debounce)
+
+    def serve_forever(self) -> None:
+        """Binds the UNIX socket and serves the connections, a burst at
+        a time."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Stale socket from a previous daemon
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.bind(self.path)
+            os.chmod(self.path, 0o600)
+            s.listen()
+            logger.info(f"i3-grid daemon listening on: {self.path}")
+            try:
+                while True:
+                    conn, _ = s.accept()
+                    self.serve_burst(s, conn)
+            finally:
+                os.unlink(self.path)
+
+    def serve_burst(self, s: socket.socket, conn: socket.socket) -> None:
+        """Queues the request of conn and of the connections that follow
+        within the debounce (or are already waiting), then runs the queue
+        once and answers every connection."""
+        burst = []
+        while conn is not None:
+            burst.append((conn, self.submit(self.read(conn))))
+            conn = self.next_connection(s) if len(burst) < MAX_BURST else None
+        self.queue.flush(wait=False)
+        requests = [r for _, r in burst if isinstance(r, Request)]
+        collapsed = sum(r.superseded is not None for r in requests)
+        if collapsed:
+            logger.info(f"Collapsed {collapsed} of {len(requests)} requests")
+        for conn, request in burst:
+            with conn:
+                if isinstance(request, Request):
+                    request = self.response(request, collapsed)
+                try:
+                    conn.sendall(json.dumps(request).encode("utf-8"))
+                except OSError:
+                    pass  # The client gave up
+
+    def next_connection(self, s: socket.socket) -> Optional[socket.socket]:
+        """The next waiting connection, within the debounce. None once the
+        burst is over."""
+        s.settimeout(self.queue.remaining())  # 0: only the waiting ones
+        try:
+            conn, _ = s.accept()
+        except (BlockingIOError, socket.timeout):
+            return None
+        finally:
+            s.settimeout(None)
+        conn.setblocking(True)
+        return conn
+
+    def read(self, conn: socket.socket) -> object:
+        """The decoded argv of the connection."""
+        chunks = []
+        try:
+            while True:  # The client closes its write end after the argv
+                data = conn.recv(4096)
+                if not data:
+                    break
+                chunks.append(data)
+            return json.loads(b"".join(chunks).decode("utf-8"))
+        except (OSError, ValueError) as e:
+            return {"status": "error", "message": f"Bad request: {e}"}
+
+    def submit(self, argv: List[str]) -> Union[Request, dict]:
+        """Queues the argv. The error response if it can not be run."""
+        if isinstance(argv, dict):
+            return argv  # Could not be read
+        out = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                args = self.parser.parse_args(Documentation.expand_names(argv))
+        except SystemExit:
+            return {"status": "error", "message": out.getvalue().strip()}
+        if self.sole_actions.intersection(args.actions):
+            return {
+                "status": "error",
+                "message": f"{self.sole_actions} cannot be run by the daemon",
+            }
+        flags = {k: v for k, v in args.__dict__.items() if k != "actions"}
+        try:
+            return self.queue.submit(args.actions, **flags)
+        except Exception as e:  # Keep serving (Ex: i3 restarted)
+            logger.exception(f"Failed request: {argv}")
+            return {"status": "error", "message": f"{type(e).__name__}: {e}"}
+
+    def response(self, request: Request, collapsed: int = 0) -> dict:
+        if request.error is not None:
+            e = request.error
+            message = f"{type(e).__name__}: {e}"
+            return {"status": "error", "message": message, "collapsed": collapsed}
+        output = ""
+        if request.flags.get("timings") and request.superseded is None:
+            output = "\n".join(
+                self.manager.timer.format(t, f"{action}: ")
+                for action, t in request.timings
+            )
+        return {"status": "ok", "output": output, "collapsed": collapsed}
+
+    def handle(self, argv: List[str]) -> dict:
+        """Runs the argv against the warm manager. Mirrors the cli
+        (__main__) flow without the process and i3 sync startup."""
+        request = self.submit(argv)
+        if not isinstance(request, Request):
+            return request
+        self.queue.flush(wait=False)
+        return self.response(request)
@@ -18,53 +18,24 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from argparse import (
-    SUPPRESS,
-    Action,
-    ArgumentParser,
-    HelpFormatter,
-    RawTextHelpFormatter,
-)
-
-
-class CustomFormatter(HelpFormatter):
-    """Custom Formatter used for documentation
-    in order to add groups and include metadata
-    for each command."""
-
-    def _format_action_invocation(self, action) -> str:
-        if not action.option_strings:
-            (metavar,) = self._metavar_formatter(action, action.dest)(1)
-            return metavar
-        else:
-            parts = []
-            if action.nargs == 0:
-                # if the Optional doesn't take a value, format the value
-                parts.extend(action.option_strings)
-            else:
-                # if the Optional takes a value, format as is
-                default = action.dest.upper()
-                args_string = self._format_args(action, default)
-                for option_string in action.option_strings:
-                    parts.append("%s %s" % (option_string, args_string))
-            if sum(len(s) for s in parts) < self._width - (len(parts) - 1) * 2:
-                return ", ".join(parts)
-            else:
-                return ",\n  ".join(parts)
-
-
-class NoAction(Action):
-    """Parser default setting changes to
-    help action calling. Allows for individual
-    groups per namespace."""
-
-    def __init__(self, **kwargs) -> None:
-        kwargs.setdefault("default", SUPPRESS)
-        kwargs.setdefault("nargs", 0)
-        super(NoAction, self).__init__(**kwargs)
-
-    def __call__(self, parser, namespace, values, option_string=None) -> None:
-        pass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # argparse is only imported to build the full parser
+    from argparse import ArgumentParser
+
+
+def grid_axis(value: str) -> "int | str":
+    """A --rows or --cols value: a count (Ex: 3) or the weights of every
+    row or column (Ex: 2:1:1 or 0.5:0.25:0.25)."""
+    parts = value.split(":")
+    try:
+        numbers = [float(p) for p in parts]
+    except ValueError:
+        numbers = []
+    count = len(parts) == 1
+    if not numbers or min(numbers) <= 0 or (count and not value.isdigit()):
+        raise ValueError(f"Not a grid count or weights: {value}")
+    return int(value) if count else value
 
 
 class Documentation:
@@ -93,18 +64,61 @@ class Documentation:
                 " default: 65433)"
             ),
             "multi": ("Stretch a window across a range of numbers (Use flag 'multis')"),
+            "arrange": (
+                "Tile every floating window of the workspace on the grid that"
+                " fits their number best (one i3 message, gridOffset is kept)"
+            ),
+            "save-layout": (
+                "Save where every floating window of the workspace is, as the"
+                " named layout (save-layout <name>)"
+            ),
+            "restore-layout": (
+                "Put the windows of the workspace back where a saved layout"
+                " had them, in one i3 message (restore-layout <name>)"
+            ),
+            "daemon": (
+                "Keeps a warm i3-grid process (sole action) that serves the"
+                " thin client: python -m i3grid.client <action> <flags>"
+            ),
+            "rofi": (
+                "Rofi script mode menu of the grid (sole action). Ex: rofi -show"
+                " grid -modi 'grid:python -m i3grid rofi [--preset <name>]'"
+            ),
         }
 
+    # Actions that take a name (`save-layout NAME` is `--layout NAME`)
+    named_actions = {"save-layout": "--layout", "restore-layout": "--layout"}
+
+    @staticmethod
+    def expand_names(argv: list) -> list:
+        """Moves the name after a named action to its flag, at the end of
+        argv (argparse takes every positional as an action)."""
+        args, flags, i = [], [], 0
+        while i < len(argv):
+            args.append(argv[i])
+            flag = Documentation.named_actions.get(argv[i])
+            nxt = argv[i + 1] if i + 1 < len(argv) else ""
+            if flag and nxt[:1] not in ("", "-") and nxt not in Documentation.actions:
+                flags += [flag, nxt]
+                i += 1
+            i += 1
+        return args + flags
+
     def __init__(self,) -> None:
         super().__init__()
         _rc_def = "(default in rc file)"
-        _slc_txt = lambda ax: f"Number of {ax} slices in screen grid {_rc_def}"
+        _slc_txt = lambda ax: (
+            f"Number of {ax} slices in screen grid, or their weights (Ex:"
+            f" 2:1:1 for a wide first {ax}) {_rc_def}"
+        )
         _ffa = lambda action: f"Flag for action: '{action}'"
         _ova = lambda auto: f"Override auto {auto} on the fly to be false"
-        _appl = lambda w: f"Applies the action(s) to all {w} windows in current workspace"
+        _appl = (
+            lambda w: f"Applies the action(s) to all {w} windows in current workspace"
+        )
         self.flags = {
-            "cols": {"type": "int", "help": _slc_txt("col")},
-            "rows": {"type": "int", "help": _slc_txt("row")},
+            "cols": {"type": "grid_axis", "help": _slc_txt("col")},
+            "rows": {"type": "grid_axis", "help": _slc_txt("row")},
             "offset": {
                 "type": "str",
                 "action": "append",
@@ -114,6 +128,22 @@ class Documentation:
                 " (Can take upto 4 integers. Less than 4 fills the remaining"
                 " values with 0. This example is the same as: --offset 10 0 0 0)",
             },
+            "preset": {
+                "type": "str",
+                "help": "Named grid from the rc file 'gridPresets' (rows, cols"
+                " and offset). Explicit --rows/--cols/--offset override it",
+            },
+            "output": {
+                "type": "str",
+                "help": "The output to place the window on: a name, a number,"
+                " primary or left/right/above/below of the focused output"
+                " (uses its grid from the rc file 'outputGrids')",
+            },
+            "layout": {
+                "type": "str",
+                "help": "Name of the layout to save or restore (Ex:"
+                " save-layout --layout research or save-layout research)",
+            },
             "perc": {
                 "type": "int",
                 "help": f"{_ffa('csize')} (Percentage of screen {{int}}[1-100])",
@@ -130,6 +160,12 @@ class Documentation:
                 " Ex (4x4 grid): '1 2 3 4' or '1 4' (horizontal) or '1 5 9 13'"
                 "or '1 13' (vertical)  or '1 8' (2 horizontal rows)",
             },
+            "profile": {
+                "type": "str",
+                "help": "Writes a profile of every action to the given file"
+                " (cProfile stats, or collapsed stacks for flame graphs if it"
+                " ends in .folded). '{action}' and '{pid}' are replaced",
+            },
             "port": {
                 "type": "int",
                 "help": "The port number to listen for i3-grid events (Overrid"
@@ -137,13 +173,22 @@ class Documentation:
             },
         }
         self.state_flags = {
-            "all": _appl('windows') ,
-            "floating": _appl('floating windows'),
-            "noresize": _ova('resize'),
-            "nofloat": _ova('float'),
+            "all": _appl("windows"),
+            "floating": _appl("floating windows"),
+            "noresize": _ova("resize"),
+            "nofloat": _ova("float"),
+            "xrandr": "Read the monitor offsets from xrandr instead of i3"
+            " (slower, for setups where i3 reports wrong output positions)",
+            "timings": "Print the time spent per phase (config, i3 queries,"
+            " focus, grid, xrandr, dispatch) of the startup and every action",
         }
 
-    def build_parser(self, choices: list) -> ArgumentParser:
+    def build_parser(self, choices: list) -> "ArgumentParser":
+        try:
+            from .helpformat import ArgumentParser, CustomFormatter, NoAction
+        except ImportError:
+            # cli
+            from helpformat import ArgumentParser, CustomFormatter, NoAction
         parser = ArgumentParser(
             prog="i3grid",
             description="i3grid: Manage your floating windows with ease.",
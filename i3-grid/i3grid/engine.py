@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Grid geometry for every output and every grid at once. A cell origin
+# only depends on its column (x) and row (y), so each (output, grid)
+# pair is stored as two prefix tables of cell edges:
+#   x[o, g, col] = col * width[o, g] + left offset        (uniform)
+#   x[o, g, col] = left offset + usable width * sum(weights[:col]) / total
+# and likewise for y. Cell origins, sizes and the rectangle of any span
+# are then differences of two table entries, whatever the grid size.
+# Weighted grids (Ex: columns 2:1:1) give every row and column its share
+# of the display. NumPy is an optional accelerator for building the
+# tables (pip install i3-grid[fast]); without it the same tables are
+# built with plain lists. Importing NumPy costs more than building a few
+# small grids, so it is only imported for large batches (or when the
+# process already has it loaded). Actions read single table entries
+# either way, which plain indexing answers faster than an array call.
+
+import bisect
+import sys
+from typing import List, Optional, Sequence, Tuple, Union
+
+# Table entries (displays * sum(rows + columns)) from which NumPy is used
+NUMPY_THRESHOLD = 4096
+_numpy = None
+
+
+def load_numpy():
+    """The numpy module, imported on first use. None if not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as np
+        except ImportError:
+            np = False
+        _numpy = np
+    return _numpy or None
+
+
+# (width, height) of a display, (x, y) of an origin or a cell size
+Point = Tuple[int, int]
+# (row weights, column weights) of a grid, None for uniform axes
+Weights = Tuple[Optional[tuple], Optional[tuple]]
+UNIFORM: Weights = (None, None)
+# (rows, columns, gridOffset[, weights]) of a grid
+GridSpec = Tuple[int, int, Tuple[int, int, int, int], Weights]
+
+
+def grid_spec(grid: Sequence) -> GridSpec:
+    """The (rows, columns, gridOffset, weights) form of a grid spec (the
+    weights may be left out for a uniform grid)."""
+    rows, cols, off = grid[:3]
+    weights = tuple(grid[3]) if len(grid) > 3 else UNIFORM
+    return rows, cols, tuple(off), weights
+
+
+def parse_axis(value: Union[int, str, Sequence]) -> Tuple[int, Optional[tuple]]:
+    """(count, weights) of a grid axis given as a count (3 or "3") or as
+    weights ("2:1:1", "0.5:0.25:0.25" or [2, 1, 1]). Equal weights are
+    a uniform axis (None)."""
+    if isinstance(value, str):
+        parts = value.split(":")
+        if len(parts) == 1:
+            value = int(value)
+        else:
+            value = [float(p) if "." in p else int(p) for p in parts]
+    if isinstance(value, int):
+        if value < 1:
+            raise ValueError(f"Grid axis must be a positive integer: {value}")
+        return value, None
+    weights = tuple(value)
+    if not weights or any(
+        isinstance(w, bool) or not isinstance(w, (int, float)) or w <= 0
+        for w in weights
+    ):
+        raise ValueError(f"Grid weights must be positive numbers: {value}")
+    if len(set(weights)) == 1:
+        return len(weights), None
+    return len(weights), weights
+
+
+def edges(
+    length: int, count: int, start: int, end: int, weights: tuple = None
+) -> List[int]:
+    """The count + 1 cell edges along a display axis of the given length,
+    with start and end offsets."""
+    if weights is None:
+        cell = length // count - (start + end) // count
+        return [i * cell + start for i in range(count + 1)]
+    assert len(weights) == count, "One weight per row or column"
+    usable, total, acc, found = length - start - end, sum(weights), 0, [start]
+    for w in weights:
+        acc += w
+        found.append(start + int(usable * acc // total))
+    return found
+
+
+def best_shape(count: int, display: Point, offset: Sequence[int]) -> Point:
+    """(rows, columns) of the grid for count windows on the display, after
+    the gridOffset (top, right, bottom, left) is taken off. Picks the
+    largest short side of a cell, so the display aspect ratio decides
+    between side by side and stacked windows. Ties go to the fewest empty
+    cells, then to the largest cells."""
+    assert count > 0, "No windows to arrange"
+    width = max(display[0] - offset[1] - offset[3], 1)
+    height = max(display[1] - offset[0] - offset[2], 1)
+    best = None
+    for cols in range(1, count + 1):
+        rows = -(-count // cols)
+        cell = (width // cols, height // rows)
+        key = (-min(cell), rows * cols - count, -cell[0] * cell[1])
+        if best is None or key < best[0]:
+            best = (key, (rows, cols))
+    return best[1]
+
+
+class GridEngine:
+    """Batched grid calculator. Computes the cell edges of every grid
+    over every display in one pass, then answers cell and span (multis)
+    queries by indexing."""
+
+    def __init__(self, displays: Sequence[Point], grids: Sequence[GridSpec]) -> None:
+        super().__init__()
+        self.displays = [tuple(d) for d in displays]
+        self.grids = [grid_spec(g) for g in grids]
+        self.index = {g: i for i, g in enumerate(self.grids)}
+        entries = len(self.displays) * sum(g[0] + g[1] for g in self.grids)
+        self.np = None
+        if entries >= NUMPY_THRESHOLD or "numpy" in sys.modules:
+            self.np = load_numpy()
+        if self.np is not None:
+            self._build_numpy()
+        else:
+            self._build_python()
+
+    def _build_numpy(self) -> None:
+        np = self.np
+        dims = np.array(self.displays, dtype=np.int64).reshape(-1, 2)  # (O, 2)
+        rows = np.array([g[0] for g in self.grids], dtype=np.int64)  # (G,)
+        cols = np.array([g[1] for g in self.grids], dtype=np.int64)
+        off = np.array([g[2] for g in self.grids], dtype=np.int64).reshape(-1, 4)
+        # Cell size minus the offset share of every cell: (O, G)
+        self.width = dims[:, 0:1] // cols - (off[:, 3] + off[:, 1]) // cols
+        self.height = dims[:, 1:2] // rows - (off[:, 0] + off[:, 2]) // rows
+        # Edges padded to the largest grid: (O, G, Cmax + 1) and (O, G, Rmax + 1)
+        col_idx = np.arange(max(cols.max(initial=1), 1) + 1)
+        row_idx = np.arange(max(rows.max(initial=1), 1) + 1)
+        self.x = col_idx * self.width[:, :, None] + off[:, 1][None, :, None]
+        self.y = row_idx * self.height[:, :, None] + off[:, 0][None, :, None]
+        for g, (r, c, o, (row_w, col_w)) in enumerate(self.grids):
+            for d, (w, h) in enumerate(self.displays):  # Weighted axes
+                if col_w is not None:
+                    self.x[d, g, : c + 1] = edges(w, c, o[1], o[3], col_w)
+                    self.width[d, g] = self.x[d, g, 1] - self.x[d, g, 0]
+                if row_w is not None:
+                    self.y[d, g, : r + 1] = edges(h, r, o[0], o[2], row_w)
+                    self.height[d, g] = self.y[d, g, 1] - self.y[d, g, 0]
+
+    def _build_python(self) -> None:
+        self.width, self.height, self.x, self.y = [], [], [], []
+        for w, h in self.displays:
+            widths, heights, xs, ys = [], [], [], []
+            for rows, cols, off, (row_w, col_w) in self.grids:
+                xs.append(edges(w, cols, off[1], off[3], col_w))
+                ys.append(edges(h, rows, off[0], off[2], row_w))
+                widths.append(xs[-1][1] - xs[-1][0])
+                heights.append(ys[-1][1] - ys[-1][0])
+            self.width.append(widths)
+            self.height.append(heights)
+            self.x.append(xs)
+            self.y.append(ys)
+
+    def grid_index(self, grid: GridSpec) -> int:
+        return self.index[grid_spec(grid)]
+
+    def size(self, o: int, g: int) -> Point:
+        """Cell size (offset adjusted) of grid g on display o. The first
+        cell of a weighted grid, see cell_size."""
+        return int(self.width[o][g]), int(self.height[o][g])
+
+    def cell_size(self, o: int, g: int, n: int) -> Point:
+        """Size of cell n (1 based, row major) of grid g on display o."""
+        row, col = divmod(n - 1, self.grids[g][1])
+        xs, ys = self.x[o][g], self.y[o][g]
+        return int(xs[col + 1] - xs[col]), int(ys[row + 1] - ys[row])
+
+    def cell(self, o: int, g: int, n: int) -> Point:
+        """Origin of cell n (1 based, row major) of grid g on display o."""
+        row, col = divmod(n - 1, self.grids[g][1])
+        return abs(int(self.x[o][g][col])), abs(int(self.y[o][g][row]))
+
+    def span(self, o: int, g: int, a: int, b: int) -> Tuple[Point, Point]:
+        """Top left origin and size of the rectangle spanned by the
+        cells a and b (the min max procedure of multis)."""
+        cols = self.grids[g][1]
+        (r0, c0), (r1, c1) = divmod(min(a, b) - 1, cols), divmod(max(a, b) - 1, cols)
+        xs, ys = self.x[o][g], self.y[o][g]
+        size = (int(xs[c1 + 1] - xs[c0]), int(ys[r1 + 1] - ys[r0]))
+        return (abs(int(xs[c0])), abs(int(ys[r0]))), size
+
+    def locate(self, o: int, g: int, x: int, y: int) -> int:
+        """The cell number holding the point (display coordinates). Points
+        outside of the grid belong to the nearest cell."""
+        rows, cols = self.grids[g][:2]
+        col = bisect.bisect_right(self.x[o][g], x, 0, cols + 1) - 1
+        row = bisect.bisect_right(self.y[o][g], y, 0, rows + 1) - 1
+        col, row = min(max(col, 0), cols - 1), min(max(row, 0), rows - 1)
+        return row * cols + col + 1
+
+    def tensor(self, o: int, g: int) -> list:
+        """Grid g on display o in the MonitorCalculator grid shape:
+        rows of (cell number, (x, y))."""
+        rows, cols = self.grids[g][:2]
+        xs = [abs(int(x)) for x in self.x[o][g][:cols]]
+        ys = [abs(int(y)) for y in self.y[o][g][:rows]]
+        return [
+            [(r * cols + c + 1, (xs[c], ys[r])) for c in range(cols)]
+            for r in range(rows)
+        ]
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Wire format of the middleware events (publisher -> broker -> subscribers).
+# Every message is a frame:
+#   "IG" <u8 version> <u8 kind> <u32 generation> <u32 length> <body>
+# with a compact JSON body. The grid and the monitors (STATIC_FIELDS)
+# rarely change; they are sent in a STATIC frame that starts a new
+# generation, and left out of the events. Events are sent as a KEY (all
+# fields) after a (re)connect or a new generation, and as a DELTA (only the
+# changed fields) otherwise. EventDecoder rebuilds the full events.
+# A connection that starts with a SUBSCRIBE frame is a subscriber; its
+# body ({"commands": [...], "fields": [...]}, null meaning all) filters
+# what it receives. The broker sends the union of the subscriber filters
+# to the publishers in INTEREST frames, so that unwanted events and
+# fields are never serialized.
+# Only stdlib and no asyncio here, publishers import it on the hot path.
+
+import json
+import socket
+import struct
+from typing import Iterator, List, Tuple
+
+MAGIC = b"IG"
+VERSION = 1
+HEADER = struct.Struct("!2sBBII")
+# Frame kinds
+STATIC = 1
+KEY = 2
+DELTA = 3
+SUBSCRIBE = 4
+INTEREST = 5
+# Larger frames are a protocol error (not an event)
+MAX_FRAME = 1 << 24
+# Event fields that are sent once per generation
+STATIC_FIELDS = ("grid", "monitors")
+# Interest of every listener (no filter)
+EVERYTHING = {"commands": None, "fields": None}
+NOTHING = {"commands": [], "fields": []}
+
+
+def frame(kind: int, body: object = None, generation: int = 0) -> bytes:
+    payload = b"" if body is None else _dumps(body)
+    if len(payload) > MAX_FRAME:
+        raise ValueError(f"Event of {len(payload)} bytes exceeds {MAX_FRAME}")
+    return HEADER.pack(MAGIC, VERSION, kind, generation, len(payload)) + payload
+
+
+def _dumps(body: object) -> bytes:
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def _plain(value: object) -> object:
+    """JSON shaped copy (tuples become lists), so that deltas compare the
+    values as the decoder will see them."""
+    return json.loads(json.dumps(value))
+
+
+def diff(old: dict, new: dict, path: tuple = ()) -> Tuple[dict, List[list]]:
+    """Nested changes and the paths of the removed keys from old to new."""
+    changes, removed = {}, []
+    for key, value in new.items():
+        if key not in old:
+            changes[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            sub, gone = diff(old[key], value, path + (key,))
+            if sub:
+                changes[key] = sub
+            removed += gone
+        elif old[key] != value:
+            changes[key] = value
+    removed += [list(path + (key,)) for key in old if key not in new]
+    return changes, removed
+
+
+def patch(base: dict, changes: dict, removed: List[list] = ()) -> None:
+    """Applies a diff to base (in place)."""
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            patch(base[key], value)
+        else:
+            base[key] = value
+    for path in removed:
+        node = base
+        for key in path[:-1]:
+            node = node.get(key, {})
+        node.pop(path[-1], None)
+
+
+def wants(interest: dict, event: object) -> bool:
+    """If the event command is of interest (non dict events always are)."""
+    commands = interest.get("commands")
+    if commands is None or not isinstance(event, dict):
+        return commands is None or bool(commands)
+    return event.get("command") in commands
+
+
+def project(event: object, interest: dict) -> object:
+    """The event reduced to the fields of interest (command included)."""
+    fields = interest.get("fields")
+    if fields is None or not isinstance(event, dict):
+        return event
+    return {k: event[k] for k in ["command"] + list(fields) if k in event}
+
+
+def union(interests: List[dict]) -> dict:
+    """The interest covering all of the given ones."""
+    merged = {}
+    for key in ("commands", "fields"):
+        values = [i.get(key) for i in interests]
+        if any(v is None for v in values):
+            merged[key] = None
+        else:
+            merged[key] = sorted({v for vs in values for v in vs})
+    return merged
+
+
+class EventEncoder:
+    """Stateful encoder of a single connection (one per subscriber)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.generation = 0
+        self.static = None
+        self.last = None
+
+    def reset(self) -> None:
+        """Forgets what the peer knows (new connection)."""
+        self.static = self.last = None
+
+    def encode(self, event: dict) -> bytes:
+        if not isinstance(event, dict):
+            event = {"data": event}  # Plain middleware payloads
+        event = _plain(event)
+        static = {k: event.pop(k) for k in STATIC_FIELDS if k in event}
+        out = b""
+        if static != self.static:
+            self.generation = (self.generation + 1) & 0xFFFFFFFF
+            self.static, self.last = static, None
+            out += frame(STATIC, static, self.generation)
+        if self.last is None:
+            out += frame(KEY, event, self.generation)
+        else:
+            changes, removed = diff(self.last, event)
+            out += frame(
+                DELTA, [changes, removed] if removed else [changes], self.generation
+            )
+        self.last = event
+        return out
+
+
+class EventDecoder:
+    """Rebuilds the full events from a stream of frames. Feed it the
+    received bytes (any split); it returns the complete events."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffer = b""
+        self.generation = None
+        self.static = {}
+        self.last = None
+        self.interest = None  # Of the last INTEREST frame (publishers)
+
+    def feed(self, data: bytes) -> List[dict]:
+        self.buffer += data
+        decoded = []
+        while len(self.buffer) >= HEADER.size:
+            magic, version, kind, generation, length = HEADER.unpack_from(self.buffer)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Unsupported event frame: {magic} v{version}")
+            if length > MAX_FRAME:
+                raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+            end = HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            body = self.buffer[HEADER.size : end]
+            self.buffer = self.buffer[end:]
+            event = self.apply(kind, generation, json.loads(body) if body else None)
+            if event is not None:
+                decoded.append(event)
+        return decoded
+
+    def apply(self, kind: int, generation: int, body: object) -> dict:
+        """The full event of a frame (None for the other frames)."""
+        if kind == STATIC:
+            self.generation, self.static, self.last = generation, body, None
+            return None
+        if kind == INTEREST:
+            self.interest = body
+            return None
+        if kind == SUBSCRIBE:
+            return None
+        if generation != self.generation:
+            raise ValueError(f"Event of unknown generation {generation}")
+        if kind == KEY:
+            self.last = body
+        elif kind == DELTA:
+            if self.last is None:
+                raise ValueError("Delta without a key event")
+            patch(self.last, *body)
+        else:
+            raise ValueError(f"Unknown event frame kind: {kind}")
+        event = json.loads(json.dumps(self.last))  # Callers may mutate it
+        event.update(self.static)
+        event["generation"] = generation
+        return event
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock: socket.socket) -> bytes:
+    """The next raw frame (header included) of a blocking socket, None
+    once it is closed."""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    length = HEADER.unpack(header)[4]
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME}")
+    body = _recv_exact(sock, length)
+    return None if body is None else header + body
+
+
+def subscribe(
+    host: str, port: int, commands: List[str] = None, fields: List[str] = None
+) -> Iterator[dict]:
+    """Connects to the event broker (listen) and yields the decoded
+    events until the broker goes away. Only the given commands and fields
+    (and "command") are sent, all of them by default. Ex:
+        for event in subscribe("127.0.0.1", 65433, fields=["timings"]):
+            print(event["command"], event["timings"])"""
+    decoder = EventDecoder()
+    interest = {
+        "commands": None if commands is None else list(commands),
+        "fields": None if fields is None else list(fields),
+    }
+    with socket.create_connection((host, port)) as s:
+        s.sendall(frame(SUBSCRIBE, interest))
+        while True:
+            data = s.recv(65536)
+            if not data:
+                return
+            yield from decoder.feed(data)
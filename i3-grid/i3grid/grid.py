@@ -19,29 +19,40 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import collections
+import contextlib
+import copy
 import json
 import logging
 import os
-import socket
 import subprocess
 import sys
 import threading
 from collections import namedtuple
-from typing import Dict, List
+from typing import Dict, List, Mapping
 
 try:
-    from .xrandr import XRandR
+    from . import config as rcfile
+    from . import events, ipc, publisher
+    from .engine import UNIFORM, GridEngine, best_shape, parse_axis
+    from .layouts import LayoutStore, identity, match
+    from .outputs import OutputIndex
     from .doc import Documentation
+    from .timings import PhaseTimer, profile_path, profiled, timed
+    from .tree import TreeIndex
 except ImportError:
     # cli
-    from xrandr import XRandR
+    import config as rcfile
+    import events
+    import ipc
+    import publisher
+    from engine import UNIFORM, GridEngine, best_shape, parse_axis
+    from layouts import LayoutStore, identity, match
+    from outputs import OutputIndex
     from doc import Documentation
+    from timings import PhaseTimer, profile_path, profiled, timed
+    from tree import TreeIndex
 
-# Logger for stdout
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s %(levelname)s |i3-grid %(lineno)d]: %(message)s",
-)
+# Logging is configured by the cli (__main__), not on import
 logger = logging.getLogger(__name__)
 
 try:
@@ -52,6 +63,9 @@ except ModuleNotFoundError:
     logger.critical("Missing i3-py module")
     exit(1)
 
+# i3-py shares one socket per process, managers in other threads take turns
+_i3py_lock = threading.Lock()
+
 # i3-grid is a module to manage floating windows for the
 # i3 tiling window manager. The code is split into several classes, each
 # isolating the logic respective to its name. The process flow is as follows:
@@ -87,7 +101,13 @@ Location = namedtuple("Location", "width height")
 Tensor = List[Location]
 # Represents the display monitor to their respective index
 DisplayMap = Dict[int, Location]
-# Single global dict -  shared interface for library & cli
+# i3 floating states of a floating window (the others are tiled)
+FLOATING = ("user_on", "auto_on")
+# Optional weights of the grid axes (rc grids): {"columnWeights": [2, 1, 1]}
+GRID_WEIGHTS = {"rows": "rowWeights", "columns": "columnWeights"}
+# Defaults of every config snapshot (see Utils.on_the_fly_override). The
+# managers and the requests never change it, each runs from a read only
+# snapshot of the defaults, the rc file and its flags
 BASE_CONFIG = {
     k: v
     for k, v in zip(
@@ -101,6 +121,13 @@ BASE_CONFIG = {
             "multis",  # the multichannel flag
             "rc_file_name",  # change the name of the dotfile
             "defaultResetPercentage",
+            "useXrandr",  # monitor offsets from xrandr instead of i3
+            "gridPresets",  # named grids: {name: {rows, columns[, gridOffset]}}
+            "placementTolerance",  # pixels within which a window is in place
+            "outputGrids",  # per output grids: {output: {rows, columns[, gridOffset]}}
+            "targetOutput",  # output to place on (name, number, left, ...)
+            "layoutName",  # the save-layout / restore-layout name
+            "commandDebounce",  # ms the command queue waits for a burst to end
         ],
         [  # default values for config without rc file
             True,
@@ -112,6 +139,13 @@ BASE_CONFIG = {
             0,
             "i3gridrc",
             75,
+            False,
+            {},
+            2,
+            {},
+            "",
+            "",
+            0,
         ],
     )
 }
@@ -122,49 +156,36 @@ class Middleware:
     Utilizes sockets for instance communication."""
 
     host = "127.0.0.1"  # Should not be mutated, hence class var
+    config: Mapping = BASE_CONFIG  # The manager snapshot, once configured
 
     def __init__(self,) -> None:
         super().__init__()
 
     def start_server(self, data_mapper: collectionsAbc.Callable) -> None:
-        """Begins an AF_INET server at the given port to listen
-        for i3-grid middleware. Dispatches result to data_mapper"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.setblocking(1)
-            logger.info(f"Binding to: {Middleware.host}/{BASE_CONFIG['socketPort']}")
-            s.bind((Middleware.host, BASE_CONFIG["socketPort"]))
-            s.listen()
-            while True:
-                # We only have one listener at a time. If we need
-                # multiple listeners, we can add threading here.
-                try:
-                    conn, addr = s.accept()
-                    with conn:
-                        while True:
-                            data = conn.recv(1024)
-                            if not data:
-                                break
-                            data_mapper(data)
-                            # Bidirectional data flow
-                            # conn.sendall(data)
-                except KeyboardInterrupt:
-                    logger.info("Server Socket Closed")
-                    break
+        """Runs the middleware event broker at the given port. Any number
+        of subscribers (events.subscribe) may connect; every event is also
+        dispatched to data_mapper (bytes of the event JSON)."""
+        import asyncio
+
+        try:
+            from .broker import EventBroker
+        except ImportError:
+            # cli
+            from broker import EventBroker
+
+        broker = EventBroker(Middleware.host, self.config["socketPort"], data_mapper)
+        try:
+            asyncio.run(broker.serve_forever())
+        except KeyboardInterrupt:
+            logger.info("Server Socket Closed")
+
+    def middleware_publisher(self) -> "publisher.EventPublisher":
+        return publisher.get_publisher(Middleware.host, self.config["socketPort"])
 
     def dispatch_middleware(self, data: str, **kwargs) -> None:
-        """Client Middleware to send data to server"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            # Our socket is unidirectional for now. We can also allow for
-            # user middleware via python/bash if necessary
-            s.setblocking(1)
-            try:
-                s.connect((Middleware.host, BASE_CONFIG["socketPort"]))
-            except (ConnectionRefusedError, BlockingIOError):
-                return
-            s.sendall(Middleware.str2bin(data))
-            # If we want bidirectional data flow, we can have the client
-            # listen to the server for additional events.
-            # data = s.recv(1024)
+        """Client Middleware to send data to server. Queued to the
+        background publisher (reused connection), never blocks."""
+        self.middleware_publisher().publish(data)
 
     @staticmethod
     def str2bin(data: str, res_str: bool = False) -> "bytes":
@@ -213,11 +234,21 @@ class Utils:
             ),
         }
         if isinstance(data, str):
-            return dispatcher[command](data)
+            with _i3py_lock:
+                return dispatcher[command](data)
         elif isinstance(data, Location):
             w = str(data.width) if data.width > 0 else "0"
             h = str(data.height) if data.height > 0 else "0"
-            return dispatcher[command](w, h)
+            with _i3py_lock:
+                return dispatcher[command](w, h)
+
+    @staticmethod
+    def dispatch_i3msg_batch(commands: List[str]) -> list:
+        """Chains the (criteria prefixed) command strings into a single
+        RUN_COMMAND message. i3 replies with one result per command."""
+        if not commands:
+            return []
+        return ipc.default_connection().command("; ".join(commands))
 
     @staticmethod
     def i3_custom(cmd: str, id: str = None) -> str:
@@ -225,49 +256,43 @@ class Utils:
         return f"""{_b} [con_id="{id}"] {cmd}""" if cmd else ("""{_b} {cmd}""")
 
     @staticmethod
-    def read_config() -> None:
-        """Reads the user i3gridrc file from $HOME."""
-        global BASE_CONFIG
-        rc = BASE_CONFIG["rc_file_name"]
-        home = os.path.expanduser("~")
-        default_locs = [
-            f"{home}/.config/i3grid/{rc}",
-            f"{home}/.config/{rc}",
-            f"{home}/.{rc}",
-            os.path.join(os.path.dirname(os.path.abspath(__file__)), f".{rc}"),
-        ]
-        target_loc = None
-        for loc in default_locs:
-            if os.path.isfile(loc):
-                target_loc = loc
-                break
+    def cache_path(name: str) -> str:
+        """Location of the i3-grid cache files ($XDG_CACHE_HOME/i3grid)."""
+        return rcfile.cache_path(name)
 
+    @staticmethod
+    def data_path(name: str) -> str:
+        """Location of the i3-grid user data ($XDG_DATA_HOME/i3grid)."""
+        root = os.environ.get("XDG_DATA_HOME") or os.path.join(
+            os.path.expanduser("~"), ".local", "share"
+        )
+        return os.path.join(root, "i3grid", name)
+
+    @staticmethod
+    def read_config(defaults: Mapping = None) -> Mapping:
+        """Reads the user i3gridrc file from $HOME. Returns a read only
+        snapshot of the defaults (BASE_CONFIG) updated with it."""
+        defaults = BASE_CONFIG if defaults is None else defaults
+        target_loc = rcfile.find(defaults["rc_file_name"])
         if not target_loc:
             logger.warning(
                 "No dotfile config found."
                 " Add to ~/.i3gridrc or ~/.config/i3gridrc"
                 " or ~/.config/i3grid/i3gridrc")
-            return
-
-        with open(target_loc, "r") as f:
-            data = [line.strip().replace("\n", "") for line in f.readlines()]
+            return rcfile.freeze(defaults)
 
-        try:
-            config = eval("".join(
-                [line.replace("true", "True").replace('false', 'False')
-                 for line in data if not line.startswith("//")]))
-        except SyntaxError:
-            raise ValueError(
-                "Incorrect i3gridrc file sytax. Please"
-                " follow jsonc guidelines and example.")
-
-        for key in config:
-            if config[key] is not None:
-                BASE_CONFIG[key] = config[key]
+        # Parsed as JSONC and validated once per rc change (config.py)
+        config = rcfile.load(target_loc, BASE_CONFIG, Utils.cache_path("rc.marshal"))
+        return rcfile.freeze(dict(defaults, **config))
 
     @staticmethod
-    def on_the_fly_override(serialize: bool = False, **kwargs) -> None:
-        global BASE_CONFIG
+    def on_the_fly_override(
+        serialize: bool = False, config: Mapping = None, **kwargs
+    ) -> Mapping:
+        """A read only snapshot of config (default: BASE_CONFIG) with the
+        cli flags (the config keys if serialize) applied. The given config
+        is left as it is."""
+        config = rcfile.thaw(BASE_CONFIG if config is None else config)
         cmdline_serializer = {
             "rows": "rows",
             "cols": "columns",
@@ -278,32 +303,62 @@ class Utils:
             "multis": "multis",
             "noresize": "autoResize",
             "nofloat": "autoConvertToFloat",
+            "xrandr": "useXrandr",
+            "output": "targetOutput",
+            "layout": "layoutName",
         }
         if serialize:
             cmdline_serializer = {v: v for v in cmdline_serializer.values()}
 
+        preset = kwargs.get("preset", None)
+        if preset is not None:  # Applied first, explicit flags override it
+            if preset not in config["gridPresets"]:
+                raise ValueError(f"Unknown grid preset: {preset}")
+            preset = config["gridPresets"][preset]
+            config["defaultGrid"] = {
+                k: preset[k]
+                for k in [*GRID_WEIGHTS, *GRID_WEIGHTS.values()]
+                if k in preset
+            }
+            if "gridOffset" in preset:
+                config["gridOffset"] = list(preset["gridOffset"])
+
         _g_tst = {"rows", "cols", "columns"}
         _auto_booleans = {"noresize", "nofloat"}
+        if not serialize and any(
+            kwargs.get(k) is not None for k in ("rows", "cols", "offset", "preset")
+        ):  # An explicit grid applies to every output
+            config["outputGrids"] = {}
         for arg in kwargs:
             if kwargs[arg] is None or arg not in cmdline_serializer:
                 continue
-            elif arg in _g_tst:
-                BASE_CONFIG["defaultGrid"][cmdline_serializer[arg]] = kwargs[arg]
+            elif arg in _g_tst:  # A count or weights (Ex: 3 or 2:1:1)
+                axis = cmdline_serializer[arg]
+                grid = config["defaultGrid"]
+                grid[axis], weights = parse_axis(kwargs[arg])
+                if weights:
+                    grid[GRID_WEIGHTS[axis]] = list(weights)
+                else:
+                    grid.pop(GRID_WEIGHTS[axis], None)
             elif arg == "target" or arg == "snapLocation":
-                BASE_CONFIG["snapLocation"] = kwargs[arg]
+                config["snapLocation"] = kwargs[arg]
             elif arg == "offset" or arg == "gridOffset":
-                BASE_CONFIG[cmdline_serializer[arg]] = Utils.offset_test(
+                config[cmdline_serializer[arg]] = Utils.offset_test(
                     kwargs[arg], cmdline_serializer[arg]
                 )
             elif arg in _auto_booleans:
                 if kwargs[arg]:
-                    BASE_CONFIG[cmdline_serializer[arg]] = False
+                    config[cmdline_serializer[arg]] = False
+            elif arg == "xrandr":
+                if kwargs[arg]:
+                    config[cmdline_serializer[arg]] = True
             else:
-                BASE_CONFIG[cmdline_serializer[arg]] = kwargs[arg]
+                config[cmdline_serializer[arg]] = kwargs[arg]
+        return rcfile.freeze(config)
 
     @staticmethod
     def offset_test(o, k) -> List[int]:
-        tmp_arr = []
+        tmp_arr, o = [], list(o)
         assert len(o) <= 4, "Incorrect Offset Arguments (Expected 4: t, r, b, l)"
         while len(o) != 4:
             o += [0]
@@ -320,83 +375,123 @@ class FloatUtils:
     by the float manager for i3 workspace
     metadata."""
 
+    # Optional event driven i3 model (state.StateCache) that replaces
+    # the per action tree, output and workspace queries.
+    state_cache = None
+    # Read only config snapshot of the manager (the defaults until then)
+    config: Mapping = BASE_CONFIG
+
     def __init__(self) -> None:
+        if not hasattr(self, "timer"):
+            self.timer = PhaseTimer()
         self.active_output = self.current_floating_windows = None
+        # What focused_node reliably reports ("floating", "rect") until
+        # the next command changes it; see in_place
+        self.fresh, self.elided = set(), 0
+        self.tree_index = None  # tree.TreeIndex of the last tree read
         self.area_matrix, self.current_display = self._calc_metadata()
         assert len(self.current_display) > 0, "Incorrect Display Input"
 
-    def update_config(self, val: dict) -> bool:
+    def update_config(self, val: Mapping) -> bool:
         """Float configration lock manager. Allows
-        for multiple user config declarations otf."""
-        assert isinstance(val, dict), "Config value must be a dict."
-        _similarity = set(BASE_CONFIG) - set(val)
-        assert (
-            len(_similarity) == 0
-        ), f"Config value requires the additional keys: {_similarity}"
-        Utils.on_the_fly_override(serialize=True, **val)  # Validate update
+        for multiple user config declarations otf. val is merged
+        over the current config (keys it leaves out keep their value);
+        the manager runs from a snapshot of the result (val is not kept)."""
+        assert isinstance(val, Mapping), "Config value must be a dict."
+        merged = dict(self.config, **val)
+        # Validate update
+        self.config = Utils.on_the_fly_override(serialize=True, config=merged, **val)
         self.cache_grid = None  # Update cache
         return True
 
+    @timed("focus")
     def assign_focus_node(self, all_key=False) -> None:
-        tree = i3.get_tree()
-        wkspc = [
-            node
-            for node in tree["nodes"]
-            if node["name"] == self.current_display["output"]
-        ]
-        assert len(wkspc) > 0, "window could not be found"
-
-        for w in wkspc:
-            self.find_focused_window(w)
+        if self.state_cache:
+            return self._assign_cached_focus_node(all_key)
+        index = self.tree_index = TreeIndex(self.query(ipc.GET_TREE))
+        self.focused_node = index.focused()
+        assert self.focused_node, "window could not be found"
+        self.fresh = {"floating", "rect"}
 
         if not all_key:
             return
 
-        wkspc = [k["nodes"] for k in wkspc[0]["nodes"] if k["name"] == "content"][0]
         fcsd = [i for i in self.all_outputs if i["focused"]][0]["name"]
-
-        def grep_nest(obj, key, key2, key3) -> list:
-            arr = []  # TODO: change keys to kwargs
-
-            def fetch(obj, arr, key) -> list:
-                if isinstance(obj, dict):
-                    for k, v in obj.items():
-                        if isinstance(v, (dict, list)):
-                            fetch(v, arr, key)
-                        elif k == key:
-                            arr.append((obj[key2], v, obj[key3]))
-                elif isinstance(obj, list):
-                    for item in obj:
-                        fetch(item, arr, key)
-                return arr
-
-            results = fetch(obj, arr, key)
-            return results
-
-        data = [k for k in wkspc if k["name"] == fcsd][0]
-        names = grep_nest(data, "id", key2="name", key3="floating")
+        names = index.windows(fcsd)
         self.current_windows = [i for i in names if i[0] and i[0] != fcsd]
         self.current_floating_windows = [i for i in self.current_windows]
 
-    def find_focused_window(self, node: dict) -> None:
-        """Sets the focused_node attribute"""
-        # DFS to find the current window
-        if not isinstance(node, dict):
-            return
-        if node["focused"]:
-            self.focused_node = node
+    def _assign_cached_focus_node(self, all_key=False) -> None:
+        """assign_focus_node without a tree fetch (state cache)."""
+        self.focused_node = self.state_cache.focused_node()
+        self.tree_index = self.state_cache.index
+        assert self.focused_node, "window could not be found"
+        self.fresh = {"floating"}  # i3 has no events for geometry changes
+        if not all_key:
             return
+        fcsd = [i for i in self.all_outputs if i["focused"]][0]["name"]
+        names = self.state_cache.workspace_windows(fcsd)
+        self.current_windows = [i for i in names if i[0] and i[0] != fcsd]
+        self.current_floating_windows = [i for i in self.current_windows]
 
-        if (len(node["nodes"]) != 0) or (len(node["floating_nodes"]) != 0):
-            target_nodes = node["nodes"] + node["floating_nodes"]
-            for root in target_nodes:
-                self.find_focused_window(root)
-
+    def find_focused_window(self, node: dict) -> None:
+        """Sets the focused_node attribute (focused con of the subtree)"""
+        focused = TreeIndex(node).focused()
+        if focused is not None:
+            self.focused_node = focused
+
+    def in_place(self, command: str, data: Location = None) -> bool:
+        """If the float, resize or move command (to data) would leave the
+        focused window as it is, within placementTolerance pixels. Only
+        the state read since the last command is trusted."""
+        node = self.focused_node
+        if not node or "floating" not in self.fresh:
+            return False
+        floating = node.get("floating") in FLOATING
+        if command == "float" or not floating:
+            return floating
+        if "rect" not in self.fresh:
+            return False
+        rect = node["rect"]
+        if command == "resize":
+            current = (rect["width"], rect["height"])
+        elif command == "move":
+            current = (rect["x"], rect["y"])
+        else:
+            return False
+        tolerance = self.config["placementTolerance"]
+        return all(abs(c - max(t, 0)) <= tolerance for c, t in zip(current, data))
+
+    def dispatch_unless_in_place(self, command: str, data: Location = None) -> list:
+        """dispatch, elided when the command is a no-op."""
+        if self.in_place(command, data):
+            self.elided += 1
+            return []
+        return self.dispatch(command, data)
+
+    def query(self, msg_type: int) -> object:
+        """The reply of an i3 state query (ipc message type), over the
+        process wide (thread safe) connection."""
+        return ipc.default_connection().get(msg_type)
+
+    def dispatch(self, command: str, data: Location = None) -> list:
+        """Sends a Utils.dispatch_i3msg_com command (data may be a string)."""
+        if data is None:
+            return Utils.dispatch_i3msg_com(command)
+        return Utils.dispatch_i3msg_com(command, data)
+
+    def dispatch_batch(self, commands: List[str]) -> list:
+        """Sends the command strings as a single i3 message."""
+        return Utils.dispatch_i3msg_batch(commands)
+
+    @timed("metadata")
     def _calc_metadata(self) -> (DisplayMap, dict):
-        self.displays = i3.get_outputs()
+        cache = self.state_cache
+        self.displays = cache.outputs() if cache else self.query(ipc.GET_OUTPUTS)
         # Widths * Lengths (seperated to retain composition for children)
         total_size = {}
         monitor_cnt = 0
+        self.screens = []  # The outputs in area_matrix order
         for display in self.displays:
             if display["name"].startswith("xroot"):
                 continue
@@ -404,67 +499,134 @@ class FloatUtils:
                 width=display["rect"]["width"], height=display["rect"]["height"]
             )
             total_size[monitor_cnt] = display_screen_location
+            self.screens.append(display)
             monitor_cnt += 1
+        self.output_numbers = {d["name"]: i for i, d in enumerate(self.screens)}
 
-        self.all_outputs = i3.get_workspaces()
+        if cache:
+            self.all_outputs = cache.workspaces()
+        else:
+            self.all_outputs = self.query(ipc.GET_WORKSPACES)
         active = [i for i in self.all_outputs if i["focused"]][0]
         self.active_output = active["output"]
         return total_size, active
 
     def get_wk_number(self) -> int:
-        c_monitor = 0
-        for display in self.displays:
-            if not display["name"].startswith("xroot"):
-                if self.match(display):
-                    break
-                c_monitor += 1
-        return c_monitor
-
-    def match(self, display: dict) -> bool:
-        validations = [["name", "output"], ["current_workspace", "name"], "rect"]
-        for val in validations:
-            if val == "rect":
-                if display[val]["width"] != self.current_display[val]["width"]:
-                    return False
-            elif display[val[0]] != self.current_display[val[1]]:
-                return False
-        return True
+        """Number (area_matrix key) of the focused output."""
+        return self.output_numbers[self.active_output]
 
     def xrandr_parser(self) -> "Configuration":
         """Low level communicator with the xrandr
         module. Loads the overall monitor grid offset."""
-        x = XRandR()
-        x.load_from_x()
+        try:  # Deferred, only needed with useXrandr
+            from .xrandr import XRandR
+        except ImportError:
+            # cli
+            from xrandr import XRandR
+        x = XRandR(cache_file=Utils.cache_path("xrandr.json"))
+        # The i3 output rects change with any monitor layout change
+        x.load_from_x(
+            fingerprint=";".join(
+                f"{d['name']}:{d['rect']['x']},{d['rect']['y']},"
+                f"{d['rect']['width']},{d['rect']['height']}"
+                for d in self.displays
+                if d.get("active", True)
+            )
+        )
         return x.configuration
 
 
+class GridCache:
+    """LRU of computed grids keyed by (rows, columns, gridOffset, weights,
+    display), persisted as json so that it survives across (cli) invocations.
+    Only written when a new grid was put since the last save."""
+
+    def __init__(self, path: str = None, size: int = 64) -> None:
+        super().__init__()
+        self.path, self.size = path, size
+        self.grids = None  # Loaded on first use
+        self.dirty = False
+
+    @staticmethod
+    def _key(key: tuple) -> str:
+        rows, cols, offset, weights, display = key
+        axes = [str(rows), str(cols)]
+        for i, w in enumerate(weights):
+            if w is not None:  # Ex: 3x2:1:1
+                axes[i] = ":".join(map(str, w))
+        offset = ",".join(map(str, offset))
+        return f"{'x'.join(axes)}|{offset}|{display[0]}x{display[1]}"
+
+    def _load(self) -> None:
+        self.grids = collections.OrderedDict()
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.grids.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: tuple) -> (Tensor, Location):
+        if self.grids is None:
+            self._load()
+        value = self.grids.get(self._key(key))
+        if value is None:
+            return None
+        self.grids.move_to_end(self._key(key))
+        cells, dim = value
+        grid = [[(i, Location(w, h)) for i, w, h in row] for row in cells]
+        return grid, Location(*dim)
+
+    def put(self, key: tuple, grid: Tensor, dim: Location, save: bool = True) -> None:
+        if self.grids is None:
+            self._load()
+        cells = [[(i, loc.width, loc.height) for i, loc in row] for row in grid]
+        self.grids[self._key(key)] = (cells, tuple(dim))
+        self.dirty = True
+        while len(self.grids) > self.size:
+            self.grids.popitem(last=False)
+        if save:
+            self.save()
+
+    def save(self) -> None:
+        if not self.path or not self.dirty:
+            return
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self.grids, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            logger.warning(f"Could not write the grid cache: {self.path}")
+
+
 class MonitorCalculator(FloatUtils):
     def __init__(self,) -> None:
         super().__init__()
-        self.xrandr_config = self.cache_grid = None
+        self.xrandr_config = self.cache_grid = self._grid_key = None
+        self.grid_cache = GridCache(Utils.cache_path("grids.json"))
+        self._engine = self._engine_key = None
+        self._outputs = self._outputs_key = self._positions = None
 
     def calc_monitor_offset(
-        self, mode: str, point: Location  # , loc: int = None
+        self, mode: str, point: Location, grid: tuple = None
     ) -> Location:
         """Internal offset manager to apply offsets
-        to given quadrant based on operation."""
-        rows = BASE_CONFIG["defaultGrid"]["rows"]
-        cols = BASE_CONFIG["defaultGrid"]["columns"]
-        assert BASE_CONFIG["snapLocation"] <= (
-            rows * cols
-        ), "Incorrect Target; not in grid"
+        to given quadrant based on operation. `grid` is the
+        (rows, cols, gridOffset) to use, the active config by default."""
+        if grid is None:
+            grid = self.active_grid()
+        rows, cols, offset = grid[:3]
         if mode == "resize":
-            normalize = lambda *xy: int(
-                (BASE_CONFIG["gridOffset"][xy[0]] + BASE_CONFIG["gridOffset"][xy[1]])
-                / (xy[2] or 1)
-            )
+            normalize = lambda *xy: int((offset[xy[0]] + offset[xy[1]]) / (xy[2] or 1))
             r_l = normalize(3, 1, cols)
             t_b = normalize(0, 2, rows)
             return Location(point.width - r_l, point.height - t_b)
         elif mode == "snap":
-            return Location(
-                width=BASE_CONFIG["gridOffset"][1], height=BASE_CONFIG["gridOffset"][0]
-            )
+            return Location(width=offset[1], height=offset[0])
         return point
 
     def get_offset(self, center: bool = True) -> Location:
@@ -472,9 +634,9 @@ class MonitorCalculator(FloatUtils):
         1) Calculate monitor center
         2) Calculate window offset
         3) If Tensors are intersecting: monitor center - offset = true center"""
-        display = self.area_matrix[self.workspace_num]
+        display = self.area_matrix[self.placement_output()]
         window = self.get_target(self.focused_node)
-        if center or BASE_CONFIG["snapLocation"] == 0:
+        if center or self.config["snapLocation"] == 0:
             # Abs center (2, 2)
             display_offset, target_offset = self.get_matrix_center(
                 2, 2, display, window
@@ -494,90 +656,199 @@ class MonitorCalculator(FloatUtils):
         data = Location(center_x, center_y)
         return self.xrandr_calulator(data)
 
+    @timed("xrandr")
     def xrandr_calulator(self, orig_point: Location) -> Location:
-        """Uses the xrandr module to calculate the offset per monitor
-        in relevance to the overall figure. Caches per run."""
+        """Calculates the offset per monitor in relevance to
+        the overall figure (multi monitor setups)."""
+        position = self.monitor_position()
+        if position is None:
+            return orig_point
+        return Location(
+            orig_point.width + position.width, orig_point.height + position.height
+        )
+
+    def monitor_position(self) -> Location:
+        """Position of the monitor the window is placed on. i3 already
+        reports the output rects, the xrandr module (two subprocesses) is
+        only used when requested by `useXrandr`."""
+        display = self.screens[self.placement_output()]
+        if self.config["useXrandr"]:
+            return self.xrandr_position(display["name"])
+        return Location(display["rect"]["x"], display["rect"]["y"])
+
+    def xrandr_position(self, name: str = None) -> Location:
+        """Uses the xrandr module to find the monitor position (default:
+        the focused monitor). Caches per xrandr configuration."""
         if not self.xrandr_config:
             self.xrandr_config = self.xrandr_parser()
-        for n, monitor in self.xrandr_config.outputs.items():
-            monitor = monitor.__dict__
-            if n == self.active_output:
-                th = orig_point.height + monitor["position"][1]
-                tw = orig_point.width + monitor["position"][0]
-                return Location(tw, th)
-        return orig_point
+        if self._positions is None or self._positions[0] is not self.xrandr_config:
+            positions = {
+                n: Location(*monitor.position)
+                for n, monitor in self.xrandr_config.outputs.items()
+                if monitor.active  # Only active outputs have a position
+            }
+            self._positions = (self.xrandr_config, positions)
+        return self._positions[1].get(name or self.active_output)
 
     def get_target(self, node: dict) -> Location:
         return Location(width=node["rect"]["width"], height=node["rect"]["height"])
 
     def find_grid_axis(self, loc: int = None) -> tuple:
-        loc = loc or BASE_CONFIG["snapLocation"]
-        return divmod(loc - 1, BASE_CONFIG["defaultGrid"]["columns"])
-
-    def calculate_grid(self, rows: int, cols: int, display: Location) -> Tensor:
+        loc = loc or self.config["snapLocation"]
+        return divmod(loc - 1, self.active_grid()[1])
+
+    @timed("grid")
+    def calculate_grid(
+        self,
+        rows: int,
+        cols: int,
+        display: Location,
+        offset: tuple = None,
+        weights: tuple = UNIFORM,
+    ) -> Tensor:
         """Calculates all quadrants in the given xrandr matrix with proper offset
-        querying and management."""
-        main_loc = Location(int(display.width / cols), int(display.height / rows))
-        # Account for window size offset (grid quadrant size - offset/(rows | cols))
-        self.per_quadrant_dim = self.calc_monitor_offset("resize", main_loc)
-        grid = [[0 for _ in range(cols)] for _ in range(rows)]
-        i = 1
-        rolling_dimension = Location(0, 0)
-        row_match = roll_width = roll_height = 0
-        carry_flag = True
-        for row in range(len(grid)):
-            row_tracker = row
-            for col in range(len(grid[row])):
-                if row != 0 or col != 0:  # Top row and left col
-                    roll_width = rolling_dimension.width + self.per_quadrant_dim.width
-                if row_match != row_tracker:
-                    roll_height = (
-                        rolling_dimension.height + self.per_quadrant_dim.height
-                    )
-                    row_match = row_tracker
-                    roll_width = 0
-                # Roll from previous grid number
-                rolling_dimension = Location(roll_width, roll_height)
-                if carry_flag:
-                    overlay_top = self.calc_monitor_offset(
-                        "snap", rolling_dimension  # , loc=i
-                    )
-                    adjusted = Location(  # Adjust for offset
-                        abs(roll_width + overlay_top.width),
-                        abs(roll_height + overlay_top.height),
-                    )
-                else:
-                    adjusted = Location(roll_width, roll_height)
-                grid[row][col] = (i, adjusted)
-                i += 1
+        querying and management. Served from the grid cache when possible.
+        `weights` are the (row, column) weights of a weighted grid."""
+        assert self.config["snapLocation"] <= (
+            rows * cols
+        ), "Incorrect Target; not in grid"
+        if offset is None:
+            offset = self.config["gridOffset"]
+        key = (rows, cols, tuple(offset), weights, display)
+        cached = self.grid_cache.get(key)
+        if not cached:
+            cached = self.build_grid(*key)
+            self.grid_cache.put(key, *cached)
+        grid, self.per_quadrant_dim = cached
         self.cache_grid = grid
         return grid
 
+    def build_grid(
+        self, rows: int, cols: int, offset: tuple, weights: tuple, display: Location
+    ) -> (Tensor, Location):
+        """Computes the quadrants of a rows*cols grid over the display.
+        Returns the grid and the (offset adjusted) quadrant size."""
+        spec = (rows, cols, tuple(offset), weights)
+        engine = self.grid_engine()
+        if display in engine.displays and spec in engine.index:
+            o, g = engine.displays.index(display), engine.grid_index(spec)
+        else:  # Not a configured grid or display
+            engine, o, g = GridEngine([display], [spec]), 0, 0
+        grid = [[(i, Location(*loc)) for i, loc in row] for row in engine.tensor(o, g)]
+        return grid, Location(*engine.size(o, g))
+
+    def grid_spec(self, grid: Mapping) -> tuple:
+        """(rows, columns, gridOffset, weights) of an rc grid (defaultGrid,
+        gridPresets and outputGrids entries)."""
+        offset = grid.get("gridOffset", self.config["gridOffset"])
+        weights = tuple(
+            parse_axis(grid[k])[1] if grid.get(k) else None
+            for k in GRID_WEIGHTS.values()
+        )
+        return grid["rows"], grid["columns"], tuple(offset), weights
+
+    def default_grid(self) -> tuple:
+        return self.grid_spec(self.config["defaultGrid"])
+
+    def output_grid(self, o: int) -> tuple:
+        """(rows, columns, gridOffset, weights) of output o: its outputGrids
+        entry, else the default grid."""
+        grid = self.config["outputGrids"].get(self.screens[o]["name"])
+        if grid is None:
+            return self.default_grid()
+        return self.grid_spec(grid)
+
+    def active_grid(self) -> tuple:
+        """The grid of the output windows are placed on."""
+        return self.output_grid(self.placement_output())
+
+    def placement_output(self) -> int:
+        """Number (area_matrix key) of the output the actions place the
+        window on: `targetOutput` (--output) if set, else the focused one."""
+        ref = self.config["targetOutput"]
+        if not ref:
+            return self.workspace_num
+        return self.output_index().resolve(str(ref), self.workspace_num)
+
+    def output_index(self) -> OutputIndex:
+        """Spatial index of every output and its grid. Rebuilt only when
+        the outputs or the configured grids change."""
+        engine = self.grid_engine()
+        rects = tuple(tuple(d["rect"].values()) for d in self.screens)
+        if self._outputs_key != (self._engine_key, rects):
+            self._outputs_key = (self._engine_key, rects)
+            specs = [self.output_grid(o) for o in range(len(self.screens))]
+            self._outputs = OutputIndex(self.screens, specs, engine)
+        return self._outputs
+
+    def preset_grids(self) -> List[tuple]:
+        return [self.grid_spec(p) for p in self.config["gridPresets"].values()]
+
+    def cell_dim(self, loc: int) -> Location:
+        """Size of grid location loc of the active grid. Every cell of a
+        uniform grid has the per_quadrant_dim size."""
+        grid = self.active_grid()
+        if grid[3] == UNIFORM:
+            return self.per_quadrant_dim
+        engine = self.grid_engine()
+        o, g = self.placement_output(), engine.grid_index(grid)
+        return Location(*engine.cell_size(o, g, max(loc, 1)))
+
+    @timed("grid")
+    def grid_engine(self) -> GridEngine:
+        """Grid engine over every display (area_matrix) and every configured
+        grid (active and presets), computed in one batch. Rebuilt only when
+        the displays or the configured grids change."""
+        displays = tuple(self.area_matrix[i] for i in sorted(self.area_matrix))
+        outputs = [self.output_grid(o) for o in range(len(self.screens))]
+        grids = tuple(
+            dict.fromkeys([self.default_grid()] + self.preset_grids() + outputs)
+        )
+        if self._engine_key != (displays, grids):
+            self._engine_key = (displays, grids)
+            self._engine = GridEngine(displays, grids)
+        return self._engine
+
+    @timed("grid")
+    def precompute_presets(self) -> None:
+        """Fills the grid cache with every named preset (gridPresets)
+        on every display, so switching presets is a lookup."""
+        engine = self.grid_engine()
+        for o, display in enumerate(engine.displays):
+            for spec in self.preset_grids():
+                key = spec + (display,)
+                if not self.grid_cache.get(key):
+                    g = engine.grid_index(spec)
+                    grid = [
+                        [(i, Location(*loc)) for i, loc in row]
+                        for row in engine.tensor(o, g)
+                    ]
+                    self.grid_cache.put(key, grid, Location(*engine.size(o, g)), False)
+        self.grid_cache.save()
+
     def multi_pnt_calc(self):
         """Calculation for user multipoints. Uses the max min
         procedure to determine top left and bottom right position."""
-        chosen_range = [int(i) for i in BASE_CONFIG["multis"]]
+        top_left, self.per_quadrant_dim = self.multi_span()
+        self.make_resize()  # Multis requries additional resize
+        return top_left
+
+    @timed("grid")
+    def multi_span(self) -> (tuple, Location):
+        """The top left grid quadrant and the stretched window
+        size of the multis range."""
+        chosen_range = [int(i) for i in self.config["multis"]]
         mid = (min(chosen_range), max(chosen_range))
-        total_size = (
-            BASE_CONFIG["defaultGrid"]["rows"] * BASE_CONFIG["defaultGrid"]["columns"]
-        )
+        grid = self.active_grid()
+        total_size = grid[0] * grid[1]
         assert (
             0 < mid[0] <= total_size and mid[1] <= total_size
         ), "Incorrect grid inputs"
 
-        loc = [self.find_grid_axis(loc=mid[0]), self.find_grid_axis(loc=mid[1])]
-        self.per_quadrant_dim = Location(
-            (
-                self.per_quadrant_dim.width
-                + self.per_quadrant_dim.width * (loc[1][1] - loc[0][1])
-            ),
-            (
-                self.per_quadrant_dim.height
-                + self.per_quadrant_dim.height * (loc[1][0] - loc[0][0])
-            ),
-        )
-        self.make_resize()  # Multis requries additional resize
-        return self.cache_grid[loc[0][0]][loc[0][1]]
+        engine = self.grid_engine()
+        g = engine.grid_index(grid)
+        origin, size = engine.span(self.placement_output(), g, *mid)
+        return (mid[0], Location(*origin)), Location(*size)
 
     def get_matrix_center(self, rows, cols, *windows: Location) -> Location:
         return [
@@ -589,6 +860,7 @@ class MonitorCalculator(FloatUtils):
 class Movements(MonitorCalculator):
     def __init__(self,) -> None:
         super().__init__()
+        self.layouts = LayoutStore(Utils.data_path("layouts.json"))
 
     def move_to_center(self, **kwargs) -> list:
         """Moves the focused window to
@@ -599,35 +871,35 @@ class Movements(MonitorCalculator):
         # XRandr offsets (that can extend in any direction).
         true_center = self.get_offset()
         # Dispatch final command
-        return Utils.dispatch_i3msg_com(command="move", data=true_center)
+        return self.dispatch_unless_in_place("move", true_center)
 
     def make_resize(self, **kwargs) -> list:
         target_size = self.per_quadrant_dim
-        return Utils.dispatch_i3msg_com("resize", data=target_size)
+        return self.dispatch_unless_in_place("resize", target_size)
 
     def custom_resize(self, **kwargs) -> list:
         """Resize window to custom screen percentage"""
-        cp = BASE_CONFIG["defaultResetPercentage"]
-        return Utils.dispatch_i3msg_com("custom", data=f"{cp}ppt")
+        cp = self.config["defaultResetPercentage"]
+        return self.dispatch("custom", data=f"{cp}ppt")
 
     def snap_to_grid(self, **kwargs) -> list:
         """Moves the focused window to the target
         (default: 0) position in current grid (default: 2*2)"""
         true_center = kwargs.get("tc", self.get_offset(center=False,))
-        return Utils.dispatch_i3msg_com("move", true_center)
+        return self.dispatch_unless_in_place("move", true_center)
 
     def reset_win(self, **kwargs) -> list:
         """Moves to center and applies default tile
         to float properties (center, 75ppt)"""
-        return Utils.dispatch_i3msg_com(
-               command="reset",
-               data=str(BASE_CONFIG['defaultResetPercentage']))
+        return self.dispatch(
+            command="reset", data=str(self.config["defaultResetPercentage"])
+        )
 
     def make_float(self, **kwargs) -> list:
         """Moves the current window into float mode if it is not
         float. If float, do nothing. Does not resize but i3 does so
         by default sometimes (based on config and instance rules)."""
-        return Utils.dispatch_i3msg_com(command="float")
+        return self.dispatch_unless_in_place("float")
 
     def hide_scratchpad(self, **kwargs) -> list:
         """Hides the current window (if
@@ -646,59 +918,250 @@ class Movements(MonitorCalculator):
     def multi_select(self, **kwargs) -> list:
         """Supports selection ranges
         that are continous and non-perpendicular."""
-        if BASE_CONFIG["multis"] == 0:
+        if self.config["multis"] == 0:
             return self.move_to_center()
-        elif len(BASE_CONFIG["multis"]) == 1:
+        elif len(self.config["multis"]) == 1:
             return self.move_to_center()
 
         top_left = self.multi_pnt_calc()
-        return Utils.dispatch_i3msg_com("move", self.xrandr_calulator(top_left[1]))
+        return self.dispatch_unless_in_place("move", self.xrandr_calulator(top_left[1]))
+
+    def arrange(self, **kwargs) -> list:
+        """Tiles every floating window of the workspace on the grid shape
+        that fits their number best, as a single i3 message."""
+        floating = [w for w in self.current_windows if w[2] in FLOATING]
+        return self.dispatch_batch(self.plan_arrange(floating))
+
+    @timed("plan")
+    def plan_arrange(self, windows: List[tuple]) -> List[str]:
+        """The con_id prefixed resize and move commands that place the
+        windows, in order, on the cells of the best grid (engine.best_shape)
+        of the current display. The gridOffset is kept."""
+        if not windows:
+            return []
+        o = self.placement_output()
+        display, offset = self.area_matrix[o], self.output_grid(o)[2]
+        self.arrangement = best_shape(len(windows), display, offset)
+        engine = GridEngine([display], [self.arrangement + (offset,)])
+        width, height = engine.size(0, 0)
+        plan = []
+        for n, w in enumerate(windows, 1):
+            origin = self.xrandr_calulator(Location(*engine.cell(0, 0, n)))
+            plan += [
+                f"[con_id={w[1]}] resize set {max(width, 0)} {max(height, 0)}",
+                f"[con_id={w[1]}] move window position "
+                f"{max(origin.width, 0)} {max(origin.height, 0)}",
+            ]
+        return plan
+
+    def layout_name(self, **kwargs) -> str:
+        name = kwargs.get("name") or self.config["layoutName"]
+        if not name:
+            raise ValueError("Missing layout name (Ex: save-layout <name>)")
+        return name
+
+    def window_nodes(self, floating: bool = False) -> List[dict]:
+        """The tree nodes of the windows in the workspace (current_windows)."""
+        nodes = [self.tree_index.nodes[w[1]] for w in self.current_windows]
+        return [
+            n
+            for n in nodes
+            if n.get("window") and (not floating or n.get("floating") in FLOATING)
+        ]
+
+    def save_layout(self, **kwargs) -> list:
+        """Stores every floating window of the workspace (identity, output,
+        grid cell and rect) as the layout kwargs `name` or `layoutName`."""
+        name = self.layout_name(**kwargs)
+        outputs = self.output_index()
+        rows = []
+        for node in self.window_nodes(floating=True):
+            rect = node["rect"]
+            o, cell = outputs.cell_at(rect["x"], rect["y"]) or (self.workspace_num, 1)
+            left, top = outputs.rects[o][:2]
+            rows.append(
+                list(identity(node))
+                + [outputs.names[o], cell, rect["x"] - left, rect["y"] - top]
+                + [rect["width"], rect["height"]]
+            )
+        self.layouts.put(name, self.current_display["name"], rows)
+        return rows
+
+    def restore_layout(self, **kwargs) -> list:
+        """Puts the windows of the workspace back where the layout kwargs
+        `name` or `layoutName` saw them, as a single i3 message."""
+        layout = self.layouts.get(self.layout_name(**kwargs))
+        return self.dispatch_batch(self.plan_restore(layout["windows"]))
+
+    @timed("plan")
+    def plan_restore(self, rows: List[list]) -> List[str]:
+        """The con_id prefixed commands that restore the saved rows on the
+        matching windows. A rect that no longer fits its output (or an
+        output that is gone) falls back to the saved cell of the output
+        (else the focused one) in its current grid."""
+        outputs = self.output_index()
+        tolerance = self.config["placementTolerance"]
+        plan = []
+        for row, node in match(rows, self.window_nodes()):
+            output, cell, x, y, width, height = row[3:]
+            o = outputs.numbers.get(output)
+            if o is not None and x >= 0 and y >= 0:
+                left, top, out_w, out_h = outputs.rects[o]
+                fits = x + width <= out_w and y + height <= out_h
+            else:
+                fits = False
+            if fits:
+                x, y = x + left, y + top
+            else:
+                o = self.workspace_num if o is None else o
+                rows_, cols = outputs.specs[o][:2]
+                cell = min(cell, rows_ * cols)
+                x, y = outputs.origin(o, cell)
+                width, height = outputs.size(o, cell)
+            con = f"[con_id={node['id']}]"
+            rect = node["rect"]
+            floating = node.get("floating") in FLOATING
+            current = (rect["x"], rect["y"], rect["width"], rect["height"])
+            if (
+                floating
+                and "rect" in self.fresh
+                and all(
+                    abs(c - t) <= tolerance
+                    for c, t in zip(current, (x, y, width, height))
+                )
+            ):
+                self.elided += 2
+                continue
+            if not floating:
+                plan.append(f"{con} floating enable")
+            plan += [
+                f"{con} resize set {max(width, 0)} {max(height, 0)}",
+                f"{con} move window position {max(x, 0)} {max(y, 0)}",
+            ]
+        return plan
+
+    def plan_command(self, cmd: str, loc: int) -> List[str]:
+        """The i3 command strings of a single run(cmd) on a window
+        placed at grid location `loc` (user flags included)."""
+        resize = lambda d: f"resize set {max(d.width, 0)} {max(d.height, 0)}"
+        move = lambda p: f"move window position {max(p.width, 0)} {max(p.height, 0)}"
+        percent = lambda p: [f"resize set {p}ppt {p}ppt", "move position center"]
+        plan = []
+        if self.config["autoConvertToFloat"]:
+            plan.append("floating enable")
+        if self.config["autoResize"]:
+            plan.append(resize(self.cell_dim(loc)))
+
+        multis = self.config["multis"]
+        if cmd == "center" or (cmd == "multi" and (multis == 0 or len(multis) == 1)):
+            # i3 centers on the window size, which may not be known yet
+            plan.append("move position center")
+        elif cmd == "float":
+            plan.append("floating enable")
+        elif cmd == "resize":
+            plan.append(resize(self.cell_dim(loc)))
+        elif cmd == "snap":
+            engine = self.grid_engine()
+            g = engine.grid_index(self.active_grid())
+            origin = Location(*engine.cell(self.placement_output(), g, loc))
+            plan.append(move(self.xrandr_calulator(origin)))
+        elif cmd == "multi":
+            top_left, size = self.multi_span()
+            plan += [resize(size), move(self.xrandr_calulator(top_left[1]))]
+        elif cmd in ("csize", "reset"):
+            plan += percent(self.config["defaultResetPercentage"])
+        elif cmd == "hide":
+            plan.append("scratchpad show")
+        else:
+            raise ValueError(f"'{cmd}' can not be applied to all windows")
+        return plan
+
+    @timed("plan")
+    def plan_all(self, commands: list, windows: List[tuple]) -> List[str]:
+        """Computes every window placement up front from the cached grid.
+        Windows are assigned to sequential grid locations (wrapping around
+        once the grid is full). Returns con_id prefixed command strings."""
+        rows, cols = self.active_grid()[:2]
+        cells = rows * cols
+        loc, plan = 1, []
+        for w in windows:
+            last = {}  # Repeated flags (float, resize) are no-ops in i3
+            for cmd in commands:
+                for c in self.plan_command(cmd, loc):
+                    verb = c.split(" ")[0]
+                    if last.get(verb) != c:
+                        plan.append(f"[con_id={w[1]}] {c}")
+                        last[verb] = c
+                if cmd not in self.passive_actions:  # iterate target
+                    loc = loc % cells + 1
+        return plan
 
-    def all_override(self, commands: list, **kwargs) -> List[tuple]:
+    def all_override(
+        self, commands: list, config: Mapping = None, **kwargs
+    ) -> List[tuple]:
         """The overrider for the run command to optimize for
-        multiple actions. Automatically syncs the i3 state
-        between each given command (from commandse). All kwargs are passed
-        to the run function. Kwargs:
-        floating {boolean}: Applies the actions to only the floating windows."""
-        global BASE_CONFIG
-        _tmp_loc = BASE_CONFIG["snapLocation"]
-        self.post_commands(all_key=True, passive=False)
+        multiple actions. Plans the given commands for every window in
+        the workspace and dispatches them as a single i3 message. Kwargs:
+        floating {boolean}: Applies the actions to only the floating windows.
+        synced {boolean}: The windows were just read (by the constructor).
+        Runs from the config snapshot if given (see FloatManager.configure)."""
+        self.timer.reset()
+        with self.configured(config):
+            if self.profile:
+                path = profile_path(self.profile, "all")
+                profiled(path, self._all_override, commands, **kwargs)
+            else:
+                self._all_override(commands, **kwargs)
+        self.timings = self.timer.snapshot()
+        self.fresh = set()  # Every window was placed
+        for cmd in commands:  # One event per action (not per window)
+            self.publish(cmd)
+        return self.current_windows
+
+    def _all_override(self, commands: list, synced=False, **kwargs) -> None:
+        if not synced:
+            self.post_commands(all_key=True, passive=False)
         # all override for only floating win
         if "floating" in kwargs and kwargs["floating"]:
             self.current_windows = [
                 d for d in self.current_windows if d[2] == "user_on"
             ]
 
-        BASE_CONFIG["snapLocation"] = 1  # Temporary changes to data
-        for w in self.current_windows:
-            for cmd in commands:
-                self.focus_window(id=w[1])  # focus win
-                self.run(cmd, all=True, **kwargs)  # dispatch final cmd
-                if cmd not in self.passive_actions:  # iterate target
-                    BASE_CONFIG["snapLocation"] += 1
-        BASE_CONFIG["snapLocation"] = _tmp_loc  # Restore state
-
-        return self.current_windows
+        plan = self.plan_all(commands, self.current_windows)
+        with self.timer.phase("dispatch"):
+            self.dispatch_batch(plan)
 
 
 class FloatManager(Movements, Middleware):
     def __init__(self, **kwargs) -> None:
         """Manager > Movement > Calculator > Utility > Dispatch event.
         Accepts kwargs: `all` (for all window actions), `actions` (list of
-        initial actions to run, if all) """
+        initial actions to run, if all), `state_cache` (a state.StateCache
+        to read the i3 state from, instead of querying per action),
+        `profile` (profile file of every action, see timings.profiled)"""
+        self.state_cache = kwargs.get("state_cache", None)
+        self.profile = kwargs.get("profile", None)
+        # Per phase timings (ms) of the startup and of the last action
+        self.timer, self.timings = PhaseTimer(), {}
         super().__init__()
-        # 1) Read config and merge globals
-        Utils.read_config()
-        # 2) Override to on the fly settings
-        Utils.on_the_fly_override(serialize=False, **kwargs)
+        with self.timer.phase("config"):
+            # 1) Read config over the defaults (never changed)
+            config = Utils.read_config()
+            # 2) Override to on the fly settings, the manager snapshot
+            self.config = Utils.on_the_fly_override(config=config, **kwargs)
         # 3) Run initalizing commands
         self.passive_actions = {"resize", "float", "hide", "listen"}
+        # Read every window of the workspace
+        self.window_actions = {"arrange", "save-layout", "restore-layout"}
+        self.arrangement = None  # (rows, columns) of the last arrange
         self.workspace_num = self.get_wk_number()
         self._TERMSIG = kwargs.get("all", False)
         floating = kwargs.get("floating", False)
 
-        self.post_commands(all_key=self._TERMSIG)  # Sync to state
-        kwargs
+        self.precompute_presets()
+        # Sync to state, every window of a cold all_override (read once)
+        self.post_commands(all_key=self._TERMSIG or floating)
+        self.startup_timings = self.timer.snapshot()
         kwargs["commands"] = kwargs.get("commands", list(Documentation.actions))
         self.com_map = {
             c: e
@@ -714,45 +1177,135 @@ class FloatManager(Movements, Middleware):
                     self.reset_win,
                     self.start_server,
                     self.multi_select,
+                    self.arrange,
+                    self.save_layout,
+                    self.restore_layout,
                 ],
             )
         }
         if self._TERMSIG or floating:  # 4) Transform to global flags
             if "actions" not in kwargs:
                 raise ValueError("Missing kwargs `commands` for all_override")
-            self.all_override(kwargs["actions"], floating=floating)
+            self.all_override(kwargs["actions"], floating=floating, synced=True)
             self._TERMSIG = True  # Exit point for CLI
             return
 
-    def run_flags(self) -> None:
-        if BASE_CONFIG["autoConvertToFloat"]:
+    def refresh(self) -> None:
+        """Re-syncs the output and workspace metadata for long lived
+        managers (daemon). The xrandr configuration is only dropped
+        when the monitor layout itself changed."""
+        _layout = [d["rect"] for d in self.displays]
+        self.area_matrix, self.current_display = self._calc_metadata()
+        self.workspace_num = self.get_wk_number()
+        if _layout != [d["rect"] for d in self.displays]:
+            self.xrandr_config = None
+
+    def run_flags(self) -> bool:
+        """Runs the auto float and resize flags. True if any of their
+        commands was sent (not skipped as a no-op)."""
+        elided, sent = self.elided, 0
+        if self.config["autoConvertToFloat"]:
             self.make_float()
-        if BASE_CONFIG["autoResize"]:
+            sent += 1
+        if self.config["autoResize"]:
             self.make_resize()
+            sent += 1
+        return self.elided - elided < sent
+
+    def configure(self, **kwargs) -> Mapping:
+        """A read only snapshot of the manager config with the cli flags
+        (rows, target, preset...) applied, for run and all_override."""
+        return Utils.on_the_fly_override(config=self.config, **kwargs)
+
+    @contextlib.contextmanager
+    def configured(self, config: Mapping = None):
+        """Runs the block from the config snapshot (default: the manager
+        config), the manager config is back afterwards. A manager runs
+        one action at a time, concurrent runs use a manager each."""
+        if config is None:
+            yield self.config
+            return
+        previous, self.config = self.config, config
+        try:
+            yield config
+        finally:
+            self.config = previous
 
-    def run(self, cmd: str, **kwargs) -> list:
+    def run(self, cmd: str, config: Mapping = None, **kwargs) -> list:
         """The main command dispatcher. Used to abstract state syncronization.
         All kwargs are passed to the action. Accepts commands that must be
-        refreshed on every action to sync state (C socket data transfer)"""
+        refreshed on every action to sync state (C socket data transfer).
+        Runs from the config snapshot if given (see configure), else from
+        the manager config.
+        The per phase timings (ms) are kept in `timings`; with the kwarg
+        `timings=True` the return value is (action result, timings)."""
         if cmd not in self.com_map:
             raise KeyError("No corresponding run command to input:", cmd)
 
+        with_timings = kwargs.pop("timings", False)
+        self.timer.reset()
+        with self.configured(config):
+            if self.profile:
+                path = profile_path(self.profile, cmd)
+                result = profiled(path, self._run, cmd, **kwargs)
+            else:
+                result = self._run(cmd, **kwargs)
+        self.timings = self.timer.snapshot()
+        self.publish(cmd)
+        return (result, self.timings) if with_timings else result
+
+    def _run(self, cmd: str, **kwargs) -> list:
         passive = True if cmd in self.passive_actions else False
-        _ak = kwargs.get("all", False)
-        self.run_flags()  # run user flags, if any
-        self.post_commands(all_key=_ak, passive=passive)  # sync state
-        threading.Thread(  # Thread middleware to speed up action
-            target=self.dispatch_middleware,
-            args=(
-                {
-                    "command": cmd,
-                    "modifying_node": self.focused_node,
-                    "grid": self.cache_grid,
-                    "monitors": self.displays,
-                },
-            ),
-        ).start()  # Anonymous thread, since dataflow is unidirectional.
-        return self.com_map[cmd](**kwargs)
+        _ak = kwargs.get("all", False) or cmd in self.window_actions
+        self.fresh = set()  # Only the state read for this action is trusted
+        try:
+            if self.state_cache and self.needs_geometry(cmd):
+                self.state_cache.invalidate()  # i3 has no resize events
+            # Synced before the user flags, so that they can skip no-ops
+            sync = not passive or self.state_cache is not None
+            self.post_commands(all_key=_ak, passive=not sync)
+            with self.timer.phase("dispatch"):
+                # These place every window
+                flagged = cmd not in self.window_actions and self.run_flags()
+            if flagged and self.needs_geometry(cmd):
+                if self.state_cache:
+                    self.state_cache.invalidate()
+                self.post_commands(all_key=_ak)  # The window size changed
+            with self.timer.phase("dispatch"):
+                return self.com_map[cmd](**kwargs)
+        finally:
+            self.fresh = set()  # The window (or the focus) may change
+
+    def publish(self, cmd: str) -> None:
+        """Sends the action event to the middleware listener, unless no
+        listener is up or no subscriber wants it. A copy of the wanted
+        fields is queued, the state cache patches the live nodes from its
+        thread while the publisher thread serializes."""
+        target = self.middleware_publisher()
+        if not target.accepts(cmd):
+            return
+        event = {
+            "command": cmd,
+            "modifying_node": self.focused_node,
+            "grid": self.cache_grid,
+            "monitors": self.displays,
+            "timings": self.timings,
+        }
+        event = events.project(event, target.interest)
+        cache = self.state_cache
+        with cache.lock if cache else contextlib.nullcontext():
+            event = copy.deepcopy(event)
+        target.publish(event)
+
+    def needs_geometry(self, cmd: str) -> bool:
+        """If the action centers on the focused window size, or stores
+        the window rects (save-layout)."""
+        multis = self.config["multis"]
+        return (
+            cmd in ("center", "save-layout")
+            or (cmd == "snap" and self.config["snapLocation"] == 0)
+            or (cmd == "multi" and (multis == 0 or len(multis) == 1))
+        )
 
     def post_commands(self, all_key=False, passive=False) -> None:
         """Runs all the state related commands with
@@ -760,9 +1313,12 @@ class FloatManager(Movements, Middleware):
         if not passive:
             self.assign_focus_node(all_key)
 
-        if not self.cache_grid:
-            self.float_grid = self.calculate_grid(
-                BASE_CONFIG["defaultGrid"]["rows"],
-                BASE_CONFIG["defaultGrid"]["columns"],
-                self.area_matrix[self.workspace_num],
-            )
+        # The grid is only valid for the layout it was computed with
+        rows, cols, offset, weights = self.active_grid()
+        display = self.area_matrix[self.placement_output()]
+        grid_key = (rows, cols, offset, weights, display)
+        if not self.cache_grid or grid_key != self._grid_key:
+            self._grid_key = grid_key
+            self.float_grid = self.calculate_grid(rows, cols, display, offset, weights)
+        if weights != UNIFORM:  # Resized to the size of the target cell
+            self.per_quadrant_dim = self.cell_dim(self.config["snapLocation"])
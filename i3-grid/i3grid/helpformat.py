@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# argparse help formatting for the full cli parser (doc.Documentation).
+# Kept apart from doc.py so that importing the documentation does not
+# import argparse.
+
+from argparse import (
+    SUPPRESS,
+    Action,
+    ArgumentParser,
+    HelpFormatter,
+    RawTextHelpFormatter,
+)
+
+
+class CustomFormatter(HelpFormatter):
+    """Custom Formatter used for documentation
+    in order to add groups and include metadata
+    for each command."""
+
+    def _format_action_invocation(self, action) -> str:
+        if not action.option_strings:
+            (metavar,) = self._metavar_formatter(action, action.dest)(1)
+            return metavar
+        else:
+            parts = []
+            if action.nargs == 0:
+                # if the Optional doesn't take a value, format the value
+                parts.extend(action.option_strings)
+            else:
+                # if the Optional takes a value, format as is
+                default = action.dest.upper()
+                args_string = self._format_args(action, default)
+                for option_string in action.option_strings:
+                    parts.append("%s %s" % (option_string, args_string))
+            if sum(len(s) for s in parts) < self._width - (len(parts) - 1) * 2:
+                return ", ".join(parts)
+            else:
+                return ",\n  ".join(parts)
+
+
+class NoAction(Action):
+    """Parser default setting changes to
+    help action calling. Allows for individual
+    groups per namespace."""
+
+    def __init__(self, **kwargs) -> None:
+        kwargs.setdefault("default", SUPPRESS)
+        kwargs.setdefault("nargs", 0)
+        super(NoAction, self).__init__(**kwargs)
+
+    def __call__(self, parser, namespace, values, option_string=None) -> None:
+        pass
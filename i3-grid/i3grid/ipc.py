@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Minimal i3 IPC client (https://i3wm.org/docs/ipc.html).
+# i3-py covers the one shot queries, but it can not subscribe to window
+# events and its header packing breaks for payloads over 127 bytes.
+# Every message is: "i3-ipc" <u32 length> <u32 type> <json payload>
+
+import json
+import os
+import socket
+import struct
+import subprocess
+import threading
+from typing import List, Tuple
+
+MAGIC = b"i3-ipc"
+HEADER = struct.Struct("=6sII")
+
+# Message types
+COMMAND = 0
+GET_WORKSPACES = 1
+SUBSCRIBE = 2
+GET_OUTPUTS = 3
+GET_TREE = 4
+
+# Replies with the highest bit set are events
+EVENT_MASK = 1 << 31
+EVENT_TYPES = {
+    0: "workspace",
+    1: "output",
+    2: "mode",
+    3: "window",
+    4: "barconfig_update",
+    5: "binding",
+    6: "shutdown",
+    7: "tick",
+}
+
+
+def socket_path() -> str:
+    """The i3 socket from $I3SOCK (set by i3 for its children), falls
+    back to asking i3 itself."""
+    path = os.environ.get("I3SOCK")
+    if path:
+        return path
+    out = subprocess.run(["i3", "--get-socketpath"], stdout=subprocess.PIPE)
+    return out.stdout.decode("utf-8").strip()
+
+
+def pack(msg_type: int, payload: str = "") -> bytes:
+    body = payload.encode("utf-8")
+    return HEADER.pack(MAGIC, len(body), msg_type) + body
+
+
+class Connection:
+    """Blocking connection to the i3 IPC socket."""
+
+    def __init__(self, path: str = None, timeout: float = None) -> None:
+        super().__init__()
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.lock = threading.Lock()  # One request/reply in flight
+
+    def _recv_exact(self, size: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < size:
+            chunk = self.sock.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("i3 closed the IPC socket")
+            buf += chunk
+        return bytes(buf)
+
+    def send(self, msg_type: int, payload: str = "") -> None:
+        self.sock.sendall(pack(msg_type, payload))
+
+    def receive(self) -> Tuple[int, object]:
+        """Reads a single message. Returns the (type, decoded payload)."""
+        magic, length, msg_type = HEADER.unpack(self._recv_exact(HEADER.size))
+        if magic != MAGIC:
+            raise ConnectionError(f"Invalid i3 IPC magic: {magic}")
+        return msg_type, json.loads(self._recv_exact(length).decode("utf-8"))
+
+    def get(self, msg_type: int, payload: str = "") -> object:
+        with self.lock:
+            self.send(msg_type, payload)
+            return self.receive()[1]
+
+    def command(self, payload: str) -> list:
+        return self.get(COMMAND, payload)
+
+    def subscribe(self, events: List[str]) -> bool:
+        return self.get(SUBSCRIBE, json.dumps(events))["success"]
+
+    def next_event(self) -> Tuple[str, dict]:
+        """Blocks until the next event (subscribed connections only)."""
+        msg_type, data = self.receive()
+        return EVENT_TYPES.get(msg_type & ~EVENT_MASK, str(msg_type)), data
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+_connection = None
+
+
+def default_connection() -> Connection:
+    """Process wide connection, opened on first use."""
+    global _connection
+    if _connection is None:
+        _connection = Connection()
+    return _connection
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Saved window layouts (save-layout / restore-layout). A layout keeps,
+# per floating window, its identity (class, instance, title), its output
+# and grid cell, and its rect relative to that output, as one compact
+# json row. Restoring matches the saved rows to the current windows,
+# most specific identity first.
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Row fields of a saved window
+FIELDS = ("class", "instance", "title", "output", "cell", "x", "y", "width", "height")
+# Identity prefixes tried in order when matching windows
+MATCH_LEVELS = (3, 2, 1)
+
+
+def identity(node: dict) -> Tuple[str, str, str]:
+    """(class, instance, title) of a window node."""
+    props = node.get("window_properties") or {}
+    return (
+        props.get("class") or "",
+        props.get("instance") or "",
+        props.get("title") or node.get("name") or "",
+    )
+
+
+def match(rows: Sequence[list], nodes: Sequence[dict]) -> List[Tuple[list, dict]]:
+    """Pairs of (saved row, window node). Every row and every window is
+    used at most once; rows first take the windows with the same class,
+    instance and title, then the same class and instance, then class."""
+    pairs, used, left = [], set(), list(rows)
+    for level in MATCH_LEVELS:
+        free: Dict[tuple, List[dict]] = {}
+        for node in nodes:
+            if node["id"] not in used:
+                free.setdefault(identity(node)[:level], []).append(node)
+        unmatched = []
+        for row in left:
+            candidates = free.get(tuple(row[:level]))
+            if candidates:
+                node = candidates.pop(0)
+                used.add(node["id"])
+                pairs.append((row, node))
+            else:
+                unmatched.append(row)
+        left = unmatched
+    return pairs
+
+
+class LayoutStore:
+    """Named layouts in one json file, written atomically."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.layouts = None  # Loaded on first use
+
+    def _load(self) -> None:
+        self.layouts = {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring the unreadable layout file {self.path}: {e}")
+            return
+        if data.get("version") == FORMAT_VERSION:
+            self.layouts = data["layouts"]
+
+    def names(self) -> List[str]:
+        if self.layouts is None:
+            self._load()
+        return sorted(self.layouts)
+
+    def get(self, name: str) -> dict:
+        """The layout {workspace, windows: [rows]}. ValueError if unknown."""
+        if self.layouts is None:
+            self._load()
+        if name not in self.layouts:
+            raise ValueError(f"Unknown layout: {name}")
+        return self.layouts[name]
+
+    def put(self, name: str, workspace: str, rows: List[list]) -> None:
+        if self.layouts is None:
+            self._load()
+        self.layouts[name] = {"workspace": workspace, "windows": rows}
+        data = {"version": FORMAT_VERSION, "fields": FIELDS, "layouts": self.layouts}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
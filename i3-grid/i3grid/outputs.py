@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Spatial index over every output (monitor). Built once per output
+# layout, it answers which output and which grid cell hold a point and
+# where cell N of output M is, without querying i3 again. Outputs are
+# looked up by cutting the plane along every output edge: a point is
+# located with two bisections over those edges (a handful of values),
+# then one table lookup. Every output may use its own grid (outputGrids).
+
+import bisect
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    from .engine import GridEngine, GridSpec, Point, grid_spec
+except ImportError:
+    # cli
+    from engine import GridEngine, GridSpec, Point, grid_spec
+
+# Relative output references (--output) and their (axis, sign)
+DIRECTIONS = {"left": (0, -1), "right": (0, 1), "above": (1, -1), "below": (1, 1)}
+
+
+class OutputIndex:
+    """Outputs (i3 GET_OUTPUTS entries, in the area_matrix order) with
+    their grid specs. The engine, if given, must hold the output sizes
+    in the same order and every spec."""
+
+    def __init__(
+        self,
+        outputs: Sequence[dict],
+        specs: Sequence[GridSpec],
+        engine: GridEngine = None,
+    ) -> None:
+        super().__init__()
+        self.names = [o["name"] for o in outputs]
+        self.numbers: Dict[str, int] = {n: i for i, n in enumerate(self.names)}
+        self.rects = [
+            (r["x"], r["y"], r["width"], r["height"])
+            for r in (o["rect"] for o in outputs)
+        ]
+        self.active = [
+            o.get("active", True) and r[2] > 0 for o, r in zip(outputs, self.rects)
+        ]
+        self.primary = next(
+            (i for i, o in enumerate(outputs) if o.get("primary")), None
+        )
+        self.specs = [grid_spec(s) for s in specs]
+        if engine is None:
+            displays = [r[2:] for r in self.rects]
+            engine = GridEngine(displays, list(dict.fromkeys(self.specs)))
+        self.engine = engine
+        self.grids = [engine.grid_index(s) for s in self.specs]
+        self._build_plane()
+        self.neighbours = [self._neighbours(o) for o in range(len(self.names))]
+
+    def _build_plane(self) -> None:
+        rects = [r for r, a in zip(self.rects, self.active) if a]
+        self.xs = sorted({x for r in rects for x in (r[0], r[0] + r[2])})
+        self.ys = sorted({y for r in rects for y in (r[1], r[1] + r[3])})
+        self.plane: Dict[Tuple[int, int], int] = {}
+        for o, (x, y, w, h) in enumerate(self.rects):
+            if not self.active[o]:
+                continue
+            for i in range(self.xs.index(x), self.xs.index(x + w)):
+                for j in range(self.ys.index(y), self.ys.index(y + h)):
+                    self.plane.setdefault((i, j), o)
+
+    def _neighbours(self, o: int) -> Dict[str, int]:
+        """The closest active output in every direction of output o. An
+        output is in a direction when its centre lies past that edge of o;
+        outputs sharing a row (or column) with o are preferred."""
+        found = {}
+        for direction, (axis, sign) in DIRECTIONS.items():
+            near, far = self._span(o, axis)
+            edge = far if sign > 0 else near
+            best = None
+            for other in range(len(self.names)):
+                if other == o or not self.active[other]:
+                    continue
+                lo, hi = self._span(other, axis)
+                if (lo + hi) / 2 * sign < edge * sign:
+                    continue
+                across = self._span(other, 1 - axis)
+                own = self._span(o, 1 - axis)
+                apart = across[0] >= own[1] or across[1] <= own[0]
+                gap = (lo - edge) if sign > 0 else (edge - hi)
+                centres = abs(sum(across) - sum(own)) / 2
+                key = (apart, abs(gap), centres)
+                if best is None or key < best[0]:
+                    best = (key, other)
+            if best is not None:
+                found[direction] = best[1]
+        return found
+
+    def _span(self, o: int, axis: int) -> Point:
+        """(start, end) of output o along the x (0) or y (1) axis."""
+        start, length = self.rects[o][axis], self.rects[o][axis + 2]
+        return start, start + length
+
+    def output_at(self, x: int, y: int) -> Optional[int]:
+        """The output holding the point (absolute coordinates)."""
+        i = bisect.bisect_right(self.xs, x) - 1
+        j = bisect.bisect_right(self.ys, y) - 1
+        if i < 0 or j < 0 or i >= len(self.xs) - 1 or j >= len(self.ys) - 1:
+            return None
+        return self.plane.get((i, j))
+
+    def cell_at(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """(output, cell number) of the point. Points in the gridOffset
+        border belong to the nearest cell."""
+        o = self.output_at(x, y)
+        if o is None:
+            return None
+        x, y = x - self.rects[o][0], y - self.rects[o][1]
+        return o, self.engine.locate(o, self.grids[o], x, y)
+
+    def origin(self, o: int, n: int) -> Point:
+        """Absolute top left of cell n (1 based) of output o."""
+        x, y = self.engine.cell(o, self.grids[o], n)
+        return x + self.rects[o][0], y + self.rects[o][1]
+
+    def size(self, o: int, n: int = 1) -> Point:
+        """Size (offset adjusted) of cell n of output o."""
+        return self.engine.cell_size(o, self.grids[o], n)
+
+    def resolve(self, ref: str, current: int) -> int:
+        """Output number of an output name, a number (0 based, in the
+        area_matrix order), 'primary' or a direction from the current
+        output (left, right, above, below)."""
+        if ref in self.numbers:
+            return self.numbers[ref]
+        if ref in DIRECTIONS:
+            if ref not in self.neighbours[current]:
+                raise ValueError(f"No output {ref} of {self.names[current]}")
+            return self.neighbours[current][ref]
+        if ref == "primary" and self.primary is not None:
+            return self.primary
+        if ref.isdigit() and int(ref) < len(self.names):
+            return int(ref)
+        raise ValueError(f"Unknown output: {ref}")
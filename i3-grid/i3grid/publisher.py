@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Background publisher of the middleware events. One daemon thread per
+# broker address drains a bounded queue over a single reused connection,
+# so publishing an event on the hot path is a deque append. While no
+# broker (listen) is reachable, events are dropped without queueing until
+# the next reconnect attempt (exponential backoff). The broker tells each
+# publisher which commands and fields its subscribers want (INTEREST);
+# anything else is skipped before it is serialized, and callers check
+# `accepts` before they even build the event.
+
+import atexit
+import collections
+import logging
+import socket
+import threading
+import time
+from typing import Dict, Tuple
+
+try:
+    from . import events
+except ImportError:
+    # cli
+    import events
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait at exit for the queued events of a live connection
+EXIT_FLUSH = 0.5
+# Seconds before a stalled broker connection is dropped
+SEND_TIMEOUT = 1.0
+
+
+class EventPublisher:
+    """Publishes events (dicts, anything else is sent as {"data": ...})
+    to the broker at address."""
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        queue_size: int = 256,
+        max_backoff: float = 5.0,
+    ) -> None:
+        super().__init__()
+        self.address = address
+        self.max_backoff = max_backoff
+        self.queue = collections.deque(maxlen=queue_size)  # Drops the oldest
+        self.cond = threading.Condition()
+        self.sock = None
+        self.encoder = events.EventEncoder()  # Deltas of the connection
+        self.replies = events.EventDecoder()  # INTEREST frames of the broker
+        self.interest = events.EVERYTHING
+        self.skipped = 0
+        self.busy = False  # An event is being sent
+        self.poll = False  # Read the INTEREST frames without an event
+        self.backoff = self.retry_at = 0.0
+        self.dropped = 0
+        self.thread = None
+
+    def accepts(self, command: str) -> bool:
+        """If an event of command would be sent, checked before the event
+        is built. False within the no-broker backoff, or when no subscriber
+        wants the command (the sender thread then re-reads the interest, so
+        a new subscriber gets the following events)."""
+        if self.retry_at and time.monotonic() < self.retry_at:
+            self.dropped += 1
+            return False
+        if events.wants(self.interest, {"command": command}):
+            return True
+        with self.cond:
+            self.skipped += 1
+            if self.thread is not None:
+                self.poll = True
+                self.cond.notify()
+        return False
+
+    def publish(self, event: object) -> bool:
+        """Queues the event. False if it was dropped (no broker)."""
+        if self.retry_at and time.monotonic() < self.retry_at:
+            self.dropped += 1
+            return False
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(event)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+                atexit.register(self.flush, EXIT_FLUSH)
+            self.cond.notify()
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until every queued event was sent (or dropped)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.queue or self.busy or self.poll:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.queue and not self.poll:
+                    self.cond.wait()
+                event = self.queue.popleft() if self.queue else None
+                self.busy, self.poll = True, False
+            try:
+                if event is None:
+                    self._connected()  # Updates the interest
+                else:
+                    self._send(event)
+            except Exception as e:  # Never let one event stop the thread
+                logger.warning(f"Dropped a middleware event: {e!r}")
+                with self.cond:
+                    self.dropped += 1
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    def _send(self, event: object) -> None:
+        for _ in range(2):  # Once more on a fresh connection
+            if not self._connected() and not self._connect():
+                with self.cond:  # No broker, drop the backlog too
+                    self.dropped += len(self.queue) + 1
+                    self.queue.clear()
+                return
+            if not events.wants(self.interest, event):
+                self.skipped += 1  # No subscriber for it
+                return
+            event = events.project(event, self.interest)
+            try:
+                self.sock.sendall(self.encoder.encode(event))
+                return
+            except OSError:
+                self._close()
+
+    def _connected(self) -> bool:
+        """If the reused connection is still open. Reads the INTEREST
+        frames the broker sent meanwhile (the only frames it sends)."""
+        if self.sock is None:
+            return False
+        self.sock.setblocking(False)
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    raise ConnectionError("Broker closed the connection")
+                self._read_interest(data)
+        except BlockingIOError:
+            pass  # Nothing (more) to read
+        except (OSError, ValueError):
+            self._close()
+            return False
+        self.sock.settimeout(SEND_TIMEOUT)
+        return True
+
+    def _connect(self) -> bool:
+        try:
+            self.sock = socket.create_connection(self.address, SEND_TIMEOUT)
+            # The broker answers a connect with the current interest
+            self.replies = events.EventDecoder()
+            while self.replies.interest is None:
+                data = self.sock.recv(65536)
+                if not data:
+                    raise ConnectionError("Broker closed the connection")
+                self._read_interest(data)
+        except (OSError, ValueError):
+            self._close()
+            self.backoff = min(max(self.backoff * 2, 0.05), self.max_backoff)
+            self.retry_at = time.monotonic() + self.backoff
+            return False
+        self.backoff = self.retry_at = 0.0
+        self.encoder.reset()  # The broker knows nothing of this connection
+        return True
+
+    def _read_interest(self, data: bytes) -> None:
+        self.replies.feed(data)
+        if self.replies.interest is not None:
+            self.interest = self.replies.interest
+
+    def _close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+_publishers: Dict[Tuple[str, int], EventPublisher] = {}
+_lock = threading.Lock()
+
+
+def get_publisher(host: str, port: int) -> EventPublisher:
+    """The process wide publisher of the broker at host:port."""
+    with _lock:
+        if (host, port) not in _publishers:
+            _publishers[(host, port)] = EventPublisher((host, port))
+        return _publishers[(host, port)]
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Rofi script mode backend (python -m i3grid rofi). Rofi runs the script
+# without an entry to list the menu, then again with the chosen entry:
+#   rofi -show grid -modi "grid:python -m i3grid rofi --preset big"
+# The menus of every configured grid (defaultGrid, gridPresets and
+# outputGrids) are rendered once per rc change into a cache file, so
+# opening the menu neither imports the grid module (i3) nor reads the
+# rc file. The chosen entry is run by the daemon when one is listening,
+# in this process otherwise.
+
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+try:
+    from . import config as rcfile
+    from .client import send
+except ImportError:
+    # cli
+    import config as rcfile
+    from client import send
+
+# Bump when the cache layout or the menu rendering changes
+CACHE_VERSION = 1
+# The rc file name (BASE_CONFIG rc_file_name)
+RC_NAME = "i3gridrc"
+# Flags (with one value) that choose the grid of the menu
+GRID_FLAGS = ("--preset", "--output", "--rows", "--cols")
+# Shortcut rows after the grid cells: (help shown as rofi meta, argv)
+SHORTCUTS = {
+    "A": ("Snap every window of the workspace", ["snap", "--all"]),
+    "C": ("Center the window at a custom percentage of the screen", None),
+    "D": ("Snap to a target of the rc file grid", None),
+    "F": ("Full screen (ignores every offset)", ["csize", "--perc", "100"]),
+    "G": (
+        "Guake style window",
+        ["snap", "--target", "1", "--rows", "2", "--cols", "1"]
+        + ["--offset", "0", "80", "0", "80"],
+    ),
+    "H": (
+        "Hide every floating window of the workspace (scratchpad)",
+        ["hide", "--noresize", "--nofloat", "--all"],
+    ),
+    "R": ("Reset to the i3 default center (75% of the screen)", ["reset"]),
+    "SF": (
+        "Snap every floating window into a grid",
+        ["snap", "--floating", "--rows", "3", "--cols", "2"],
+    ),
+    "X": ("Snap to a custom grid: columns, rows and target", None),
+}
+# Shortcuts that ask for values first: (prompt, suggestions, argv). The
+# values fill the {n} placeholders of the argv
+PROMPTS = {
+    "C": ("% -", ["25", "50", "75", "100"], ["csize", "--perc", "{0}"]),
+    "D": ("Target:", [], ["snap", "--target", "{0}"]),
+    "X": (
+        "c r t:",
+        [],
+        ["snap", "--cols", "{0}", "--rows", "{1}", "--target", "{2}"],
+    ),
+}
+
+
+def option(name: str, value: str) -> str:
+    """A rofi script mode option row (prompt, message, data...)."""
+    return f"\0{name}\x1f{value}\n"
+
+
+def render(rows: int, cols: int) -> str:
+    """The menu of a rows x cols grid. Rofi fills the listview columns
+    top to bottom, so the cells are listed column by column to show up
+    at their place in the grid. The shortcuts follow the cells."""
+    cells = [r * cols + c + 1 for c in range(cols) for r in range(rows)]
+    menu = [option("prompt", "Grid:")]
+    menu += [f"{n}\n" for n in cells]
+    menu += [f"{k}\0meta\x1f{h}\n" for k, (h, _) in SHORTCUTS.items()]
+    return "".join(menu)
+
+
+def _grid(grid: dict) -> List[int]:
+    return [grid["rows"], grid["columns"]]
+
+
+def build_menus() -> Dict[str, dict]:
+    """{"grids": {name: [rows, cols]}, "menus": {name: menu}} of every
+    grid of the rc file. Named "" (defaultGrid), "preset:<name>" and
+    "output:<name>"."""
+    try:
+        from .grid import Utils
+    except ImportError:
+        # cli
+        from grid import Utils
+
+    config = Utils.read_config()
+    grids = {"": _grid(config["defaultGrid"])}
+    for kind, key in (("preset", "gridPresets"), ("output", "outputGrids")):
+        for name, grid in config[key].items():
+            grids[f"{kind}:{name}"] = _grid(grid)
+    return {
+        "grids": grids,
+        "menus": {name: render(*grid) for name, grid in grids.items()},
+    }
+
+
+def cached_menus(cache_file: str = None) -> Dict[str, dict]:
+    """build_menus, served from the cache file while the rc file (path,
+    mtime, size) is unchanged."""
+    cache_file = cache_file or rcfile.cache_path("rofi.json")
+    rc = rcfile.find(RC_NAME)
+    key = [CACHE_VERSION]
+    if rc:
+        st = os.stat(rc)
+        key += [rc, st.st_mtime_ns, st.st_size]
+    try:
+        with open(cache_file, "r") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        pass  # Missing or stale format, rebuild
+
+    cached = dict(build_menus(), key=key)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cached, f)
+        os.replace(tmp, cache_file)
+    except OSError:
+        pass  # Rebuilt on the next open
+    return cached
+
+
+def parse(argv: List[str]) -> Tuple[Dict[str, str], str]:
+    """The grid flags and the chosen entry (rofi appends it to the
+    command, after the flags). The entry is "" when listing the menu."""
+    flags, i = {}, 0
+    while i < len(argv) and argv[i] in GRID_FLAGS:
+        if i + 1 == len(argv):
+            raise ValueError(f"Missing value of {argv[i]}")
+        flags[argv[i]] = argv[i + 1]
+        i += 2
+    return flags, " ".join(argv[i:]).strip()
+
+
+def _count(axis: str) -> int:
+    """Rows or columns of a --rows/--cols value (a count or weights)."""
+    return len(axis.split(":")) if ":" in axis else int(axis)
+
+
+def menu(flags: Dict[str, str], cache_file: str = None) -> str:
+    """The menu of the grid chosen by the flags."""
+    rows, cols = flags.get("--rows"), flags.get("--cols")
+    if rows and cols:  # Nothing to look up
+        return render(_count(rows), _count(cols))
+    cached = cached_menus(cache_file)
+    name = ""
+    if "--preset" in flags:
+        name = f"preset:{flags['--preset']}"
+        if name not in cached["grids"]:
+            raise ValueError(f"Unknown grid preset: {flags['--preset']}")
+    elif f"output:{flags.get('--output')}" in cached["grids"]:
+        name = f"output:{flags['--output']}"  # Others use the default grid
+    if rows or cols:
+        default_rows, default_cols = cached["grids"][name]
+        rows = _count(rows) if rows else default_rows
+        return render(rows, _count(cols) if cols else default_cols)
+    return cached["menus"][name]
+
+
+def prompt(key: str, message: str = None) -> str:
+    """The value menu of a prompt shortcut. Rofi hands the key back in
+    ROFI_DATA with the chosen value."""
+    text, suggestions, _ = PROMPTS[key]
+    rows = [option("prompt", text), option("data", key)]
+    if message:
+        rows.append(option("message", message))
+    return "".join(rows + [f"{s}\n" for s in suggestions])
+
+
+def command(entry: str, flags: Dict[str, str], data: str = "") -> List[str]:
+    """The i3grid argv of a chosen entry (data: the pending prompt).
+    Raises ValueError for entries that are not in the menu."""
+    grid = [v for flag in flags.items() for v in flag]
+    if data:
+        argv = PROMPTS[data][2]
+        values = entry.split()
+        needed = sum("{" in a for a in argv)
+        if len(values) != needed or not all(v.isdigit() for v in values):
+            raise ValueError(f"Expected {needed} number(s)")
+        return [a.format(*values) for a in argv]
+    if entry in PROMPTS:
+        raise ValueError(f"{entry} needs its values first")
+    if entry in SHORTCUTS:
+        return SHORTCUTS[entry][1]
+    cells = entry.split()
+    if not cells or not all(c.isdigit() for c in cells):
+        raise ValueError(f"Not in the grid: {entry}")
+    if len(cells) == 1:
+        return ["snap", "--target", cells[0]] + grid
+    return ["multi", "--multis"] + cells + grid  # Typed span, Ex: 1 4
+
+
+def run(argv: List[str]) -> int:
+    """Runs the argv with the daemon, or in this process without one."""
+    try:
+        response = send(argv)
+    except (OSError, ValueError):
+        response = None  # No (healthy) daemon
+    if response is not None:
+        if response["status"] != "ok":
+            print(f"i3grid: {response['message']}", file=sys.stderr)
+            return 1
+        return 0
+
+    try:
+        from .doc import Documentation
+        from .grid import FloatManager
+    except ImportError:
+        # cli
+        from doc import Documentation
+        from grid import FloatManager
+
+    commands = list(Documentation.actions)
+    parser = Documentation().build_parser(choices=commands)
+    args = parser.parse_args(Documentation.expand_names(argv)).__dict__
+    manager = FloatManager(commands=commands, **args)
+    if not manager._TERMSIG:  # --all and --floating already ran
+        for action in args["actions"]:
+            manager.run(cmd=action)
+    return 0
+
+
+def main(argv: List[str] = None, env: Dict[str, str] = None) -> int:
+    """One rofi script mode call. Prints the rows for rofi (nothing
+    closes the menu) and returns the exit status."""
+    argv = sys.argv[1:] if argv is None else argv
+    env = os.environ if env is None else env
+    try:
+        flags, entry = parse(argv)
+        # 0: initial call, 1: chosen row, 2: custom input (10+ keybindings)
+        if env.get("ROFI_RETV", "0") not in ("1", "2") or not entry:
+            sys.stdout.write(menu(flags))
+            return 0
+        data = env.get("ROFI_DATA", "")
+        if data not in PROMPTS:
+            data = ""
+        if not data and entry in PROMPTS:
+            sys.stdout.write(prompt(entry))
+            return 0
+        try:
+            argv = command(entry, flags, data)
+        except ValueError as e:  # Asked again, with the reason
+            if data:
+                sys.stdout.write(prompt(data, str(e)))
+            else:
+                sys.stdout.write(option("message", e) + menu(flags))
+            return 0
+    except ValueError as e:
+        print(f"i3grid: {e}", file=sys.stderr)
+        return 1
+    return run(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import socket
+import threading
+import time
+from typing import List
+
+try:
+    from . import ipc
+    from .tree import CHILD_KEYS, TreeIndex
+except ImportError:
+    # cli
+    import ipc
+    from tree import CHILD_KEYS, TreeIndex
+
+logger = logging.getLogger(__name__)
+
+
+class StateCache:
+    """In memory model of the i3 tree, outputs and workspaces for long
+    lived managers (daemon). The tree is fetched once and then kept up to
+    date by applying the i3 window, workspace and output events in a
+    background thread. Events that restructure the tree (moves, new
+    workspaces, output changes) only mark the affected part as stale, it
+    is then re-fetched lazily on the next read.
+
+    i3 does not emit events for geometry changes (mouse drags, resizes),
+    hence node rects are best effort; call `invalidate` when an exact
+    window size is required.
+
+    When i3 restarts (or reloads its socket), the event connection is
+    reopened with backoff and the model re-fetched; reads reconnect once."""
+
+    subscriptions = ["window", "workspace", "output"]
+    # Seconds between resubscribe attempts, doubled up to the maximum
+    backoff = (0.05, 5.0)
+
+    def __init__(self, path: str = None) -> None:
+        super().__init__()
+        self.path = path or ipc.socket_path()
+        self.lock = threading.RLock()
+        self.conn = ipc.Connection(self.path)
+        self._tree = self._outputs = self._workspaces = None
+        self.index = TreeIndex()
+        self.focused_id = None
+        self.closed = False
+        # Subscribe before the first fetch so no event is missed
+        self.events = ipc.Connection(self.path)
+        self.events.subscribe(self.subscriptions)
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    # Readers (fetch lazily when stale)
+
+    def tree(self) -> dict:
+        with self.lock:
+            if self._tree is None:
+                self._index(self._get(ipc.GET_TREE))
+            return self._tree
+
+    def outputs(self) -> List[dict]:
+        with self.lock:
+            if self._outputs is None:
+                self._outputs = self._get(ipc.GET_OUTPUTS)
+            return self._outputs
+
+    def workspaces(self) -> List[dict]:
+        with self.lock:
+            if self._workspaces is None:
+                self._workspaces = self._get(ipc.GET_WORKSPACES)
+            return self._workspaces
+
+    def focused_node(self) -> dict:
+        with self.lock:
+            self.tree()
+            return self.index.nodes.get(self.focused_id)
+
+    def workspace_windows(self, name: str) -> List[tuple]:
+        """(name, id, floating) of every named node in the workspace,
+        the same shape FloatUtils.assign_focus_node collects."""
+        with self.lock:
+            self.tree()
+            return list(self.index.windows(name))
+
+    def invalidate(self) -> None:
+        """Drops the whole model, the next read re-fetches from i3."""
+        with self.lock:
+            self._tree = self._outputs = self._workspaces = None
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            # Wakes the listener blocked on the next event
+            self.events.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.events.close()
+        self.conn.close()
+
+    # Connections
+
+    def _get(self, msg_type: int):
+        """Request on the query connection, reopened once if i3 dropped it
+        (restart)."""
+        try:
+            return self.conn.get(msg_type)
+        except OSError:
+            self.conn.close()
+            self.conn = ipc.Connection(self.path)
+            return self.conn.get(msg_type)
+
+    def _resubscribe(self) -> bool:
+        """Reopens the event connection until i3 accepts it again. The
+        model is dropped afterwards, events in between were missed."""
+        delay, limit = self.backoff
+        while not self.closed:
+            time.sleep(delay)
+            try:
+                events = ipc.Connection(self.path)
+            except OSError:
+                delay = min(delay * 2, limit)
+                continue
+            try:
+                events.subscribe(self.subscriptions)
+            except (OSError, ValueError):
+                events.close()
+                delay = min(delay * 2, limit)
+                continue
+            self.events.close()
+            self.events = events
+            self.invalidate()
+            return True
+        return False
+
+    # Model maintenance
+
+    def _index(self, tree: dict) -> None:
+        self._tree = tree
+        self.index = TreeIndex(tree)
+        focused = self.index.focused()
+        self.focused_id = focused and focused["id"]
+
+    def _set_focus(self, con_id: int) -> None:
+        nodes = self.index.nodes
+        previous = nodes.get(self.focused_id)
+        if previous is not None:
+            previous["focused"] = False
+        self.focused_id = con_id
+        if con_id in nodes:
+            nodes[con_id]["focused"] = True
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                event, data = self.events.next_event()
+            except (OSError, ValueError) as e:
+                if self.closed:
+                    return
+                logger.warning(f"i3 event subscription closed: {e}")
+                self.invalidate()
+                if not self._resubscribe():
+                    return
+                continue
+            with self.lock:
+                if self._tree is None:
+                    # Nothing to patch, the next read fetches anyway
+                    self._outputs = self._workspaces = None
+                    continue
+                getattr(self, f"_on_{event}", lambda _: None)(data)
+
+    def _on_window(self, data: dict) -> None:
+        change, container = data["change"], data["container"]
+        con_id = container["id"]
+        node = self.index.nodes.get(con_id)
+        if change == "close":
+            if node is not None:
+                parent = self.index.parents.get(con_id)
+                self.index.drop(node)
+                for key in CHILD_KEYS:
+                    if parent is not None and node in parent.get(key, []):
+                        parent[key].remove(node)
+            return
+        if change == "move" or (node is None and change != "new"):
+            # The destination is not part of the event
+            self._tree = None
+            return
+        if change == "new":
+            workspace = [w for w in self.workspaces() if w["focused"]]
+            parent = workspace and self.index.workspaces.get(workspace[0]["name"])
+            if not parent:
+                self._tree = None
+                return
+            floating = container.get("floating") in ("user_on", "auto_on")
+            parent[CHILD_KEYS[floating]].append(container)
+            self.index.add(container, parent)
+            node = container
+        else:
+            node.update({k: v for k, v in container.items() if k not in CHILD_KEYS})
+            # Re-indexed for the window list of its workspace (floating)
+            self.index.add(node, self.index.parents.get(con_id))
+        if change == "focus" or node.get("focused"):
+            self._set_focus(con_id)
+
+    def _on_workspace(self, data: dict) -> None:
+        self._workspaces = None
+        current = data.get("current")
+        if data["change"] != "focus" or not current:
+            # init, empty, rename, move, reload, ...: structural change
+            self._tree = None
+            return
+        node = self.index.nodes.get(current["id"])
+        parent = self.index.parents.get(current["id"])
+        if node is None or parent is None:
+            self._tree = None
+            return
+        # The event carries the whole focused workspace, swap it in
+        self.index.drop(node)
+        parent["nodes"][parent["nodes"].index(node)] = current
+        self.index.add(current, parent)
+        focused = self.index.focus_chain(current)[-1]
+        if focused.get("focused"):
+            self.focused_id = focused["id"]
+        if self.focused_id not in self.index.nodes:
+            self._set_focus(current["id"])
+
+    def _on_output(self, data: dict) -> None:
+        self._tree = self._outputs = self._workspaces = None
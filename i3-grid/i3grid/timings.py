@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Per phase timing and optional profiling of the FloatManager actions.
+# Phases nest (an action dispatch calls the xrandr calculator, which may
+# parse xrandr); each phase only counts its own (exclusive) time, so the
+# phases of a run add up to its total.
+
+import functools
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+# Profile files with these extensions are written as collapsed stacks
+# (flamegraph.pl, speedscope), anything else as cProfile stats (pstats)
+COLLAPSED_EXTENSIONS = (".folded", ".collapsed")
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "PhaseTimer", name: str) -> None:
+        self.timer, self.name = timer, name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+        self.timer._nested.append(0.0)
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+        nested = self.timer._nested.pop()
+        phases = self.timer.phases
+        phases[self.name] = phases.get(self.name, 0.0) + elapsed - nested
+        if self.timer._nested:
+            self.timer._nested[-1] += elapsed
+
+
+class PhaseTimer:
+    """Accumulates the exclusive wall time (seconds) of named phases."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.phases = {}
+        self._nested = []  # Time spent in the inner phases, per level
+
+    def phase(self, name: str) -> _Phase:
+        return _Phase(self, name)
+
+    def reset(self) -> None:
+        self.phases = {}
+
+    def snapshot(self) -> Dict[str, float]:
+        """Milliseconds per phase and their total."""
+        ms = {k: round(v * 1e3, 3) for k, v in self.phases.items()}
+        ms["total"] = round(sum(self.phases.values()) * 1e3, 3)
+        return ms
+
+    @staticmethod
+    def format(timings: Dict[str, float], label: str = "") -> str:
+        phases = " ".join(f"{k}={v:.3f}ms" for k, v in timings.items() if k != "total")
+        return f"{label}{timings['total']:.3f}ms ({phases})"
+
+
+def timed(phase: str) -> Callable:
+    """Records the method calls as `phase` in the instance timer."""
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.timer.phase(phase):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profile_path(template: str, action: str) -> str:
+    """The profile file of an action. '{action}' and '{pid}' in the
+    template are replaced, so every invocation can keep its own file."""
+    return os.path.expanduser(template.replace("{action}", action)).replace(
+        "{pid}", str(os.getpid())
+    )
+
+
+def profiled(path: str, func: Callable, *args, **kwargs) -> object:
+    """Calls func under a profiler and writes the profile to path."""
+    if path.endswith(COLLAPSED_EXTENSIONS):
+        return _collapsed(path, func, *args, **kwargs)
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
+
+
+def _collapsed(path: str, func: Callable, *args, **kwargs) -> object:
+    """Deterministic stack profile ('frame;frame;frame microseconds' per
+    line, self time) of the calling thread."""
+    stacks, frames = {}, []  # frames: [name, start, time in callees]
+
+    def hook(frame, event, arg):
+        now = time.perf_counter()
+        if event == "call" or event == "c_call":
+            if event == "call":
+                code = frame.f_code
+                name = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            else:
+                name = getattr(arg, "__qualname__", str(arg))
+            frames.append([name, now, 0.0])
+        elif frames:  # return, c_return, c_exception
+            name, start, callees = frames.pop()
+            elapsed = now - start
+            key = ";".join([f[0] for f in frames] + [name])
+            stacks[key] = stacks.get(key, 0.0) + elapsed - callees
+            if frames:
+                frames[-1][2] += elapsed
+
+    sys.setprofile(hook)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sys.setprofile(None)
+        with open(path, "w") as f:
+            for stack, seconds in stacks.items():
+                f.write(f"{stack} {max(int(seconds * 1e6), 1)}\n")
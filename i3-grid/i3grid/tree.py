@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# License: GPL-3.0
+# Copyright (C) 2020 Sai Valla
+# URL: https://github.com/justahuman1
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+# Indexed model of an i3 tree. One iterative pass maps every con_id to
+# its node and parent and records the windows of every workspace, so
+# lookups never walk (or recurse through) the whole tree. The focused
+# con is found by following the `focus` arrays from the root (the first
+# id of each array is the focused child), which is O(depth).
+
+from typing import Dict, List, Optional
+
+# Node keys that hold children
+CHILD_KEYS = ("nodes", "floating_nodes")
+
+
+class TreeIndex:
+    """con_id -> node, con_id -> parent and workspace name -> windows of
+    an i3 tree (the GET_TREE reply). Nodes are the tree dicts themselves,
+    not copies; `add` and `drop` keep the index in sync when a subtree is
+    patched in or out of place (state.StateCache)."""
+
+    def __init__(self, tree: Optional[dict] = None) -> None:
+        super().__init__()
+        self.root = tree
+        self.nodes: Dict[int, dict] = {}
+        self.parents: Dict[int, Optional[dict]] = {}
+        self.workspaces: Dict[str, dict] = {}
+        self._windows: Dict[str, List[tuple]] = {}
+        if tree is not None:
+            self.add(tree, None)
+
+    def add(self, root: dict, parent: Optional[dict]) -> None:
+        """Indexes the subtree root (a child of parent)."""
+        enclosing = self.workspace_of(parent) if parent is not None else None
+        if enclosing is not None:
+            self._windows.pop(enclosing["name"], None)  # Rebuilt on read
+        # Pre order, (node, parent, window list of its workspace)
+        stack = [(root, parent, None)]
+        while stack:
+            node, parent, windows = stack.pop()
+            con_id = node["id"]
+            self.nodes[con_id] = node
+            self.parents[con_id] = parent
+            if node.get("type") == "workspace":
+                self.workspaces[node["name"]] = node
+                windows = self._windows[node["name"]] = []
+            elif windows is not None and node.get("name"):
+                windows.append((node["name"], con_id, node.get("floating")))
+            for key in reversed(CHILD_KEYS):
+                stack.extend((c, node, windows) for c in reversed(node.get(key, [])))
+
+    def drop(self, root: dict) -> None:
+        """Removes the subtree root from the index."""
+        enclosing = self.workspace_of(root)
+        if enclosing is not None:
+            self._windows.pop(enclosing["name"], None)
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.nodes.pop(node["id"], None)
+            self.parents.pop(node["id"], None)
+            if self.workspaces.get(node.get("name")) is node:
+                del self.workspaces[node["name"]]
+            for key in CHILD_KEYS:
+                stack.extend(node.get(key, []))
+
+    def workspace_of(self, node: dict) -> Optional[dict]:
+        """The workspace holding node (itself if a workspace), O(depth)."""
+        while node is not None and node.get("type") != "workspace":
+            node = self.parents.get(node["id"])
+        return node
+
+    def windows(self, name: str) -> List[tuple]:
+        """(name, id, floating) of every named node in the workspace, in
+        tree order (the workspace itself excluded)."""
+        if name not in self._windows:
+            workspace = self.workspaces.get(name)
+            if workspace is None:
+                return []
+            self.add(workspace, self.parents.get(workspace["id"]))
+        return self._windows[name]
+
+    def focus_chain(self, start: Optional[dict] = None) -> List[dict]:
+        """The nodes from start (default: the root) down to its focused
+        descendant."""
+        chain, node = [], self.root if start is None else start
+        while node is not None:
+            chain.append(node)
+            focus = node.get("focus")
+            node = self.nodes.get(focus[0]) if focus else None
+        return chain
+
+    def focused(self, start: Optional[dict] = None) -> Optional[dict]:
+        """The focused con (a window, or an empty workspace)."""
+        if start is None and self.root is None:
+            return None
+        node = self.focus_chain(start)[-1]
+        if node.get("focused"):
+            return node
+        # Focus arrays out of date (patched nodes), scan the flags
+        return next((n for n in self.nodes.values() if n.get("focused")), None)
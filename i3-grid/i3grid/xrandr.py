@@ -20,9 +20,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
 import os
+import re
+import shutil
 import subprocess
-from functools import reduce
+import threading
 from math import pi
 
 
@@ -136,20 +139,49 @@ class Feature:
     PRIMARY = 1
 
 
+# Single pass parser patterns. Work for both the default (--query)
+# output and --verbose (its property and EDID blocks are skipped).
+SCREEN_RE = re.compile(
+    r"Screen \d+: minimum (\d+) x (\d+), current (\d+) x (\d+),"
+    r" maximum (\d+) x (\d+)"
+)
+OUTPUT_RE = re.compile(
+    r"(?P<name>\S+) (?P<status>connected|disconnected|unknown connection)"
+    r"(?P<primary> primary)?"
+    r"(?: (?P<geometry>\d+x\d+\+-?\d+\+-?\d+))?"
+    r"(?: \(0x[0-9a-f]+\))?"  # current mode id (verbose)
+    r"(?: (?P<rotation>normal|left|inverted|right))?"
+    r"(?: (?:X axis|Y axis|X and Y axis))?"
+    r"(?: \((?P<rotations>[^)]*)\))?"
+)
+MODE_RE = re.compile(r"\s+(?P<name>\S+)(?P<rest>.*)")
+SIZE_RE = re.compile(r"(\d+)x(\d+)")
+TIMING_RE = re.compile(r"\s+(?P<axis>[hv]): +(?:width|height) +(?P<size>\d+)")
+
+# Configurations kept in the cache file (one per monitor layout)
+CACHE_CONFIGURATIONS = 8
+
+
 class XRandR:
     DEFAULTTEMPLATE = ["#!/bin/sh", "%(xrandr)s"]
 
     configuration = None
     state = None
 
-    def __init__(self, display=None, force_version=False):
+    def __init__(
+        self, display=None, force_version=False, cache_file=None, version=None
+    ):
         """Create proxy object and check for xrandr at `display`. Fail with
-        untested versions unless `force_version` is True."""
+        untested versions unless `force_version` is True. The version probe
+        and loaded configurations are persisted to `cache_file` (json),
+        if given. `version` skips the probe (xrandr --version output)."""
         self.environ = dict(os.environ)
         if display:
             self.environ["DISPLAY"] = display
+        self.cache_file = cache_file
+        self._cache = self._read_cache()
 
-        version_output = self._output("--version")
+        version_output = version or self._probe_version()
         supported_versions = ["1.2", "1.3", "1.4", "1.5"]
         if (not any(x in version_output for x in supported_versions) and
            not force_version):
@@ -165,6 +197,46 @@ class XRandR:
 
     outputs = property(_get_outputs)
 
+    #################### probe cache ####################
+
+    def _read_cache(self):
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self):
+        if not self.cache_file:
+            return
+        tmp = "%s.%d.%d" % (self.cache_file, os.getpid(), threading.get_ident())
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._cache, f)
+            os.replace(tmp, self.cache_file)  # atomic for concurrent runs
+        except OSError:
+            pass
+
+    def _probe_version(self):
+        """xrandr --version, cached per binary (path, mtime, size) and
+        display, as it only changes when xrandr is upgraded."""
+        binary = shutil.which("xrandr", path=self.environ.get("PATH"))
+        key = None
+        if binary:
+            st = os.stat(binary)
+            key = [binary, st.st_mtime_ns, st.st_size, self.environ.get("DISPLAY")]
+        cached = self._cache.get("version", {})
+        if key and cached.get("key") == key:
+            return cached["output"]
+        version_output = self._output("--version")
+        if key:
+            self._cache["version"] = {"key": key, "output": version_output}
+            self._write_cache()
+        return version_output
+
     #################### calling xrandr ####################
 
     def _output(self, *args):
@@ -181,114 +253,144 @@ class XRandR:
     def _run(self, *args):
         self._output(*args)
 
-    def load_from_x(self):  # FIXME -- use a library
+    def load_from_x(self, fingerprint=None):  # FIXME -- use a library
+        """Loads the current configuration. `fingerprint` is a cheap key
+        of the monitor layout (e.g. the i3 output rects), configurations
+        are served from the cache file while it matches."""
+        cached = self._cache.get("configurations", {})
+        if fingerprint and fingerprint in cached:
+            return self._restore(cached[fingerprint])
+        # The default query omits the EDID and property blocks of --verbose
+        self.parse(self._output("--query"))
+        if fingerprint:
+            cached.pop(fingerprint, None)
+            cached[fingerprint] = self._serialize()
+            for old in list(cached)[:-CACHE_CONFIGURATIONS]:
+                del cached[old]
+            self._cache["configurations"] = cached
+            self._write_cache()
+
+    def parse(self, output):
+        """Parses xrandr (--query or --verbose) output in a single pass."""
         self.configuration = self.Configuration(self)
         self.state = self.State()
-
-        screenline, items = self._load_raw_lines()
-
-        self._load_parse_screenline(screenline)
-
-        for headline, details in items:
-            if headline.startswith("  ") or headline == "":
-                continue  # a currently disconnected part of the screen i can't currently get any info out of
-
-            headline = headline.replace("unknown connection", "unknown-connection")
-            hsplit = headline.split(" ")
-            output = self.state.Output(hsplit[0])
-            assert hsplit[1] in ("connected", "disconnected", "unknown-connection")
-
-            output.connected = hsplit[1] in ("connected", "unknown-connection")
-
-            primary = False
-            if "primary" in hsplit:
-                if Feature.PRIMARY in self.features:
-                    primary = True
-                hsplit.remove("primary")
-
-            if not hsplit[2].startswith("("):
-                active = True
-                geometry = Geometry(hsplit[2])
-
-                if hsplit[4] in ROTATIONS:
-                    current_rotation = Rotation(hsplit[4])
-                else:
-                    current_rotation = NORMAL
-            else:
-                active = False
-                geometry = None
-                current_rotation = None
-
-            output.rotations = set()
-            for rotation in ROTATIONS:
-                if rotation in headline:
-                    output.rotations.add(rotation)
-
-            currentname = None
-            for detail, w, h in details:
-                name, _mode_raw = detail[0:2]
-                mode_id = _mode_raw.strip("()")
-                try:
-                    size = Size([int(w), int(h)])
-                except ValueError:
-                    raise Exception(
-                        "Output %s parse error: modename %s modeid %s."
-                        % (output.name, name, mode_id))
-                if "*current" in detail:
-                    currentname = name
-                for x in ["+preferred", "*current"]:
-                    if x in detail:
-                        detail.remove(x)
-
-                for old_mode in output.modes:
-                    if old_mode.name == name:
-                        if tuple(old_mode) != tuple(size):
-                            pass
-                        break
-                else:
-                    output.modes.append(NamedSize(size, name=name))
-
-            self.state.outputs[output.name] = output
-            self.configuration.outputs[
-                output.name
-            ] = self.configuration.OutputConfiguration(
-                active, primary, geometry, current_rotation, currentname)
-
-    def _load_raw_lines(self):
-        output = self._output("--verbose")
-        items = []
-        screenline = None
+        screen = None
+        output_state = modes = None
         for line in output.split("\n"):
+            if not line or line[0] == "\t":
+                continue  # verbose property and EDID blocks
+            if line[0] == " ":
+                if output_state is None:
+                    continue
+                timing = TIMING_RE.match(line)
+                if timing:  # verbose mode size: h: width / v: height
+                    idx = 1 if timing.group("axis") == "h" else 2
+                    modes[-1][idx] = int(timing.group("size"))
+                    continue
+                mode = MODE_RE.match(line)
+                if mode:
+                    size = SIZE_RE.match(mode.group("name"))
+                    modes.append(
+                        [
+                            mode.group("name"),
+                            int(size.group(1)) if size else 0,
+                            int(size.group(2)) if size else 0,
+                            "*" in mode.group("rest"),
+                        ]
+                    )
+                continue
             if line.startswith("Screen "):
-                assert screenline is None
-                screenline = line
-            elif line.startswith("\t"):
+                assert screen is None
+                screen = SCREEN_RE.match(line)
                 continue
-            elif line.startswith(2 * " "):  # [mode, width, height]
-                line = line.strip()
-                if reduce(bool.__or__, [line.startswith(x + ":") for x in "hv"]):
-                    line = line[-len(line) : line.index(" start") - len(line)]
-                    items[-1][1][-1].append(line[line.rindex(" ") :])
-                else:  # mode
-                    items[-1][1].append([line.split()])
-            else:
-                items.append([line, []])
-        return screenline, items
-
-    def _load_parse_screenline(self, screenline):
-        assert screenline is not None
-        ssplit = screenline.split(" ")
-
-        ssplit_expect = [
-            "Screen", None, "minimum", None,
-            "x", None, "current", None, "x",
-            None, "maximum", None, "x", None]
-        assert all(a == b for (a, b) in zip(ssplit, ssplit_expect) if b is not None)
+            if output_state is not None:
+                self._add_output(output_state, modes)
+            headline = OUTPUT_RE.match(line)
+            if headline is None:
+                # a currently disconnected part of the screen
+                output_state = modes = None
+                continue
+            output_state, modes = headline, []
+        if output_state is not None:
+            self._add_output(output_state, modes)
 
+        assert screen is not None
+        s = [int(x) for x in screen.groups()]
         self.state.virtual = self.state.Virtual(
-            min_mode=Size((int(ssplit[3]), int(ssplit[5][:-1]))),
-            max_mode=Size((int(ssplit[11]), int(ssplit[13]))),)
-        self.configuration.virtual = Size((int(ssplit[7]), int(ssplit[9][:-1])))
+            min_mode=Size((s[0], s[1])),
+            max_mode=Size((s[4], s[5])),
+        )
+        self.configuration.virtual = Size((s[2], s[3]))
+
+    def _add_output(self, headline, modes):
+        output = self.state.Output(headline.group("name"))
+        output.connected = headline.group("status") != "disconnected"
+        primary = (
+            headline.group("primary") is not None and Feature.PRIMARY in self.features
+        )
+        active = headline.group("geometry") is not None
+        geometry = current_rotation = None
+        if active:
+            geometry = Geometry(headline.group("geometry"))
+            current_rotation = Rotation(headline.group("rotation") or NORMAL)
+
+        rotations = headline.group("rotations") or ""
+        output.rotations = {r for r in ROTATIONS if r in rotations}
+
+        currentname = None
+        seen = set()
+        for name, w, h, current in modes:
+            if current:
+                currentname = name
+            if name not in seen:
+                seen.add(name)
+                output.modes.append(NamedSize(Size([w, h]), name=name))
+
+        self.state.outputs[output.name] = output
+        self.configuration.outputs[output.name] = (
+            self.configuration.OutputConfiguration(
+                active, primary, geometry, current_rotation, currentname
+            )
+        )
+
+    def _serialize(self):
+        outputs = {}
+        for name, conf in self.configuration.outputs.items():
+            outputs[name] = [
+                self.state.outputs[name].connected,
+                conf.active,
+                conf.primary,
+                str(Geometry(*conf.size, *conf.position)) if conf.active else None,
+                str(conf.rotation) if conf.active else None,
+                conf.mode.name if conf.active else None,
+            ]
+        return {
+            "virtual": list(self.configuration.virtual),
+            "limits": list(self.state.virtual.min) + list(self.state.virtual.max),
+            "outputs": outputs,
+        }
+
+    def _restore(self, data):
+        self.configuration = self.Configuration(self)
+        self.state = self.State()
+        limits = data["limits"]
+        self.state.virtual = self.state.Virtual(
+            min_mode=Size(limits[:2]), max_mode=Size(limits[2:])
+        )
+        self.configuration.virtual = Size(data["virtual"])
+        for name, out in data["outputs"].items():
+            connected, active, primary, geometry, rotation, modename = out
+            output = self.state.Output(name)
+            output.connected = connected
+            output.rotations = set()
+            self.state.outputs[name] = output
+            self.configuration.outputs[name] = self.configuration.OutputConfiguration(
+                active,
+                primary,
+                Geometry(geometry) if active else None,
+                Rotation(rotation) if active else None,
+                modename,
+            )
 
     class State:
         """Represents everything that can not be set by xrandr."""
@@ -17,10 +17,11 @@ setuptools.setup(
     url="https://github.com/justahuman1/i3-grid",
     packages=setuptools.find_packages(),
     install_requires=["i3-py"],
+    extras_require={"fast": ["numpy"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
         "Operating System :: POSIX :: Linux",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 )
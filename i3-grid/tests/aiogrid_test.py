@@ -0,0 +1,122 @@
+import asyncio
+import copy
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import Environment  # noqa: E402
+from i3grid import ipc  # noqa: E402
+from i3grid.aiogrid import AsyncFloatManager  # noqa: E402
+from i3grid.aioipc import AsyncConnection  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import BASE_CONFIG, FloatManager  # noqa: E402
+
+COMMANDS = list(Documentation.actions)
+
+
+class TestAsyncConnection(unittest.TestCase):
+    """Pipelined requests and events over one asyncio connection."""
+
+    def test_pipelined(self):
+        async def requests(env):
+            async with await AsyncConnection.connect() as conn:
+                queries = [ipc.GET_TREE, ipc.GET_OUTPUTS, ipc.GET_WORKSPACES] * 10
+                replies = await asyncio.gather(
+                    *(conn.get(t) for t in queries),
+                    *(conn.command(f"mark {i}") for i in range(10)),
+                )
+                self.assertTrue(await conn.subscribe(["window"]))
+                env.server.emit("window", {"change": "focus"})
+                return replies, await asyncio.wait_for(conn.next_event(), 5)
+
+        with Environment() as env:
+            replies, event = asyncio.run(requests(env))
+            for reply, kind in zip(replies, ["root", "xroot-0", "1"] * 10):
+                first = reply if isinstance(reply, dict) else reply[0]
+                self.assertEqual(first.get("type", first["name"]), kind)
+            self.assertEqual(replies[30:], [[{"success": True}]] * 10)
+            marks = [f"mark {i}" for i in range(10)]
+            self.assertEqual(sorted(env.server.commands), marks)
+            self.assertEqual(event, ("window", {"change": "focus"}))
+
+    def test_closed(self):
+        async def request():
+            conn = await AsyncConnection.connect()
+            await conn.close()
+            await asyncio.sleep(0)  # The reader task ends
+            with self.assertRaises(ConnectionError):
+                await conn.get(ipc.GET_TREE)
+
+        with Environment():
+            asyncio.run(request())
+
+
+class TestAsyncFloatManager(unittest.TestCase):
+    """The commands of FloatManager, one i3 message per action."""
+
+    def setUp(self):
+        self.defaults = copy.deepcopy(BASE_CONFIG)
+
+    def test_same_commands(self):
+        async def placements(env):
+            manager = await AsyncFloatManager.create(commands=COMMANDS, target=4)
+            del env.server.commands[:]
+            result = await manager.run("snap")
+            await manager.refresh()
+            rows = await manager.run("save-layout", name="async")
+            await manager.close()
+            return result, rows
+
+        with Environment(windows=0, floating=1) as env:
+            manager = FloatManager(commands=COMMANDS, target=4)
+            del env.server.commands[:]
+            manager.run("snap")
+            expected = "; ".join(env.server.commands)
+            del env.server.commands[:]
+            result, rows = asyncio.run(placements(env))
+            self.assertEqual(env.server.commands, [expected])
+            self.assertEqual(result, [{"success": True}] * 2)
+            self.assertEqual(len(rows), 1)
+
+    def test_create_error(self):
+        async def create(**kwargs):
+            with self.assertRaises(ValueError):
+                await AsyncFloatManager.create(commands=COMMANDS, **kwargs)
+            # The connection it opened was closed (no reader task left)
+            return asyncio.all_tasks() - {asyncio.current_task()}
+
+        with Environment():
+            self.assertEqual(asyncio.run(create(all=True)), set())  # No actions
+            self.assertEqual(asyncio.run(create(preset="none")), set())
+
+    def test_concurrent(self):
+        async def managers():
+            conn = await AsyncConnection.connect()
+            halves, quarters = await asyncio.gather(
+                AsyncFloatManager.create(conn, commands=COMMANDS, cols=2, rows=1),
+                AsyncFloatManager.create(conn, commands=COMMANDS, cols=4, rows=1),
+            )
+            del env.server.commands[:]
+            runs = []
+            for target in (1, 2):
+                for manager in (halves, quarters):
+                    config = manager.configure(target=target)
+                    runs.append(manager.run("snap", config=config))
+            await asyncio.gather(*runs)
+            await quarters.all_override(["snap"], floating=True)
+            await conn.close()
+
+        with Environment(windows=0, floating=2) as env:
+            asyncio.run(managers())
+            moves = [c.split("; ")[-1] for c in env.server.commands[:-1]]
+            self.assertEqual(
+                sorted(moves),
+                [f"move window position {x} 20" for x in (0, 0, 480, 960)],
+            )
+            self.assertEqual(env.server.commands[-1].count("move window"), 2)
+            self.assertEqual(BASE_CONFIG, self.defaults)
+
+
+if __name__ == "__main__":
+    unittest.main()
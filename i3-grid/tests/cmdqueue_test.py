@@ -0,0 +1,135 @@
+import copy
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import Environment  # noqa: E402
+from i3grid.client import send  # noqa: E402
+from i3grid.cmdqueue import CommandQueue  # noqa: E402
+from i3grid.daemon import GridDaemon  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import BASE_CONFIG, FloatManager  # noqa: E402
+
+
+def moves(server):
+    return [c for c in server.commands if c.startswith("move")]
+
+
+class TestCommandQueue(unittest.TestCase):
+    """Superseded placements of a window are dropped, the rest runs."""
+
+    def setUp(self):
+        self.defaults = copy.deepcopy(BASE_CONFIG)
+        self.env = Environment(windows=0, floating=2).__enter__()
+        manager = FloatManager(commands=list(Documentation.actions))
+        self.queue = CommandQueue(manager, debounce=0)
+        del self.env.server.commands[:]
+
+    def tearDown(self):
+        self.env.__exit__(None, None, None)
+
+    def test_coalesce(self):
+        queue = self.queue
+        for target in (1, 2, 3, 4):
+            last = queue.submit(["snap"], target=target)
+        queue.submit(["snap"], window=-1, target=1)  # Another window
+        self.assertEqual((queue.collapsed, len(queue.pending)), (3, 2))
+        ran = [r.flags for r in queue.flush()]
+        self.assertEqual(ran, [{"target": 4}, {"target": 1}])
+        self.assertEqual(
+            moves(self.env.server),
+            ["move window position 1440 20", "move window position 0 20"],
+        )
+        self.assertIsNotNone(last.result)
+
+    def test_barriers(self):
+        queue = self.queue
+        queue.submit(["snap"], target=1)
+        queue.submit(["float"])  # Not a placement
+        queue.submit(["csize"])
+        queue.submit(["snap"], target=2, noresize=True)  # Keeps the csize size
+        queue.submit(["snap", "float"], target=3)
+        self.assertEqual((queue.collapsed, len(queue.pending)), (0, 5))
+        queue.submit(["multi"], multis=["1", "2"])  # Moves and resizes
+        self.assertEqual(queue.collapsed, 0)
+        queue.submit(["csize"])  # Sets as much as the multi
+        self.assertEqual(queue.collapsed, 1)
+        queue.submit(["center"], all=True)
+        self.assertEqual(len(queue.flush()), 7)
+
+    def test_config(self):
+        queue = self.queue  # Other windows, nothing is dropped
+        queue.submit(["snap"], window=-1, rows=1, cols=1, target=1)
+        failed = queue.submit(["snap"], window=-2, preset="none")
+        queue.submit(["snap"], window=-3, target=2)  # The rc grid
+        queue.flush()
+        self.assertIsInstance(failed.error, ValueError)
+        self.assertEqual(
+            moves(self.env.server),
+            ["move window position 0 20", "move window position 480 20"],
+        )
+        self.assertEqual(queue.defaults["defaultGrid"], {"rows": 4, "columns": 4})
+        self.assertEqual(BASE_CONFIG, self.defaults)
+        self.assertEqual(queue.pending, [])
+
+    def test_profile(self):
+        queue, manager = self.queue, self.queue.manager
+        daemon = os.path.join(self.env.tmp.name, "daemon-{action}.prof")
+        request = os.path.join(self.env.tmp.name, "request-{action}.prof")
+        manager.profile = daemon  # As started with --profile
+        queue.submit(["snap"], window=-1, target=1, profile=None)  # argparse
+        queue.submit(["snap"], window=-2, target=2, profile=request)
+        queue.flush()
+        self.assertTrue(os.path.isfile(daemon.format(action="snap")))
+        self.assertTrue(os.path.isfile(request.format(action="snap")))
+        self.assertEqual(manager.profile, daemon)
+
+    def test_debounce(self):
+        queue = self.queue
+        queue.debounce = 0.05
+        queue.submit(["center"])
+        self.assertGreater(queue.remaining(), 0)
+        start = time.monotonic()
+        queue.flush()
+        self.assertGreater(time.monotonic() - start, 0.03)
+        self.assertEqual(queue.remaining(), 0)
+
+
+class TestDaemonBurst(unittest.TestCase):
+    """The requests of a burst share one queue flush."""
+
+    def test_burst(self):
+        with Environment(windows=0, floating=1) as env:
+            path = os.path.join(env.tmp.name, "daemon.sock")
+            daemon = GridDaemon(path, debounce=0.5)
+            threading.Thread(target=daemon.serve_forever, daemon=True).start()
+            while not os.path.exists(path):
+                time.sleep(0.01)
+            del env.server.commands[:]
+            responses = []
+            clients = [
+                threading.Thread(
+                    target=lambda t: responses.append(
+                        send(["snap", "--target", str(t)], path)
+                    ),
+                    args=(t,),
+                )
+                for t in (1, 2, 3)
+            ]
+            for client in clients:
+                client.start()
+                time.sleep(0.05)  # In order
+            for client in clients:
+                client.join(5)
+            self.assertEqual([r["collapsed"] for r in responses], [2, 2, 2])
+            self.assertEqual(moves(env.server), ["move window position 960 20"])
+            error = daemon.handle(["snap", "--preset", "none"])
+            self.assertEqual(error["status"], "error")
+            daemon.state.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import copy
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from latency_bench import Environment  # noqa: E402
+from i3grid import config  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import BASE_CONFIG, FloatManager, Utils  # noqa: E402
+
+RC = os.path.join(ROOT, "..", ".i3gridrc")
+
+
+class TestConfig(unittest.TestCase):
+    """JSONC parsing, validation and the compiled rc cache."""
+
+    def test_jsonc(self):
+        text = """{
+          // line comment, "quoted"
+          "a": "http://x // not a comment", /* block
+          comment */ "b": [1, 2,],
+          "c": {"d": "\\" /* still a string */",},
+        }"""
+        self.assertEqual(
+            config.parse_jsonc(text),
+            {
+                "a": "http://x // not a comment",
+                "b": [1, 2],
+                "c": {"d": '" /* still a string */'},
+            },
+        )
+
+    def test_example_rc(self):
+        with open(RC, "r") as f:
+            rc = config.validate(config.parse_jsonc(f.read()), BASE_CONFIG)
+        self.assertEqual(rc["defaultGrid"], {"rows": 4, "columns": 4})
+        self.assertIn("guake", rc["gridPresets"])
+
+    def test_no_code(self):
+        for text in ('{"snapLocation": __import__("os").getpid()}', "[1, 2]", "{"):
+            self.assertRaises(ValueError, config.parse_jsonc, text)
+
+    def test_validate(self):
+        for bad in (
+            {"autoResize": 1},
+            {"snapLocation": True},
+            {"defaultGrid": {"rows": 0, "columns": 2}},
+            {"gridOffset": [1, 2]},
+            {"gridPresets": {"x": {"rows": 2}}},
+            {"multis": "1 4"},
+        ):
+            self.assertRaises(ValueError, config.validate, bad, BASE_CONFIG)
+        valid = config.validate({"unknown": 1, "multis": None}, BASE_CONFIG)
+        self.assertEqual(valid, {})
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            rc, cache = os.path.join(tmp, "rc"), os.path.join(tmp, "rc.marshal")
+            with open(rc, "w") as f:
+                f.write('{"snapLocation": 3,}')
+            self.assertEqual(config.load(rc, BASE_CONFIG, cache), {"snapLocation": 3})
+            self.assertTrue(os.path.isfile(cache))
+            # Served from the cache while path, mtime and size match
+            st = os.stat(rc)
+            with open(rc, "w") as f:
+                f.write('{"snapLocation": 4,}')
+            os.utime(rc, ns=(st.st_atime_ns, st.st_mtime_ns))
+            self.assertEqual(config.load(rc, BASE_CONFIG, cache), {"snapLocation": 3})
+            os.utime(rc, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+            self.assertEqual(config.load(rc, BASE_CONFIG, cache), {"snapLocation": 4})
+
+
+class TestSnapshots(unittest.TestCase):
+    """Managers and runs keep their own config, the defaults never change."""
+
+    def setUp(self):
+        self.defaults = copy.deepcopy(BASE_CONFIG)
+
+    def test_freeze(self):
+        frozen = config.freeze({"defaultGrid": {"rows": 2}, "gridOffset": [1, 2]})
+        self.assertEqual(frozen["gridOffset"], (1, 2))
+        with self.assertRaises(TypeError):
+            frozen["defaultGrid"]["rows"] = 3
+        thawed = config.thaw(frozen)
+        thawed["defaultGrid"]["rows"] = 3
+        self.assertEqual(thawed["gridOffset"], [1, 2])
+        self.assertEqual(frozen["defaultGrid"]["rows"], 2)
+        snapshot = Utils.on_the_fly_override(rows=3, cols="2:1", target=2)
+        self.assertEqual(snapshot["defaultGrid"]["columnWeights"], (2, 1))
+        self.assertEqual(BASE_CONFIG, self.defaults)
+
+    def test_concurrent_managers(self):
+        with Environment(windows=0, floating=1) as env:
+            commands = list(Documentation.actions)
+
+            def snap(cols):  # One manager per thread
+                manager = FloatManager(commands=commands, rows=1, cols=cols, target=2)
+                manager.run("snap")
+
+            del env.server.commands[:]
+            with ThreadPoolExecutor(4) as pool:
+                list(pool.map(snap, [2, 4] * 20))
+            self.assertEqual(BASE_CONFIG, self.defaults)
+            moves = [c for c in env.server.commands if c.startswith("move")]
+            self.assertEqual(moves.count("move window position 960 20"), 20)
+            self.assertEqual(moves.count("move window position 480 20"), 20)
+            # A run from its own snapshot leaves the manager config
+            halves = FloatManager(commands=commands, rows=1, cols=2, target=2)
+            del env.server.commands[:]
+            halves.run("snap", config=halves.configure(cols=4, target=3))
+            halves.run("snap")
+            self.assertEqual(
+                [c for c in env.server.commands if c.startswith("move")],
+                ["move window position 960 20", "move window position 960 20"],
+            )
+            self.assertEqual(halves.config["defaultGrid"]["columns"], 2)
+            # Merged over the manager config, not over the defaults
+            halves.update_config({"snapLocation": 1})
+            self.assertEqual(halves.config["defaultGrid"]["columns"], 2)
+            self.assertEqual(halves.config["snapLocation"], 1)
+        self.assertEqual(BASE_CONFIG, self.defaults)
+
+
+if __name__ == "__main__":
+    unittest.main()
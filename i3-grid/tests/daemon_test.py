@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import ROOT, Environment  # noqa: E402
+from i3grid.client import send  # noqa: E402
+from i3grid.daemon import GridDaemon  # noqa: E402
+
+
+def client(*argv):
+    """`python -m i3grid.client <argv>`, the hotkey entry point."""
+    cmd = [sys.executable, "-m", "i3grid.client"] + list(argv)
+    return subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+
+
+class TestDaemonProtocol(unittest.TestCase):
+    """Requests of the thin client to a warm daemon, and the cold path."""
+
+    def setUp(self):
+        self.env = Environment(windows=0, floating=1).__enter__()
+        self.path = os.path.join(self.env.tmp.name, "daemon.sock")
+        os.environ["I3GRID_SOCKET"] = self.path
+
+    def tearDown(self):
+        self.env.__exit__(None, None, None)
+
+    def start(self):
+        daemon = GridDaemon(self.path)
+        threading.Thread(target=daemon.serve_forever, daemon=True).start()
+        while not os.path.exists(self.path):
+            time.sleep(0.01)
+        del self.env.server.commands[:]
+        return daemon
+
+    def test_round_trip(self):
+        daemon = self.start()
+        response = send(["snap", "--target", "2", "--timings"], self.path)
+        self.assertEqual(response["status"], "ok")
+        self.assertTrue(response["output"].startswith("snap: "))
+        self.assertIn("move window position 480 20", self.env.server.commands)
+        error = send(["snap", "--target", "x"], self.path)
+        self.assertEqual(error["status"], "error")
+        self.assertIn("invalid int value", error["message"])
+        sole = send(["listen"], self.path)
+        self.assertEqual(sole["status"], "error")
+        self.assertIn("cannot be run by the daemon", sole["message"])
+        # The same through the client process
+        self.assertEqual(client("snap", "--target", "1").returncode, 0)
+        failed = client("snap", "--target", "x")
+        self.assertEqual(failed.returncode, 1)
+        self.assertTrue(failed.stderr.startswith("i3grid: "))
+        daemon.state.close()
+
+    def test_failed_request(self):
+        daemon = self.start()
+
+        def restarted():
+            raise BrokenPipeError("i3 restarted")
+
+        daemon.queue.focused_window = restarted  # The state read fails
+        error = send(["snap", "--target", "2"], self.path)
+        self.assertEqual(error["status"], "error")
+        self.assertIn("BrokenPipeError", error["message"])
+        # Still serving, non-placements never read the focused window
+        self.assertEqual(send(["float"], self.path)["status"], "ok")
+        daemon.state.close()
+
+    def test_no_daemon(self):
+        self.assertRaises(OSError, send, ["snap"], self.path)
+        # Falls back to the cold path (python -m i3grid) with the argv
+        del self.env.server.commands[:]
+        done = client("snap", "--target", "2")
+        self.assertEqual(done.returncode, 0, done.stderr)
+        self.assertIn("move window position 480 20", self.env.server.commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import ROOT, Environment  # noqa: E402
+from i3grid import engine  # noqa: E402
+from i3grid.config import validate  # noqa: E402
+from i3grid.engine import GridEngine, edges, parse_axis  # noqa: E402
+from i3grid.grid import BASE_CONFIG, GridCache, Location  # noqa: E402
+
+OFFSET = (20, 0, 20, 0)
+DISPLAYS = [(1920, 1080), (2560, 1440)]
+
+
+def old_cell(display, rows, cols, off, n):
+    """The origin formula of the MonitorCalculator (uniform grids)."""
+    width = display[0] // cols - (off[3] + off[1]) // cols
+    height = display[1] // rows - (off[0] + off[2]) // rows
+    row, col = divmod(n - 1, cols)
+    return col * width + off[1], row * height + off[0]
+
+
+def old_grid(display, rows, cols, off):
+    """Cell origins and the cell size of the baseline calculate_grid
+    (int division, offsets spread over the rows and columns)."""
+    width = int(display[0] / cols) - int((off[3] + off[1]) / cols)
+    height = int(display[1] / rows) - int((off[0] + off[2]) / rows)
+    origins = [
+        (abs(col * width + off[1]), abs(row * height + off[0]))
+        for row in range(rows)
+        for col in range(cols)
+    ]
+    return origins, (width, height)
+
+
+def old_span(display, rows, cols, off, a, b):
+    """Origin and size of the baseline multi_pnt_calc for cells a, b."""
+    origins, (width, height) = old_grid(display, rows, cols, off)
+    (r0, c0), (r1, c1) = divmod(min(a, b) - 1, cols), divmod(max(a, b) - 1, cols)
+    return origins[min(a, b) - 1], (width * (1 + c1 - c0), height * (1 + r1 - r0))
+
+
+def builds(grids):
+    """The pure Python engine, and the NumPy one if installed."""
+    numpy, threshold = engine._numpy, engine.NUMPY_THRESHOLD
+    try:
+        engine._numpy = False  # As if not installed
+        found = [GridEngine(DISPLAYS, grids)]
+        if importlib.util.find_spec("numpy"):
+            engine._numpy, engine.NUMPY_THRESHOLD = None, 0
+            found.append(GridEngine(DISPLAYS, grids))
+    finally:
+        engine._numpy, engine.NUMPY_THRESHOLD = numpy, threshold
+    return found
+
+
+class TestEngine(unittest.TestCase):
+    """Edge tables of uniform and weighted grids."""
+
+    def test_uniform(self):
+        grids = [(4, 4, OFFSET), (3, 5, (0, 10, 30, 5)), (12, 12, OFFSET)]
+        grid_engine = GridEngine(DISPLAYS, grids)
+        for o, display in enumerate(DISPLAYS):
+            for g, (rows, cols, off) in enumerate(grids):
+                for n in range(1, rows * cols + 1):
+                    expected = old_cell(display, rows, cols, off, n)
+                    self.assertEqual(grid_engine.cell(o, g, n), expected)
+        self.assertEqual(edges(1920, 3, 0, 0), [0, 640, 1280, 1920])
+
+    def test_baseline(self):
+        rand = random.Random(7)
+        grids = [
+            (
+                rand.randint(1, 12),
+                rand.randint(1, 12),
+                tuple(rand.randint(0, 60) for _ in range(4)),
+            )
+            for _ in range(300)
+        ]
+        for grid_engine in builds(grids):
+            for o, display in enumerate(DISPLAYS):
+                for g, (rows, cols, off) in enumerate(grids):
+                    origins, size = old_grid(display, rows, cols, off)
+                    ns = list(range(1, rows * cols + 1))
+                    cells = [grid_engine.cell(o, g, n) for n in ns]
+                    self.assertEqual(cells, origins)
+                    self.assertEqual(grid_engine.size(o, g), size)
+                    self.assertEqual(grid_engine.cell_size(o, g, ns[-1]), size)
+                    for _ in range(5):
+                        a, b = rand.choice(ns), rand.choice(ns)
+                        self.assertEqual(
+                            grid_engine.span(o, g, a, b),
+                            old_span(display, rows, cols, off, a, b),
+                        )
+
+    def test_weighted(self):
+        grid = (2, 3, OFFSET, ((2, 1), (2, 1, 1)))
+        grid_engine = GridEngine(DISPLAYS[:1], [grid])
+        self.assertEqual([int(x) for x in grid_engine.x[0][0]], [0, 960, 1440, 1920])
+        self.assertEqual([int(y) for y in grid_engine.y[0][0]], [20, 713, 1060])
+        self.assertEqual(grid_engine.cell(0, 0, 5), (960, 713))
+        self.assertEqual(grid_engine.cell_size(0, 0, 1), (960, 693))
+        self.assertEqual(grid_engine.cell_size(0, 0, 6), (480, 347))
+        self.assertEqual(grid_engine.span(0, 0, 2, 6), ((960, 20), (960, 1040)))
+        self.assertEqual(grid_engine.locate(0, 0, 959, 712), 1)
+        self.assertEqual(grid_engine.locate(0, 0, 1500, 800), 6)
+        self.assertEqual(grid_engine.locate(0, 0, 5000, -5), 3)  # Clamped
+        # Also addressed by the uniform form of equal weights
+        self.assertEqual(grid_engine.grid_index(grid), 0)
+
+    @unittest.skipIf(not importlib.util.find_spec("numpy"), "numpy is not installed")
+    def test_numpy(self):
+        grids = [(4, 4, OFFSET), (2, 3, OFFSET, ((2, 1), (2, 1, 1)))]
+        python, fast = builds(grids)
+        self.assertIsNone(python.np)
+        self.assertIsNotNone(fast.np)
+        for o in range(len(DISPLAYS)):
+            for g, (rows, cols) in enumerate([(4, 4), (2, 3)]):
+                ns = list(range(1, rows * cols + 1))
+                self.assertEqual(fast.tensor(o, g), python.tensor(o, g))
+                last = ns[-1]
+                self.assertEqual(fast.span(o, g, 1, last), python.span(o, g, 1, last))
+                self.assertEqual(fast.cell_size(o, g, 2), python.cell_size(o, g, 2))
+
+    def test_parse_axis(self):
+        self.assertEqual(parse_axis(3), (3, None))
+        self.assertEqual(parse_axis("3"), (3, None))
+        self.assertEqual(parse_axis("2:1:1"), (3, (2, 1, 1)))
+        self.assertEqual(parse_axis("0.5:0.25"), (2, (0.5, 0.25)))
+        self.assertEqual(parse_axis([1, 1]), (2, None))
+        for bad in (0, "0", "2:0", "2:-1", "a:b", [], [True, 1]):
+            self.assertRaises(ValueError, parse_axis, bad)
+
+
+class TestWeightedConfig(unittest.TestCase):
+    """Weights in the rc file and on the cli."""
+
+    def test_validate(self):
+        presets = {"focus": {"rows": 1, "columns": 3, "columnWeights": [2, 1, 1]}}
+        valid = validate({"gridPresets": presets}, BASE_CONFIG)
+        self.assertEqual(valid["gridPresets"], presets)
+        for bad in (
+            {"gridPresets": {"focus": dict(presets["focus"], columnWeights=[2, 1])}},
+            {"defaultGrid": {"rows": 2, "columns": 2, "rowWeights": [1, 0]}},
+            {"outputGrids": {"DP-0": {"rows": 1, "columns": 2, "columnWeights": 2}}},
+        ):
+            self.assertRaises(ValueError, validate, bad, BASE_CONFIG)
+
+    def test_cli(self):
+        with Environment() as env:
+            for argv, position in (
+                (["--cols", "2:1:1", "--rows", "1", "--target", "2"], "960 20"),
+                (["--preset", "focus", "--target", "3"], "1440 20"),
+            ):
+                del env.server.commands[:]
+                cmd = [sys.executable, "-m", "i3grid", "snap"] + argv
+                subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True)
+                self.assertIn("resize set 480 1040", env.server.commands)
+                self.assertIn(f"move window position {position}", env.server.commands)
+
+
+class TestGridCache(unittest.TestCase):
+    """The grids file is only rewritten when a new grid was computed."""
+
+    def test_dirty(self):
+        key = (1, 2, (0, 0, 0, 0), engine.UNIFORM, Location(1920, 1080))
+        grid = [[(1, Location(0, 0)), (2, Location(960, 0))]]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "grids.json")
+            cache = GridCache(path)
+            cache.put(key, grid, Location(960, 1080), False)
+            self.assertTrue(cache.dirty)
+            cache.save()
+            self.assertFalse(cache.dirty)
+            cache = GridCache(path)  # A later run, served from the file
+            self.assertEqual(cache.get(key), (grid, Location(960, 1080)))
+            os.unlink(path)
+            cache.save()
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
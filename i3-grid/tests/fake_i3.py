@@ -0,0 +1,334 @@
+"""A local stand in for i3 and xrandr, for tests and benchmarks without an
+X session. FakeI3 speaks the binary i3 IPC protocol over a UNIX socket
+and serves a synthetic tree (outputs side by side, each with workspaces
+of tiled and floating windows). `install` writes fake `i3`, `i3-msg` and
+`xrandr` executables and points the environment at them."""
+
+import collections
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+
+HEADER = struct.Struct("=6sII")
+MAGIC = b"i3-ipc"
+EVENT_MASK = 1 << 31
+EVENT_TYPES = {"workspace": 0, "output": 1, "mode": 2, "window": 3}
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (1680, 1050), (3840, 2160)]
+
+
+def rect(x, y, width, height):
+    return {"x": x, "y": y, "width": width, "height": height}
+
+
+class FakeI3:
+    """Threaded fake i3 IPC server. Every RUN_COMMAND payload is recorded
+    in `commands`; `emit` pushes events to the subscribed connections."""
+
+    def __init__(
+        self,
+        path: str,
+        outputs: int = 1,
+        workspaces: int = 1,
+        windows: int = 3,
+        floating: int = 1,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.commands = []
+        self.requests = collections.Counter()  # Message types received
+        self.subscribers = []
+        self.connections = []
+        self.lock = threading.Lock()
+        self._ids = iter(range(1, 1 << 30))
+        self.outputs, self.workspaces = [], []
+        self.tree = self.build(outputs, workspaces, windows, floating)
+        self.sock = None
+
+    # Synthetic state
+
+    def node(self, name, kind, box, **kwargs) -> dict:
+        node = {
+            "id": next(self._ids),
+            "name": name,
+            "type": kind,
+            "focused": False,
+            "floating": "auto_off",
+            "rect": box,
+            "nodes": [],
+            "floating_nodes": [],
+            "focus": [],
+        }
+        node.update(kwargs)
+        return node
+
+    def window(self, name, box, floating=False) -> dict:
+        state = "user_on" if floating else "user_off"
+        win = self.node(name, "con", box, floating=state)
+        win["window"] = win["id"] * 10
+        win["window_properties"] = {
+            "class": name.title(),
+            "instance": name,
+            "title": name,
+        }
+        return win
+
+    def build(self, outputs, workspaces, windows, floating) -> dict:
+        root = self.node("root", "root", rect(0, 0, 0, 0))
+        root["nodes"].append(self.node("__i3", "output", rect(0, 0, 0, 0)))
+        self.outputs.append(
+            {
+                "name": "xroot-0",
+                "active": False,
+                "current_workspace": None,
+                "rect": rect(0, 0, 0, 0),
+            }
+        )
+        x, num, focused = 0, 1, None
+        for o in range(outputs):
+            w, h = RESOLUTIONS[o % len(RESOLUTIONS)]
+            box = rect(x, 0, w, h)
+            output = self.node(f"DP-{o}", "output", box)
+            content = self.node("content", "con", box)
+            output["nodes"].append(content)
+            for k in range(workspaces):
+                ws = self.node(str(num), "workspace", box, num=num)
+                tile = w // max(windows, 1)
+                for i in range(windows):
+                    ws["nodes"].append(
+                        self.window(f"term-{num}-{i}", rect(x + i * tile, 0, tile, h))
+                    )
+                for i in range(floating):
+                    win = self.window(
+                        f"float-{num}-{i}", rect(x + 100, 100, w // 3, h // 3), True
+                    )
+                    con = self.node(
+                        None, "floating_con", win["rect"], floating="user_on"
+                    )
+                    con["nodes"].append(win)
+                    ws["floating_nodes"].append(con)
+                children = ws["nodes"] + ws["floating_nodes"]
+                ws["focus"] = [c["id"] for c in children]
+                content["nodes"].append(ws)
+                if focused is None:
+                    focused = ws
+                self.workspaces.append(
+                    {
+                        "num": num,
+                        "name": str(num),
+                        "visible": k == 0,
+                        "focused": ws is focused,
+                        "urgent": False,
+                        "output": output["name"],
+                        "rect": box,
+                    }
+                )
+                num += 1
+            content["focus"] = [ws["id"] for ws in content["nodes"]]
+            output["focus"] = [content["id"]]
+            root["nodes"].append(output)
+            self.outputs.append(
+                {
+                    "name": output["name"],
+                    "active": True,
+                    "primary": o == 0,
+                    "current_workspace": content["nodes"][0]["name"],
+                    "rect": box,
+                }
+            )
+            x += w
+        root["rect"] = rect(0, 0, x, max(o["rect"]["height"] for o in self.outputs))
+        root["focus"] = [n["id"] for n in root["nodes"][1:]]
+        if focused["nodes"] or focused["floating_nodes"]:
+            first = (focused["nodes"] or focused["floating_nodes"][0]["nodes"])[0]
+            first["focused"] = True
+        else:
+            focused["focused"] = True
+        return root
+
+    def xrandr(self) -> str:
+        """The `xrandr --query` output of the synthetic outputs."""
+        active = [o for o in self.outputs if o["active"]]
+        width = sum(o["rect"]["width"] for o in active)
+        height = max(o["rect"]["height"] for o in active)
+        lines = [
+            f"Screen 0: minimum 8 x 8, current {width} x {height}, "
+            "maximum 32767 x 32767"
+        ]
+        for o in active:
+            r = o["rect"]
+            lines += [
+                f"{o['name']} connected{' primary' if o.get('primary') else ''} "
+                f"{r['width']}x{r['height']}+{r['x']}+{r['y']} (normal left "
+                "inverted right x axis y axis) 600mm x 340mm",
+                f"   {r['width']}x{r['height']}     60.00*+",
+            ]
+        # As on laptops, with nothing plugged in
+        lines.append("HDMI-9 disconnected (normal left inverted right x axis y axis)")
+        return "\n".join(lines) + "\n"
+
+    # Server
+
+    def reply(self, msg_type: int, payload: str) -> object:
+        with self.lock:
+            self.requests[msg_type] += 1
+        if msg_type == 0:
+            with self.lock:
+                self.commands.append(payload)
+            return [{"success": True} for _ in payload.split(";")]
+        if msg_type == 1:
+            return self.workspaces
+        if msg_type == 3:
+            return self.outputs
+        if msg_type == 4:
+            return self.tree
+        if msg_type == 7:
+            return {"human_readable": "4.18 (fake)", "major": 4, "minor": 18}
+        return {"success": False, "error": f"Unsupported message {msg_type}"}
+
+    def emit(self, event: str, data: dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        frame = HEADER.pack(MAGIC, len(body), EVENT_MASK | EVENT_TYPES[event])
+        with self.lock:
+            for conn in list(self.subscribers):
+                try:
+                    conn.sendall(frame + body)
+                except OSError:
+                    self.subscribers.remove(conn)
+
+    def serve(self, conn: socket.socket) -> None:
+        try:
+            self._serve(conn)
+        except OSError:
+            pass  # Dropped by restart
+        finally:
+            conn.close()
+
+    def _serve(self, conn: socket.socket) -> None:
+        buf = b""
+        while True:
+            while len(buf) < HEADER.size:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                buf += data
+            _, length, msg_type = HEADER.unpack(buf[: HEADER.size])
+            while len(buf) < HEADER.size + length:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                buf += data
+            payload = buf[HEADER.size : HEADER.size + length].decode("utf-8")
+            buf = buf[HEADER.size + length :]
+            if msg_type == 2:
+                response = {"success": True}
+            else:
+                response = self.reply(msg_type, payload)
+            body = json.dumps(response).encode("utf-8")
+            with self.lock:
+                conn.sendall(HEADER.pack(MAGIC, len(body), msg_type) + body)
+                if msg_type == 2:
+                    self.subscribers.append(conn)
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections.append(conn)
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def start(self) -> "FakeI3":
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen()
+        self.acceptor = threading.Thread(target=self._accept, daemon=True)
+        self.acceptor.start()
+        return self
+
+    def stop(self) -> None:
+        # Wakes the acceptor before the socket is closed, otherwise it may
+        # accept on the next server reusing the file descriptor
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.acceptor.join(5)
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def restart(self) -> "FakeI3":
+        """Drops every client connection and listens again, as i3 does
+        on `i3 restart`."""
+        self.stop()
+        with self.lock:
+            for conn in self.connections:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)  # Wakes the serve thread
+                except OSError:
+                    pass
+            self.connections, self.subscribers = [], []
+        return self.start()
+
+    def __enter__(self) -> "FakeI3":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+I3_MSG = """#!{python}
+import json, os, socket, struct, sys
+HEADER = struct.Struct("=6sII")
+body = " ".join(sys.argv[1:]).encode("utf-8")
+s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+s.connect(os.environ["I3SOCK"])
+s.sendall(HEADER.pack(b"i3-ipc", len(body), 0) + body)
+_, length, _ = HEADER.unpack(s.recv(HEADER.size, socket.MSG_WAITALL))
+print(s.recv(length, socket.MSG_WAITALL).decode("utf-8"))
+"""
+
+
+def _executable(path: str, content: str) -> None:
+    with open(path, "w") as f:
+        f.write(content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def install(server: FakeI3, root: str, env: dict = None) -> dict:
+    """Writes the fake executables and the captured xrandr output under
+    root, and points env (default: os.environ) at them and at the fake
+    socket. HOME and XDG_CACHE_HOME are isolated under root too."""
+    env = os.environ if env is None else env
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    query = os.path.join(root, "xrandr.txt")
+    with open(query, "w") as f:
+        f.write(server.xrandr())
+    _executable(os.path.join(bin_dir, "i3"), f"#!/bin/sh\necho {server.path}\n")
+    _executable(os.path.join(bin_dir, "i3-msg"), I3_MSG.format(python=sys.executable))
+    _executable(
+        os.path.join(bin_dir, "xrandr"),
+        "#!/bin/sh\n"
+        'if [ "$1" = "--version" ]; then\n'
+        '  echo "xrandr program version       1.5.1"\n'
+        '  echo "Server reports RandR version 1.6"\n'
+        "  exit 0\n"
+        "fi\n"
+        f'cat "{query}"\n',
+    )
+    env["PATH"] = bin_dir + os.pathsep + env.get("PATH", "")
+    env["I3SOCK"] = server.path
+    env["HOME"] = os.path.join(root, "home")
+    env["XDG_CACHE_HOME"] = os.path.join(root, "cache")
+    env["XDG_RUNTIME_DIR"] = root
+    os.makedirs(env["HOME"], exist_ok=True)
+    return env
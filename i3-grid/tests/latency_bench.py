@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(TESTS, "..")
+sys.path.insert(0, ROOT)
+from fake_i3 import FakeI3, install  # noqa: E402
+
+# Stored results of `python3 latency_bench.py --bench --save`
+BASELINE = os.path.join(TESTS, "data", "latency_baseline.json")
+RC = os.path.join(ROOT, "..", ".i3gridrc")
+PERCENTILES = (50, 95, 99)
+# Flags per action (the action alone if missing)
+SCENARIOS = {
+    "snap": {"target": 3},
+    "csize": {"perc": 50},
+    "multi": {"multis": ["1", "4"]},
+    "save-layout": {"layout": "bench"},
+    "restore-layout": {"layout": "bench"},  # Saved by save-layout first
+}
+# Actions with nothing to send while the windows are where the layout has
+# them (the fake i3 never applies the commands)
+LAYOUT_ACTIONS = {"save-layout", "restore-layout"}
+# Long running actions that never return
+SKIPPED = {"listen", "daemon", "rofi"}
+
+
+def argv(action):
+    args = [action]
+    for flag, value in SCENARIOS.get(action, {}).items():
+        args.append(f"--{flag}")
+        args += [str(v) for v in value] if isinstance(value, list) else [str(value)]
+    return args
+
+
+def percentile(samples, p):
+    """Nearest rank percentile."""
+    ordered = sorted(samples)
+    return ordered[max(0, -(-len(ordered) * p // 100) - 1)]
+
+
+def summary(samples):
+    """p50/p95/p99 in milliseconds."""
+    return {f"p{p}": round(percentile(samples, p) * 1e3, 3) for p in PERCENTILES}
+
+
+class Environment:
+    """Fake i3 server, fake executables and an isolated home (with the
+    example rc file) for the duration of the context."""
+
+    def __init__(self, **layout) -> None:
+        self.layout = layout
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def __enter__(self):
+        root = self.tmp.name
+        self.server = FakeI3(os.path.join(root, "i3.sock"), **self.layout).start()
+        self.saved = dict(os.environ)
+        install(self.server, root)
+        shutil.copy(RC, os.path.join(os.environ["HOME"], ".i3gridrc"))
+        return self
+
+    def __exit__(self, *exc):
+        # Process wide connections point at this server
+        if "i3grid.ipc" in sys.modules:
+            ipc = sys.modules["i3grid.ipc"]
+            if ipc._connection is not None:
+                ipc._connection.close()
+            ipc._connection = None
+        if "i3" in sys.modules:  # A wrapper object around the i3-py module
+            i3_globals = sys.modules["i3"].default_socket.__globals__
+            if i3_globals["__socket__"] is not None:
+                i3_globals["__socket__"].close()
+            i3_globals["__socket__"] = None
+        os.environ.clear()
+        os.environ.update(self.saved)
+        self.server.stop()
+        self.tmp.cleanup()
+
+
+def library_runs(action, number):
+    """Seconds per FloatManager.run of the action (warm manager)."""
+    from i3grid.doc import Documentation
+    from i3grid.grid import FloatManager
+
+    manager = FloatManager(
+        commands=list(Documentation.actions), **SCENARIOS.get(action, {})
+    )
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        manager.run(cmd=action)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def cli_runs(action, number):
+    """Seconds per `python3 -m i3grid <action>` process."""
+    cmd = [sys.executable, "-m", "i3grid"] + argv(action)
+    samples = []
+    for _ in range(number):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def measure(library=200, cli=20, layout=None):
+    """{path: {action: {p50, p95, p99}}} for every action in
+    Documentation.actions (listen, daemon and rofi are skipped)."""
+    from i3grid.doc import Documentation
+
+    results = {"library": {}, "cli": {}}
+    with Environment(**(layout or {})):
+        for action in Documentation.actions:
+            if action in SKIPPED:
+                continue
+            results["library"][action] = summary(library_runs(action, library))
+            results["cli"][action] = summary(cli_runs(action, cli))
+    return results
+
+
+def report(results, baseline=None, tolerance=1.5):
+    """Prints the results next to the baseline. Returns the regressions
+    (p50 slower than tolerance * baseline p50)."""
+    regressions = []
+    print(
+        f"{'path':<9}{'action':<8}"
+        + "".join(f"{f'p{p} ms':>9}" for p in PERCENTILES)
+        + f"{'base p50':>10}"
+    )
+    for path, actions in results.items():
+        for action, stats in actions.items():
+            base = (baseline or {}).get(path, {}).get(action)
+            ref = f"{base['p50']:>10.3f}" if base else f"{'-':>10}"
+            print(
+                f"{path:<9}{action:<8}"
+                + "".join(f"{stats[f'p{p}']:>9.3f}" for p in PERCENTILES)
+                + ref
+            )
+            if base and stats["p50"] > base["p50"] * tolerance:
+                regressions.append((path, action, stats["p50"], base["p50"]))
+    for path, action, now, then in regressions:
+        print(f"Regression: {path} {action} p50 {now:.3f}ms (baseline {then:.3f}ms)")
+    return regressions
+
+
+class TestFakeI3(unittest.TestCase):
+    """Every benchmarked action reaches the fake i3 server, through both
+    the library and the cli."""
+
+    def test_library_dispatch(self):
+        with Environment() as env:
+            for action in SCENARIOS:
+                del env.server.commands[:]
+                library_runs(action, 1)
+                if action in LAYOUT_ACTIONS:  # The fake windows never move
+                    continue
+                self.assertTrue(env.server.commands, action)
+            layouts = os.path.join(
+                os.environ["HOME"], ".local", "share", "i3grid", "layouts.json"
+            )
+            self.assertTrue(os.path.isfile(layouts))
+
+    def test_cli_dispatch(self):
+        with Environment() as env:
+            cli_runs("snap", 1)
+            self.assertTrue(any("move" in c for c in env.server.commands))
+
+    def test_layout(self):
+        with Environment(outputs=3, workspaces=2, windows=4) as env:
+            active = [o for o in env.server.outputs if o["active"]]
+            self.assertEqual([o["rect"]["x"] for o in active], [0, 1920, 4480])
+            self.assertEqual(len(env.server.workspaces), 6)
+            self.assertEqual(env.server.xrandr().count(" connected"), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="i3-grid latency benchmark")
+    parser.add_argument("--bench", action="store_true", help="run the benchmark")
+    parser.add_argument("--save", action="store_true", help="store as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on regressions")
+    parser.add_argument("--library", type=int, default=200, help="runs per action")
+    parser.add_argument("--cli", type=int, default=20, help="processes per action")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--outputs", type=int, default=1)
+    parser.add_argument("--windows", type=int, default=3)
+    args, rest = parser.parse_known_args()
+    if not args.bench:
+        unittest.main(argv=[sys.argv[0]] + rest)
+        return
+
+    layout = {"outputs": args.outputs, "windows": args.windows}
+    results = measure(args.library, args.cli, layout)
+    baseline = None
+    if os.path.isfile(BASELINE):
+        with open(BASELINE, "r") as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
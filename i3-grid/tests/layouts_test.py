@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import ROOT, Environment  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import FloatManager  # noqa: E402
+from i3grid.layouts import match  # noqa: E402
+from i3grid.state import StateCache  # noqa: E402
+from i3grid.tree import TreeIndex  # noqa: E402
+
+
+def window(con_id, cls, instance, title):
+    props = {"class": cls, "instance": instance, "title": title}
+    return {"id": con_id, "window_properties": props}
+
+
+def floating(server):
+    index = TreeIndex(server.tree)
+    return [n for n in index.windows("1") if n[2] == "user_on"], index
+
+
+class TestLayouts(unittest.TestCase):
+    """Saved layouts, window matching and the batched restore."""
+
+    def test_expand_names(self):
+        expand = Documentation.expand_names
+        self.assertEqual(
+            expand(["save-layout", "research", "--timings"]),
+            ["save-layout", "--timings", "--layout", "research"],
+        )
+        self.assertEqual(expand(["restore-layout", "snap"]), ["restore-layout", "snap"])
+
+    def test_match(self):
+        rows = [["Term", "term", "vim"], ["Term", "term", "htop"], ["Web", "web", "x"]]
+        nodes = [
+            window(1, "Term", "term", "htop"),
+            window(2, "Term", "term", "man"),
+            window(3, "Web", "web", "y"),
+        ]
+        pairs = [(r[2], n["id"]) for r, n in match(rows, nodes)]
+        self.assertEqual(sorted(pairs), [("htop", 1), ("vim", 2), ("x", 3)])
+
+    def test_round_trip(self):
+        with Environment(windows=1, floating=3) as env:
+            cli = [sys.executable, "-m", "i3grid"]
+            subprocess.run(cli + ["save-layout", "research"], cwd=ROOT, check=True)
+            path = os.path.join(
+                os.environ["HOME"], ".local", "share", "i3grid", "layouts.json"
+            )
+            with open(path) as f:
+                saved = json.load(f)["layouts"]["research"]["windows"]
+            self.assertEqual(len(saved), 3)
+            identity = ["Float-1-0", "float-1-0", "float-1-0"]
+            self.assertEqual(saved[0][:5], identity + ["DP-0", 1])
+            # Nothing moved: nothing to restore
+            subprocess.run(cli + ["restore-layout", "research"], cwd=ROOT, check=True)
+            self.assertEqual(env.server.commands, [])
+
+            windows, index = floating(env.server)
+            moved = index.nodes[windows[1][1]]
+            moved["rect"] = dict(moved["rect"], x=900, width=100)
+            subprocess.run(cli + ["restore-layout", "research"], cwd=ROOT, check=True)
+            rect = saved[1]
+            self.assertEqual(
+                env.server.commands,
+                [
+                    f"[con_id={moved['id']}] resize set {rect[7]} {rect[8]}; "
+                    f"[con_id={moved['id']}] move window position {rect[5]} {rect[6]}"
+                ],
+            )
+
+    def test_state_cache(self):
+        with Environment(windows=1, floating=1) as env:
+            cache = StateCache()
+            manager = FloatManager(
+                commands=list(Documentation.actions), state_cache=cache
+            )
+            manager.run("save-layout", name="cached")
+            windows, index = floating(env.server)
+            moved = index.nodes[windows[0][1]]
+            moved["rect"] = dict(moved["rect"], x=900)  # A drag, no i3 event
+            rows = manager.run("save-layout", name="cached")
+            self.assertEqual(rows[0][5], 900)
+            cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
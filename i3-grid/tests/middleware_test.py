@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from i3grid import events  # noqa: E402
+from i3grid.broker import EventBroker, Subscriber  # noqa: E402
+from i3grid.publisher import EventPublisher  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def publish(port, *payloads):
+    encoder = events.EventEncoder()
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        s.sendall(b"".join(encoder.encode(p) for p in payloads))
+
+
+def stop(loop, broker):
+    asyncio.run_coroutine_threadsafe(broker.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def receive(sock, decoder, count):
+    received = []
+    while len(received) < count:
+        received += decoder.feed(sock.recv(65536))
+    return received
+
+
+class TestBroker(unittest.TestCase):
+    """Fan out of the middleware events to concurrent subscribers."""
+
+    def setUp(self):
+        self.port, self.mapped = free_port(), []
+        self.loop = asyncio.new_event_loop()
+        broker = EventBroker("127.0.0.1", self.port, self.mapped.append, 4)
+        self.loop.run_until_complete(broker.start())
+        self.broker = broker
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def tearDown(self):
+        stop(self.loop, self.broker)
+
+    def subscribe(self, count):
+        subs = []
+        for _ in range(count):
+            s = socket.create_connection(("127.0.0.1", self.port))
+            s.settimeout(5)
+            s.sendall(events.frame(events.SUBSCRIBE, {}))
+            subs.append(s)
+        while len(self.broker.subscribers) < count:
+            time.sleep(0.01)
+        return subs
+
+    def test_fan_out(self):
+        monitors = [{"name": "DP-0", "rect": {"x": 0, "y": 0}}]
+        center = {"command": "center", "grid": [], "monitors": monitors}
+        big = {"command": "snap", "grid": list(range(2000)), "monitors": monitors}
+        subs = self.subscribe(2)
+        publish(self.port, center, big)
+        for s in subs:
+            first, second = receive(s, events.EventDecoder(), 2)
+            self.assertEqual(first["command"], "center")
+            self.assertEqual(second["grid"], big["grid"])
+            self.assertEqual(second["monitors"], monitors)
+            self.assertEqual(second["generation"], first["generation"] + 1)
+            s.close()
+        self.assertEqual(json.loads(self.mapped[-1]), big)
+
+    def test_drop_oldest(self):
+        async def fill():
+            sub = Subscriber(None, 2)
+            for i in range(5):
+                sub.offer(i)
+            return sub, [sub.queue.get_nowait() for _ in range(2)]
+
+        sub, queued = asyncio.run(fill())
+        self.assertEqual((sub.dropped, queued), (3, [3, 4]))
+
+
+class TestPublisher(unittest.TestCase):
+    """One reused connection per broker, dropped events without one."""
+
+    def test_reused_connection(self):
+        port, received = free_port(), []
+        loop = asyncio.new_event_loop()
+        broker = EventBroker("127.0.0.1", port, received.append)
+        loop.run_until_complete(broker.start())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        try:
+            publisher = EventPublisher(("127.0.0.1", port))
+            for i in range(20):
+                self.assertTrue(publisher.publish({"command": i}))
+            self.assertTrue(publisher.flush(5))
+            sock = publisher.sock
+            publisher.publish("center")
+            self.assertTrue(publisher.flush(5))
+            self.assertIs(publisher.sock, sock)
+            while len(received) < 21:
+                time.sleep(0.01)
+            self.assertEqual(json.loads(received[0]), {"command": 0})
+            self.assertEqual(json.loads(received[-1]), {"data": "center"})
+            publisher._close()
+        finally:
+            stop(loop, broker)
+
+    def test_filtered(self):
+        port = free_port()
+        loop = asyncio.new_event_loop()
+        broker = EventBroker("127.0.0.1", port)
+        loop.run_until_complete(broker.start())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        try:
+            publisher = EventPublisher(("127.0.0.1", port))
+            event = {"command": "snap", "grid": [1], "timings": {"total": 1.0}}
+            publisher.publish(event)
+            publisher.flush(5)
+            self.assertEqual(publisher.skipped, 1)  # Nobody subscribed
+            stream = events.subscribe(
+                "127.0.0.1", port, commands=["snap"], fields=["timings"]
+            )
+            received = []
+            reader = threading.Thread(
+                target=lambda: received.append(next(stream)), daemon=True
+            )
+            reader.start()
+            while not broker.subscribers:
+                time.sleep(0.01)
+            while publisher.interest["commands"] != ["snap"]:
+                publisher.publish({"command": "center"})
+                publisher.flush(5)
+            publisher.publish(event)
+            reader.join(5)
+            expected = {"command": "snap", "timings": {"total": 1.0}}
+            self.assertEqual(received, [dict(expected, generation=1)])
+            publisher._close()
+        finally:
+            stop(loop, broker)
+
+    def test_accepts(self):
+        port = free_port()
+        loop = asyncio.new_event_loop()
+        broker = EventBroker("127.0.0.1", port)
+        loop.run_until_complete(broker.start())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        try:
+            publisher = EventPublisher(("127.0.0.1", port))
+            self.assertTrue(publisher.accepts("snap"))  # Interest unknown
+            publisher.publish({"command": "snap"})
+            publisher.flush(5)
+            self.assertFalse(publisher.accepts("snap"))  # Nobody subscribed
+            stream = events.subscribe("127.0.0.1", port, commands=["snap"])
+            threading.Thread(target=lambda: next(stream), daemon=True).start()
+            while not broker.subscribers:
+                time.sleep(0.01)
+            # The sender thread re-reads the interest of the broker
+            while not publisher.accepts("snap"):
+                publisher.flush(5)
+            self.assertFalse(publisher.accepts("center"))
+            self.assertGreaterEqual(publisher.skipped, 3)
+            publisher._close()
+        finally:
+            stop(loop, broker)
+
+    def test_bad_event(self):
+        port, received = free_port(), []
+        loop = asyncio.new_event_loop()
+        broker = EventBroker("127.0.0.1", port, received.append)
+        loop.run_until_complete(broker.start())
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        try:
+            publisher = EventPublisher(("127.0.0.1", port))
+            publisher.publish({"command": "snap", "grid": object()})  # Not JSON
+            publisher.publish({"command": "center"})
+            self.assertTrue(publisher.flush(5))
+            self.assertEqual(publisher.dropped, 1)
+            self.assertTrue(publisher.thread.is_alive())
+            while not received:
+                time.sleep(0.01)
+            self.assertEqual(json.loads(received[0]), {"command": "center"})
+            publisher._close()
+        finally:
+            stop(loop, broker)
+
+    def test_no_listener(self):
+        publisher = EventPublisher(("127.0.0.1", free_port()))
+        self.assertTrue(publisher.publish({"command": "snap"}))
+        self.assertTrue(publisher.flush(5))
+        # Short circuits until the backoff expires
+        self.assertFalse(publisher.publish({"command": "snap"}))
+        self.assertFalse(publisher.accepts("snap"))  # Not even built
+        self.assertEqual(publisher.dropped, 3)
+
+
+class TestEventFormat(unittest.TestCase):
+    """Static data once per generation, deltas of the changed fields."""
+
+    def test_deltas(self):
+        node = {"id": 7, "rect": {"x": 0, "y": 0, "width": 640}, "marks": ["a"]}
+        grid = [[[1, [0, 0]], [2, [960, 0]]]]
+        encoder, decoder, sizes = events.EventEncoder(), events.EventDecoder(), []
+        moved = dict(node, rect={"x": 960, "y": 0, "width": 640})
+        sent = [
+            {"command": "snap", "modifying_node": node},
+            {"command": "snap", "modifying_node": moved},
+            {"command": "center", "modifying_node": {"id": 7}},
+        ]
+        for event in sent:
+            event.update(grid=grid, monitors=[])
+        received = []
+        for event in sent:
+            data = encoder.encode(event)
+            sizes.append(len(data))
+            received += decoder.feed(data[:5]) + decoder.feed(data[5:])
+        for event, decoded in zip(sent, received):
+            self.assertEqual(decoded, dict(event, generation=1))
+        self.assertLess(sizes[1] * 3, sizes[0])
+
+    def test_generation(self):
+        encoder, decoder = events.EventEncoder(), events.EventDecoder()
+        decoder.feed(encoder.encode({"command": "snap", "grid": [1]}))
+        event = decoder.feed(encoder.encode({"command": "snap", "grid": [2]}))[0]
+        self.assertEqual((event["grid"], event["generation"]), ([2], 2))
+        self.assertRaises(
+            ValueError, events.EventDecoder().feed, encoder.encode({"grid": [2]})
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import ROOT, Environment  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import FloatManager  # noqa: E402
+from i3grid.outputs import OutputIndex  # noqa: E402
+
+NO_OFFSET = (0, 0, 0, 0)
+
+
+def output(name, x, y, width, height, **kwargs):
+    rect = {"x": x, "y": y, "width": width, "height": height}
+    return dict(name=name, rect=rect, active=True, **kwargs)
+
+
+class TestOutputIndex(unittest.TestCase):
+    """Point and cell lookups over every output, relative outputs."""
+
+    def setUp(self):
+        # Three outputs side by side, one more above the middle one
+        self.index = OutputIndex(
+            [
+                output("DP-0", 0, 1080, 1920, 1080),
+                output("DP-1", 1920, 1080, 2560, 1440, primary=True),
+                output("DP-2", 4480, 1080, 1680, 1050),
+                output("HDMI-0", 1920, 0, 1920, 1080),
+            ],
+            [(2, 2, NO_OFFSET), (3, 3, NO_OFFSET), (2, 2, NO_OFFSET)]
+            + [(1, 2, NO_OFFSET)],
+        )
+
+    def test_lookup(self):
+        index = self.index
+        self.assertEqual(index.output_at(0, 1080), 0)
+        self.assertEqual(index.output_at(1920, 1080), 1)
+        self.assertEqual(index.output_at(2000, 500), 3)
+        self.assertIsNone(index.output_at(100, 100))  # Left of HDMI-0
+        self.assertIsNone(index.output_at(-1, 1200))
+        self.assertEqual(index.cell_at(1919, 2159), (0, 4))
+        self.assertEqual(index.cell_at(1920 + 1707, 1080 + 10), (1, 3))
+        self.assertEqual(index.origin(1, 5), (1920 + 853, 1080 + 480))
+        self.assertEqual(index.size(1), (853, 480))
+
+    def test_resolve(self):
+        index = self.index
+        self.assertEqual(index.resolve("right", 0), 1)
+        self.assertEqual(index.resolve("left", 2), 1)
+        self.assertEqual(index.resolve("above", 1), 3)
+        self.assertEqual(index.resolve("below", 3), 1)
+        self.assertEqual(index.resolve("primary", 0), 1)
+        self.assertEqual(index.resolve("DP-2", 0), 2)
+        self.assertEqual(index.resolve("2", 0), 2)
+        self.assertRaises(ValueError, index.resolve, "left", 0)
+        self.assertRaises(ValueError, index.resolve, "VGA-0", 0)
+
+
+class TestOutputSnap(unittest.TestCase):
+    """Snaps to a cell of another output, with its own grid."""
+
+    def test_snap_right(self):
+        with Environment(outputs=3, windows=0, floating=1) as env:
+            commands = list(Documentation.actions)
+            manager = FloatManager(commands=commands, target=3, output="right")
+            grids = {"DP-1": {"rows": 2, "columns": 4}}
+            manager.update_config(dict(manager.config, outputGrids=grids))
+            manager.run("snap")
+            # Cell 3 of a 2x4 grid on the 2560x1440 output at x=1920
+            self.assertEqual(
+                env.server.commands,
+                ["resize set 640 700", "move window position 3200 20"],
+            )
+
+    def test_xrandr(self):
+        # The fake xrandr also lists a disconnected output (no position)
+        with Environment(outputs=2, windows=0, floating=1) as env:
+            commands = list(Documentation.actions)
+            manager = FloatManager(
+                commands=commands, target=3, output="right", xrandr=True
+            )
+            manager.run("snap")
+            # Cell 3 of the rc grid on the 2560x1440 output at x=1920
+            self.assertEqual(
+                env.server.commands,
+                ["resize set 640 350", "move window position 3200 20"],
+            )
+            cmd = [sys.executable, "-m", "i3grid", "snap", "--xrandr"]
+            subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
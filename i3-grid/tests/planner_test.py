@@ -0,0 +1,83 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import Environment, library_runs  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.engine import best_shape  # noqa: E402
+from i3grid.grid import FloatManager  # noqa: E402
+from i3grid.tree import TreeIndex  # noqa: E402
+
+
+class TestArrange(unittest.TestCase):
+    """Grid shape and batched placement of the floating windows."""
+
+    def test_best_shape(self):
+        no_offset = (0, 0, 0, 0)
+        self.assertEqual(best_shape(1, (1920, 1080), no_offset), (1, 1))
+        self.assertEqual(best_shape(2, (1920, 1080), no_offset), (1, 2))
+        self.assertEqual(best_shape(2, (1080, 1920), no_offset), (2, 1))
+        self.assertEqual(best_shape(4, (1920, 1080), no_offset), (2, 2))
+        self.assertEqual(best_shape(4, (3840, 1080), no_offset), (1, 4))
+        # A wide left offset leaves a portrait area
+        self.assertEqual(best_shape(2, (1920, 1080), (0, 0, 0, 1200)), (2, 1))
+
+    def test_arrange(self):
+        with Environment(windows=2, floating=5) as env:
+            library_runs("arrange", 1)
+            self.assertEqual(len(env.server.commands), 1)  # One batch
+            commands = env.server.commands[0].split("; ")
+            floating = [
+                c["nodes"][0]["id"]
+                for c in env.server.tree["nodes"][1]["nodes"][0]["nodes"][0][
+                    "floating_nodes"
+                ]
+            ]
+            moved = [c for c in commands if " move " in c]
+            self.assertEqual(
+                [int(c.split("=")[1].split("]")[0]) for c in moved], floating
+            )
+            # 2 rows of 3 cells on 1920x1080, the rc gridOffset kept
+            self.assertEqual(len({c.split("] ")[1] for c in commands}), 6)
+
+    def test_all_cold(self):
+        with Environment(windows=2, floating=3) as env:
+            for flags, count in (({"all": True}, 5), ({"floating": True}, 3)):
+                env.server.requests.clear()
+                del env.server.commands[:]
+                FloatManager(
+                    commands=list(Documentation.actions), actions=["snap"], **flags
+                )
+                self.assertEqual(env.server.requests[4], 1)  # GET_TREE once
+                moved = [c for c in env.server.commands[0].split("; ") if " move " in c]
+                self.assertEqual(len(moved), count)
+
+
+class TestInPlace(unittest.TestCase):
+    """Float, resize and move commands that would not change the window
+    are not sent."""
+
+    def test_snap(self):
+        with Environment(windows=0, floating=1) as env:
+            window = TreeIndex(env.server.tree).focused()
+            # Cell 1 of the rc grid (4x4, gridOffset 20 0 20 0) on 1920x1080
+            window["rect"] = {"x": 1, "y": 20, "width": 480, "height": 262}
+            commands = list(Documentation.actions)
+            manager = FloatManager(commands=commands, target=1)
+            manager.run("snap")
+            self.assertEqual((env.server.commands, manager.elided), ([], 3))
+            window["rect"]["x"] = 100
+            manager.run("snap")
+            self.assertEqual(env.server.commands, ["move window position 0 20"])
+
+    def test_tiled(self):
+        with Environment(windows=1, floating=0) as env:
+            manager = FloatManager(commands=list(Documentation.actions))
+            manager.run("float")
+            self.assertEqual(env.server.commands[0], "floating enable")
+            self.assertEqual(manager.elided, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import RC, ROOT, Environment  # noqa: E402
+from i3grid import rofi  # noqa: E402
+from i3grid.config import parse_jsonc  # noqa: E402
+
+
+def call(*argv, retv="0", data=""):
+    """(stdout, exit status) of one rofi script mode call."""
+    env = {"ROFI_RETV": retv, "ROFI_DATA": data}
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        status = rofi.main(list(argv), env)
+    return out.getvalue(), status
+
+
+def entries(menu):
+    return [row.split("\0")[0] for row in menu.splitlines() if row[:1] != "\0"]
+
+
+class TestRofi(unittest.TestCase):
+    """Cached menus and the entries dispatched to the fake i3."""
+
+    def setUp(self):
+        self.env = Environment(windows=1, floating=1).__enter__()
+        os.environ["I3GRID_SOCKET"] = os.path.join(self.env.tmp.name, "none.sock")
+
+    def tearDown(self):
+        self.env.__exit__(None, None, None)
+
+    def test_render(self):
+        cells = entries(rofi.render(2, 3))[:6]
+        self.assertEqual(cells, ["1", "4", "2", "5", "3", "6"])  # Column by column
+        self.assertEqual(entries(rofi.render(1, 1))[1:], list(rofi.SHORTCUTS))
+
+    def test_cached_menus(self):
+        rc = os.path.join(os.environ["HOME"], ".i3gridrc")
+        with open(RC, "r") as f:
+            config = parse_jsonc(f.read())
+        config["outputGrids"] = {"HDMI-1": {"rows": 3, "columns": 3}}
+        with open(rc, "w") as f:
+            json.dump(config, f)
+        menu, _ = call()
+        self.assertEqual(len(entries(menu)), 16 + len(rofi.SHORTCUTS))
+        self.assertEqual(len(entries(call("--preset", "halves")[0])), 2 + 9)
+        self.assertEqual(len(entries(call("--output", "HDMI-1")[0])), 9 + 9)
+        self.assertEqual(len(entries(call("--output", "DP-0")[0])), 16 + 9)
+        self.assertEqual(len(entries(call("--rows", "2")[0])), 8 + 9)
+        self.assertEqual(call("--preset", "none")[1], 1)
+        # A changed rc file is picked up on the next open
+        with open(rc, "w") as f:
+            f.write('{"defaultGrid": {"rows": 3, "columns": 2}}')
+        self.assertEqual(entries(call()[0])[:6], ["1", "3", "5", "2", "4", "6"])
+
+    def test_menu_imports(self):
+        call()  # Writes the cache
+        statement = "import sys; from i3grid import rofi; rofi.main([]); " + (
+            "assert 'i3grid.grid' not in sys.modules and 'i3' not in sys.modules"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", statement],
+            cwd=ROOT,
+            env=dict(os.environ, ROFI_RETV="0"),
+            capture_output=True,
+            check=True,
+        )
+        self.assertIn(b"\0prompt\x1fGrid:", out.stdout)
+
+    def test_entries(self):
+        command = rofi.command
+        grid = {"--preset": "quad"}
+        self.assertEqual(
+            command("3", grid), ["snap", "--target", "3", "--preset", "quad"]
+        )
+        self.assertEqual(command("1 4", {}), ["multi", "--multis", "1", "4"])
+        self.assertEqual(command("R", grid), ["reset"])
+        self.assertEqual(
+            command("2 2 4", {}, "X"),
+            ["snap", "--cols", "2", "--rows", "2", "--target", "4"],
+        )
+        for entry, data in (("Z", ""), ("C", ""), ("50 50", "C"), ("x", "D")):
+            self.assertRaises(ValueError, command, entry, {}, data)
+
+    def test_dispatch(self):
+        server = self.env.server
+        self.assertEqual(call("--preset", "quad", "4", retv="1"), ("", 0))
+        self.assertTrue(any("move" in c for c in server.commands))
+        # Prompt shortcuts ask for their values first
+        menu, _ = call("C", retv="1")
+        self.assertIn("\0data\x1fC", menu)
+        self.assertEqual(entries(menu), ["25", "50", "75", "100"])
+        again, _ = call("abc", retv="2", data="C")
+        self.assertIn("\0message\x1f", again)
+        del server.commands[:]
+        self.assertEqual(call("50", retv="2", data="C"), ("", 0))
+        self.assertTrue(any("resize set" in c for c in server.commands))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,5 +2,21 @@
 
 cp -r ../i3grid .
 python3 main_test.py
+python3 xrandr_bench.py
+python3 startup_test.py
+python3 latency_bench.py
+python3 config_test.py
+python3 middleware_test.py
+python3 tree_test.py
+python3 planner_test.py
+python3 outputs_test.py
+python3 layouts_test.py
+python3 rofi_test.py
+python3 cmdqueue_test.py
+python3 engine_test.py
+python3 aiogrid_test.py
+python3 state_test.py
+python3 timings_test.py
+python3 daemon_test.py
 rm -rf ./i3grid
 rm -rf ./__pycache__
@@ -0,0 +1,105 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from i3grid.__main__ import _fast_args  # noqa: E402
+
+# Import time (microseconds) allowed for the keybinding path, up to the
+# FloatManager class, override with I3GRID_IMPORT_BUDGET_US on slow machines
+BUDGET_US = int(os.environ.get("I3GRID_IMPORT_BUDGET_US", 150000))
+# Modules the fast path must never import
+HEAVY = ("argparse", "numpy", "i3grid.xrandr", "i3grid.helpformat")
+IMPORT_RE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+
+
+def importtime(statement):
+    """{module: cumulative us} of every import done by the statement."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    modules = {}
+    for line in out.stderr.decode("utf-8").splitlines():
+        match = IMPORT_RE.match(line)
+        if match:
+            modules[match.group(2)] = int(match.group(1))
+    return modules
+
+
+def imported(statement):
+    """(us, modules) of the statement in a fresh interpreter. Timed from
+    within, importtime loses the modules imported under i3 (i3-py
+    replaces its module object)."""
+    timed = (
+        "import sys, time; t = time.perf_counter(); "
+        f"{statement}; "
+        "print(int((time.perf_counter() - t) * 1e6)); print(' '.join(sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", timed],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        check=True,
+        text=True,
+    )
+    took, modules = out.stdout.splitlines()
+    return int(took), set(modules.split())
+
+
+class TestStartup(unittest.TestCase):
+    """Startup cost of the cli for the hot keybinding forms."""
+
+    def test_fast_args(self):
+        self.assertEqual(
+            _fast_args(["snap", "--target", "3", "--rows=2", "--cols", "2"]),
+            {"actions": ["snap"], "target": 3, "rows": 2, "cols": 2},
+        )
+        self.assertEqual(
+            _fast_args(["multi", "--multis", "1", "4"]),
+            {"actions": ["multi"], "multis": ["1", "4"]},
+        )
+        self.assertEqual(
+            _fast_args(["center", "float"]), {"actions": ["center", "float"]}
+        )
+
+    def test_fast_args_fallback(self):
+        for argv in (
+            [],
+            ["-h"],
+            ["listen"],
+            ["snap", "--all"],
+            ["snap", "--target", "x"],
+            ["snap", "--target", "1", "--target", "2"],
+            ["snap", "--multis"],
+            ["--target", "1"],
+        ):
+            self.assertIsNone(_fast_args(argv), argv)
+
+    def test_import_budget(self):
+        modules = importtime("import i3grid.__main__")
+        for name in HEAVY:
+            self.assertNotIn(name, modules)
+        took = modules["i3grid.__main__"]
+        self.assertLess(took, BUDGET_US, f"Import took {took}us")
+
+    def test_action_path(self):
+        # What a snap keybinding imports before it runs the action
+        took, modules = imported(
+            "from i3grid.__main__ import _float_manager; _float_manager()"
+        )
+        used = ("i3grid.grid", "i3grid.engine", "i3grid.ipc", "i3grid.config")
+        self.assertTrue(set(used) <= modules)
+        for name in HEAVY:
+            self.assertNotIn(name, modules)
+        self.assertLess(took, BUDGET_US, f"Import took {took}us")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import copy
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_i3 import rect  # noqa: E402
+from latency_bench import Environment  # noqa: E402
+from i3grid import ipc  # noqa: E402
+from i3grid.state import StateCache  # noqa: E402
+from i3grid.tree import TreeIndex  # noqa: E402
+
+
+def wait(predicate, timeout=5):
+    """Polls until the event thread of the cache applied an event."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("event was not applied")
+        time.sleep(0.005)
+
+
+class TestStateCache(unittest.TestCase):
+    """Events patched into the cached model match a fresh GET_TREE."""
+
+    def setUp(self):
+        self.env = Environment(workspaces=2, windows=2, floating=1).__enter__()
+        self.server = self.env.server
+        self.cache = StateCache()
+        self.conn = ipc.Connection()
+        self.cache.tree()  # Nothing is patched before the first fetch
+        self.tree = self.cache._tree
+
+    def tearDown(self):
+        self.cache.close()
+        self.conn.close()
+        self.env.__exit__(None, None, None)
+
+    def assertSynced(self, patched=True):
+        fresh = TreeIndex(self.conn.get(ipc.GET_TREE))
+        focused, expected = self.cache.focused_node(), fresh.focused()
+        for key in ("id", "name", "floating"):
+            self.assertEqual(focused[key], expected[key])
+        for workspace in fresh.workspaces:
+            self.assertEqual(
+                sorted(self.cache.workspace_windows(workspace)),
+                sorted(fresh.windows(workspace)),
+            )
+        self.assertEqual(self.cache.outputs(), self.conn.get(ipc.GET_OUTPUTS))
+        self.assertEqual(self.cache.workspaces(), self.conn.get(ipc.GET_WORKSPACES))
+        # Patched in place, or re-fetched for structural changes
+        self.assertEqual(self.cache._tree is self.tree, patched)
+
+    def focus(self, node):
+        """Moves the focus flag of the fake tree to node."""
+        index = TreeIndex(self.server.tree)
+        for other in index.nodes.values():
+            other["focused"] = False
+        node["focused"] = True
+        parent = index.parents[node["id"]]
+        parent["focus"].remove(node["id"])
+        parent["focus"].insert(0, node["id"])
+
+    def test_window_new_focus_close(self):
+        workspace = TreeIndex(self.server.tree).workspaces["1"]
+        win = self.server.window("editor", rect(300, 300, 640, 360), True)
+        con = self.server.node(None, "floating_con", win["rect"], floating="user_on")
+        con["nodes"].append(win)
+        workspace["floating_nodes"].append(con)
+        workspace["focus"].append(con["id"])
+        self.server.emit("window", {"change": "new", "container": win})
+        wait(lambda: win["id"] in self.cache.index.nodes)
+        self.focus(con)
+        con["focused"], win["focused"] = False, True
+        con["focus"] = [win["id"]]
+        self.server.emit("window", {"change": "focus", "container": win})
+        wait(lambda: self.cache.focused_id == win["id"])
+        self.assertSynced()
+
+        workspace["floating_nodes"].remove(con)
+        workspace["focus"].remove(con["id"])
+        first = workspace["nodes"][0]
+        self.focus(first)
+        self.server.emit("window", {"change": "close", "container": win})
+        self.server.emit("window", {"change": "focus", "container": first})
+        wait(lambda: self.cache.focused_id == first["id"])
+        self.assertNotIn(win["id"], self.cache.index.nodes)
+        self.assertSynced()
+
+    def test_window_floating(self):
+        node = TreeIndex(self.server.tree).focused()
+        node["floating"] = "user_on"
+        self.server.emit("window", {"change": "floating", "container": node})
+        wait(lambda: self.cache.focused_node()["floating"] == "user_on")
+        self.assertSynced()
+
+    def test_window_move(self):
+        workspaces = TreeIndex(self.server.tree).workspaces
+        node = workspaces["1"]["nodes"].pop()
+        workspaces["1"]["focus"].remove(node["id"])
+        workspaces["2"]["nodes"].append(node)
+        workspaces["2"]["focus"].append(node["id"])
+        self.server.emit("window", {"change": "move", "container": node})
+        wait(lambda: self.cache._tree is None)  # The destination is unknown
+        self.assertSynced(patched=False)
+
+    def test_workspace_focus(self):
+        workspaces = TreeIndex(self.server.tree).workspaces
+        current, old = workspaces["2"], workspaces["1"]
+        self.focus(current)
+        self.focus(current["nodes"][0])
+        for workspace in self.server.workspaces:
+            focused = workspace["name"] == "2"
+            workspace.update(focused=focused, visible=focused)
+        event = {"change": "focus", "current": current, "old": old}
+        self.server.emit("workspace", copy.deepcopy(event))
+        wait(lambda: self.cache.focused_id == current["nodes"][0]["id"])
+        self.assertSynced()
+
+    def test_output(self):
+        self.server.outputs[1]["rect"]["width"] = 1280
+        self.server.emit("output", {"change": "unspecified"})
+        wait(lambda: self.cache._tree is None)
+        self.assertSynced(patched=False)
+
+    def test_restart(self):
+        self.server.restart()
+        self.conn.close()
+        self.conn = ipc.Connection()
+        # The listener resubscribes to the restarted i3
+        wait(lambda: self.server.subscribers, timeout=10)
+        wait(lambda: self.cache._tree is None)
+        self.assertEqual(
+            self.cache.focused_node()["id"], TreeIndex(self.server.tree).focused()["id"]
+        )
+        self.tree = self.cache._tree
+        node = TreeIndex(self.server.tree).focused()
+        node["floating"] = "user_on"
+        self.server.emit("window", {"change": "floating", "container": node})
+        wait(lambda: self.cache.focused_node()["floating"] == "user_on")
+        self.assertSynced()
+
+
+if __name__ == "__main__":
+    unittest.main()
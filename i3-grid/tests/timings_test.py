@@ -0,0 +1,100 @@
+import os
+import pstats
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from latency_bench import Environment  # noqa: E402
+from i3grid.doc import Documentation  # noqa: E402
+from i3grid.grid import FloatManager  # noqa: E402
+from i3grid.timings import PhaseTimer, profile_path, profiled  # noqa: E402
+
+
+def inner():
+    return sum(range(10000))
+
+
+def work():
+    return inner() + 1
+
+
+class TestPhaseTimer(unittest.TestCase):
+    """Exclusive phase times, their snapshot and format."""
+
+    def test_nested(self):
+        timer = PhaseTimer()
+        start = time.perf_counter()
+        with timer.phase("dispatch"):
+            time.sleep(0.02)
+            with timer.phase("xrandr"):
+                time.sleep(0.05)
+            with timer.phase("xrandr"):  # Accumulates
+                time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        phases = timer.phases
+        self.assertGreaterEqual(phases["xrandr"], 0.06)
+        # The outer phase excludes the inner time
+        self.assertGreaterEqual(phases["dispatch"], 0.02)
+        self.assertLess(phases["dispatch"], 0.05)
+        self.assertAlmostEqual(sum(phases.values()), elapsed, delta=0.005)
+        self.assertEqual(timer._nested, [])
+        timer.reset()
+        self.assertEqual(timer.snapshot(), {"total": 0.0})
+
+    def test_snapshot(self):
+        timer = PhaseTimer()
+        timer.phases = {"focus": 0.001, "dispatch": 0.0025}
+        timings = timer.snapshot()
+        self.assertEqual(timings, {"focus": 1.0, "dispatch": 2.5, "total": 3.5})
+        self.assertEqual(
+            PhaseTimer.format(timings, "snap: "),
+            "snap: 3.500ms (focus=1.000ms dispatch=2.500ms)",
+        )
+
+
+class TestProfiled(unittest.TestCase):
+    """cProfile stats and collapsed stacks of a call."""
+
+    def test_profile_path(self):
+        path = profile_path("/tmp/i3grid-{action}-{pid}.prof", "snap")
+        self.assertEqual(path, f"/tmp/i3grid-snap-{os.getpid()}.prof")
+
+    def test_pstats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snap.prof")
+            self.assertEqual(profiled(path, work), work())
+            functions = {f[2] for f in pstats.Stats(path).stats}
+            self.assertTrue({"work", "inner"} <= functions)
+
+    def test_collapsed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snap.folded")
+            self.assertEqual(profiled(path, work), work())
+            with open(path, "r") as f:
+                stacks = dict(line.rsplit(" ", 1) for line in f.read().splitlines())
+        name = os.path.basename(__file__)
+        self.assertIn(f"{name}:work", stacks)
+        nested = f"{name}:work;{name}:inner"
+        self.assertIn(nested, stacks)
+        self.assertGreaterEqual(int(stacks[nested]), 1)  # Self microseconds
+
+
+class TestRunTimings(unittest.TestCase):
+    """run(..., timings=True) returns the phases of the action."""
+
+    def test_run(self):
+        with Environment(windows=0, floating=1):
+            manager = FloatManager(commands=list(Documentation.actions), target=2)
+            result, timings = manager.run("snap", timings=True)
+            self.assertTrue(result)
+            self.assertIs(timings, manager.timings)
+            self.assertTrue({"focus", "dispatch"} <= set(timings))
+            phases = sum(v for k, v in timings.items() if k != "total")
+            self.assertAlmostEqual(timings["total"], phases, delta=0.01)
+            self.assertEqual(manager.run("snap"), result)  # Not a tuple
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_i3 import FakeI3  # noqa: E402
+from i3grid.tree import TreeIndex  # noqa: E402
+
+
+def deep_tree(depth):
+    """A workspace with one window nested depth splits down."""
+    root = leaf = {"id": 1, "name": "root", "type": "root", "nodes": [], "focus": []}
+    for i in range(2, depth + 2):
+        kind = "workspace" if i == 2 else "con"
+        node = {
+            "id": i,
+            "name": str(i) if i == 2 else None,
+            "type": kind,
+            "nodes": [],
+            "floating_nodes": [],
+            "focus": [],
+        }
+        leaf["nodes"].append(node)
+        leaf["focus"] = [i]
+        leaf = node
+    leaf.update(name="term", focused=True, floating="user_off")
+    return root
+
+
+class TestTreeIndex(unittest.TestCase):
+    """Indexed lookups of the i3 tree, without recursion."""
+
+    def test_fake_tree(self):
+        server = FakeI3("unused", outputs=2, workspaces=2, windows=3, floating=2)
+        index = TreeIndex(server.tree)
+        focused = index.focused()
+        self.assertEqual(focused["name"], "term-1-0")
+        self.assertEqual(index.focus_chain()[-1], focused)
+        self.assertEqual(index.workspace_of(focused)["name"], "1")
+        names = [w[0] for w in index.windows("1")]
+        self.assertEqual(
+            names, ["term-1-0", "term-1-1", "term-1-2", "float-1-0", "float-1-1"]
+        )
+        self.assertEqual(index.windows("404"), [])
+
+    def test_deep_tree(self):
+        depth = sys.getrecursionlimit() * 2
+        index = TreeIndex(deep_tree(depth))
+        self.assertEqual(index.focused()["id"], depth + 1)
+        self.assertEqual(len(index.focus_chain()), depth + 1)
+        self.assertEqual(index.windows("2"), [("term", depth + 1, "user_off")])
+
+    def test_patch(self):
+        server = FakeI3("unused", windows=2, floating=0)
+        index = TreeIndex(server.tree)
+        workspace = index.workspaces["1"]
+        first = workspace["nodes"][0]
+        index.drop(first)
+        workspace["nodes"].remove(first)
+        self.assertNotIn(first["id"], index.nodes)
+        self.assertEqual([w[0] for w in index.windows("1")], ["term-1-1"])
+        workspace["nodes"].append(first)
+        index.add(first, workspace)
+        self.assertIs(index.parents[first["id"]], workspace)
+        names = [w[0] for w in index.windows("1")]
+        self.assertEqual(names, ["term-1-1", "term-1-0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
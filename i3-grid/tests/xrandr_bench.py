@@ -0,0 +1,92 @@
+import glob
+import os
+import sys
+import tempfile
+import timeit
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from i3grid.xrandr import XRandR  # noqa: E402
+
+# Captured `xrandr` (--query) and `xrandr --verbose` outputs
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "xrandr")
+VERSION = "xrandr program version       1.5.1"
+# Expected (position, rotation) of the active outputs per capture
+EXPECTED = {
+    "laptop.txt": {"eDP-1": ((0, 0), "normal")},
+    "dual.txt": {"eDP-1": ((0, 360), "normal"), "DP-2": ((1920, 0), "normal")},
+    "dual_verbose.txt": {
+        "eDP-1": ((0, 360), "normal"),
+        "DP-2": ((1920, 0), "normal"),
+    },
+    "triple_rotated.txt": {
+        "DP-0": ((0, 0), "left"),
+        "DP-2": ((1440, 560), "normal"),
+        "HDMI-0": ((4000, 680), "inverted"),
+    },
+}
+
+
+def corpus():
+    for path in sorted(glob.glob(os.path.join(CORPUS, "*.txt"))):
+        with open(path, "r") as f:
+            yield os.path.basename(path), f.read()
+
+
+def active(configuration):
+    return {
+        n: (tuple(o.position), str(o.rotation))
+        for n, o in configuration.outputs.items()
+        if o.active
+    }
+
+
+class TestXRandRParser(unittest.TestCase):
+    """Parser and probe cache checks over the captured corpus."""
+
+    def test_corpus(self):
+        for name, output in corpus():
+            x = XRandR(version=VERSION)
+            x.parse(output)
+            self.assertEqual(active(x.configuration), EXPECTED[name], name)
+
+    def test_cache_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = os.path.join(tmp, "xrandr.json")
+            for name, output in corpus():
+                x = XRandR(version=VERSION, cache_file=cache)
+                x._output = lambda *args: output
+                x.load_from_x(fingerprint=name)
+                restored = XRandR(version=VERSION, cache_file=cache)
+                restored._output = None  # Must not call xrandr
+                restored.load_from_x(fingerprint=name)
+                self.assertEqual(active(restored.configuration), EXPECTED[name])
+
+
+def bench(number=2000):
+    """Microseconds per parse of each capture, and per cached load."""
+    print(f"{'capture':<22}{'bytes':>8}{'parse us':>12}{'cached us':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "xrandr.json")
+        for name, output in corpus():
+            x = XRandR(version=VERSION, cache_file=cache)
+            x._output = lambda *args: output
+            x.load_from_x(fingerprint=name)
+            parse = timeit.timeit(lambda: x.parse(output), number=number)
+            cached = timeit.timeit(
+                lambda: XRandR(version=VERSION, cache_file=cache).load_from_x(
+                    fingerprint=name
+                ),
+                number=number,
+            )
+            print(
+                f"{name:<22}{len(output):>8}"
+                f"{parse / number * 1e6:>12.1f}{cached / number * 1e6:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        bench()
+    else:
+        unittest.main()
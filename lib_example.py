@@ -21,16 +21,13 @@ manager.run("center")
 p("Centered the current Window.")
 # Default will center current window
 
-# Update the default configurations
-new_config = i3grid.BASE_CONFIG
+# Update the configuration of the manager (BASE_CONFIG holds the defaults
+# and is left as it is). Check the possible configurations that can be made
+# print(manager.config.keys())
 
-# Check the possible configurations that can be made
-# print(new_config.keys())
-
-new_config["defaultGrid"] = {"rows": 3, "columns": 1}
 # In this example, Rows * Columns = 3
 # SnapLocation must be less than this number.
-new_config["snapLocation"] = 2
+new_config = dict(manager.config, defaultGrid={"rows": 3, "columns": 1}, snapLocation=2)
 
 # Update the keys (Will throw error if misconfigured)
 manager.update_config(new_config)